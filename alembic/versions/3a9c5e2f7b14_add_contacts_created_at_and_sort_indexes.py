@@ -0,0 +1,42 @@
+"""Add contacts created_at and indexes for sorted listing
+
+Revision ID: 3a9c5e2f7b14
+Revises: e2d7a4c91f05
+Create Date: 2026-10-19 00:31:48.702215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9c5e2f7b14'
+down_revision: Union[str, Sequence[str], None] = 'e2d7a4c91f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keyset pagination orders by the sort column and then the ID
+SORT_INDEXES = {
+    'ix_contacts_user_id_first_name_id': ['user_id', 'first_name', 'id'],
+    'ix_contacts_user_id_birthday_id': ['user_id', 'birthday', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    # Creation time was never recorded; the last change is the closest guess
+    op.execute('UPDATE contacts SET created_at = updated_at')
+    with op.get_context().autocommit_block():
+        for name, columns in SORT_INDEXES.items():
+            op.create_index(name, 'contacts', columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name in SORT_INDEXES:
+            op.drop_index(name, table_name='contacts', postgresql_concurrently=True, if_exists=True)
+    op.drop_column('contacts', 'created_at')
@@ -0,0 +1,28 @@
+"""Add token_version to users
+
+Revision ID: 4f1c2a9d8e57
+Revises: 7d4e0b6a1f83
+Create Date: 2026-10-18 22:05:12.640219
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f1c2a9d8e57'
+down_revision: Union[str, Sequence[str], None] = '7d4e0b6a1f83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,28 @@
+"""Add contacts (user_id, id) index for keyset pagination
+
+Revision ID: 5b2f8c1d9e34
+Revises: 97b97cc37d78
+Create Date: 2026-10-18 10:12:41.305127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2f8c1d9e34'
+down_revision: Union[str, Sequence[str], None] = '97b97cc37d78'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_contacts_user_id_id', 'contacts', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_user_id_id', table_name='contacts')
@@ -0,0 +1,35 @@
+"""Add indexed birthday_md column to contacts
+
+Revision ID: 7d4e0b6a1f83
+Revises: c3a91e7d2b60
+Create Date: 2026-10-18 12:40:55.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4e0b6a1f83'
+down_revision: Union[str, Sequence[str], None] = 'c3a91e7d2b60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('contacts', sa.Column('birthday_md', sa.SmallInteger(), nullable=True))
+    op.execute(
+        "UPDATE contacts SET birthday_md = "
+        "EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday)"
+    )
+    op.alter_column('contacts', 'birthday_md', nullable=False)
+    op.create_index('ix_contacts_user_id_birthday_md', 'contacts', ['user_id', 'birthday_md'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_user_id_birthday_md', table_name='contacts')
+    op.drop_column('contacts', 'birthday_md')
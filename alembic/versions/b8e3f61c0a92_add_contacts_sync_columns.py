@@ -0,0 +1,49 @@
+"""Add sync columns and per-user change sequence to contacts
+
+Revision ID: b8e3f61c0a92
+Revises: 4f1c2a9d8e57
+Create Date: 2026-10-18 23:10:37.215804
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3f61c0a92'
+down_revision: Union[str, Sequence[str], None] = '4f1c2a9d8e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('contacts', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    op.add_column('contacts', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('contacts', sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+    # Number existing contacts per user in ID order and start each user's
+    # sequence after them
+    op.execute(
+        "UPDATE contacts SET change_seq = numbered.seq FROM ("
+        "SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY id) AS seq FROM contacts"
+        ") AS numbered WHERE contacts.id = numbered.id"
+    )
+    op.execute(
+        "UPDATE users SET change_seq = counts.last_seq FROM ("
+        "SELECT user_id, max(change_seq) AS last_seq FROM contacts GROUP BY user_id"
+        ") AS counts WHERE users.id = counts.user_id"
+    )
+    op.create_index('ix_contacts_user_id_change_seq', 'contacts', ['user_id', 'change_seq'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_contacts_user_id_change_seq', table_name='contacts')
+    op.execute("DELETE FROM contacts WHERE deleted_at IS NOT NULL")
+    op.drop_column('contacts', 'change_seq')
+    op.drop_column('contacts', 'deleted_at')
+    op.drop_column('contacts', 'updated_at')
+    op.drop_column('users', 'change_seq')
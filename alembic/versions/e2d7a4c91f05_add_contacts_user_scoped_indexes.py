@@ -0,0 +1,50 @@
+"""Add user-scoped name and email indexes to contacts, built concurrently
+
+Revision ID: e2d7a4c91f05
+Revises: b8e3f61c0a92
+Create Date: 2026-10-18 23:52:06.418923
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2d7a4c91f05'
+down_revision: Union[str, Sequence[str], None] = 'b8e3f61c0a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NEW_INDEXES = {
+    'ix_contacts_user_id_last_name_first_name': ['user_id', 'last_name', 'first_name'],
+    'ix_contacts_user_id_email': ['user_id', 'email'],
+}
+# Every contact query is scoped to a user: ix_contacts_id duplicates the
+# primary key and ix_contacts_email is superseded by (user_id, email)
+OLD_INDEXES = {
+    'ix_contacts_id': ['id'],
+    'ix_contacts_email': ['email'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY keeps the table writable during the build but cannot run
+    # in a transaction. A failed build leaves an INVALID index behind: drop
+    # it and re-run the upgrade.
+    with op.get_context().autocommit_block():
+        for name, columns in NEW_INDEXES.items():
+            op.create_index(name, 'contacts', columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+        for name in OLD_INDEXES:
+            op.drop_index(name, table_name='contacts', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, columns in OLD_INDEXES.items():
+            op.create_index(name, 'contacts', columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+        for name in NEW_INDEXES:
+            op.drop_index(name, table_name='contacts', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,74 @@
+"""
+Measure the per-request cost of ``get_current_user`` on each cache tier,
+and of ``get_token_user`` with ``AUTH_FAST_PATH`` on.
+
+Usage::
+
+    python -m benchmarks.bench_auth --repeat 1000
+
+"redis + ORM" reproduces the previous dependency, which read Redis on
+every request and rebuilt a detached ``User`` from the JSON. "fast path"
+authorizes from the token claims and the token version snapshot only.
+Requires Redis on the configured host.
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import make_engine, make_sessionmaker, measure, seed_user, summarize
+from src.db.models import User
+from src.services import service_auth
+from src.services.service_auth import CurrentUser, create_access_token, get_current_user, get_token_user
+from src.services.service_cache import redis_client
+
+
+async def main(repeat: int) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    token = await create_access_token(data={"sub": user.email})
+    claims_token = await create_access_token(data=CurrentUser.from_user(user).claims())
+    key = f"user:{user.email}"
+
+    async def redis_orm():
+        # The pre-two-tier implementation of the cache hit path
+        service_auth.jwt.decode(token, service_auth.config.JWT_SECRET, algorithms=[service_auth.config.JWT_ALGORITHM])
+        return User(**json.loads(await redis_client.get(key)))
+
+    async def database():
+        service_auth._local_users.clear()
+        await redis_client.delete(key)
+        return await get_current_user(token, session)
+
+    async def redis_tier():
+        service_auth._local_users.clear()
+        return await get_current_user(token, session)
+
+    async with make_sessionmaker(engine)() as session:
+        await redis_client.delete(key)
+        await get_current_user(token, session)
+        legacy = {**json.loads(await redis_client.get(key)), "hashed_password": user.hashed_password}
+        await redis_client.set(key, json.dumps(legacy))
+
+        rows = [("redis + ORM (before)", await measure(redis_orm, repeat))]
+        await redis_client.delete(key)
+        rows += [
+            ("database", await measure(database, repeat)),
+            ("redis tier", await measure(redis_tier, repeat)),
+            ("local tier", await measure(lambda: get_current_user(token, session), repeat)),
+        ]
+        service_auth.config.AUTH_FAST_PATH = True
+        rows.append(("fast path", await measure(lambda: get_token_user(claims_token, session), repeat)))
+
+    for name, samples in rows:
+        stats = summarize(samples)
+        print(f"{name:>22}: p50={stats['p50_ms']} ms p99={stats['p99_ms']} ms")
+
+    await redis_client.delete(key)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeat))
@@ -0,0 +1,67 @@
+"""
+Compare ``POST /contacts/batch`` style batches against per-item calls.
+
+Usage::
+
+    python -m benchmarks.bench_batch --ops 300
+
+Each side creates, updates and deletes ``ops`` contacts.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import contact_rows, make_engine, make_sessionmaker, seed_user
+from src.repository.repo_contacts import ContactRepository
+from src.schemas import BatchCreate, BatchDelete, BatchUpdate, ContactBatchRequest, ContactCreate, ContactUpdate
+from src.services.service_contacts import ContactService
+
+
+async def per_item(session, user, bodies) -> float:
+    repo = ContactRepository(session)
+    start = time.perf_counter()
+    created = [await repo.create(body, user) for body in bodies]
+    for contact, body in zip(created, bodies):
+        await repo.update(contact.id, ContactUpdate(**{**body.model_dump(), "phone": "000"}), user)
+    for contact in created:
+        await repo.delete(contact.id, user)
+    return time.perf_counter() - start
+
+
+async def batched(session, user, bodies) -> float:
+    service = ContactService(session, cache=None)
+    start = time.perf_counter()
+    response = await service.batch(
+        ContactBatchRequest(operations=[BatchCreate(op="create", data=body) for body in bodies]), user
+    )
+    ids = [result.contact.id for result in response.results]
+    await service.batch(ContactBatchRequest(operations=[
+        BatchUpdate(op="update", id=contact_id, data=ContactUpdate(**{**body.model_dump(), "phone": "000"}))
+        for contact_id, body in zip(ids, bodies)
+    ]), user)
+    await service.batch(ContactBatchRequest(operations=[BatchDelete(op="delete", id=i) for i in ids]), user)
+    return time.perf_counter() - start
+
+
+async def main(ops: int) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    bodies = [ContactCreate(**row) for row in contact_rows(user.id, ops)]
+
+    async with make_sessionmaker(engine)() as session:
+        item_seconds = await per_item(session, user, bodies)
+    async with make_sessionmaker(engine)() as session:
+        batch_seconds = await batched(session, user, bodies)
+
+    total = ops * 3
+    print(f"per item: {total} ops in {item_seconds:.2f} s, {total / item_seconds:,.0f} ops/s")
+    print(f"batch:    {total} ops in {batch_seconds:.2f} s, {total / batch_seconds:,.0f} ops/s")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ops", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(main(args.ops))
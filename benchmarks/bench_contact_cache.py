@@ -0,0 +1,50 @@
+"""
+Compare cached and uncached ``ContactService`` reads.
+
+Usage::
+
+    python -m benchmarks.bench_contact_cache --contacts 10000 --page-size 100
+
+Requires Redis on the configured host.
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import make_engine, make_sessionmaker, measure, seed_contacts, seed_user, summarize
+from src.services.service_contacts import ContactService, contact_cache
+
+
+async def main(contacts: int, page_size: int, repeat: int) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    await seed_contacts(engine, user.id, contacts)
+    await contact_cache.invalidate(user.id)
+
+    async with make_sessionmaker(engine)() as session:
+        uncached = ContactService(session, cache=None)
+        cached = ContactService(session)
+        await cached.get_all(user, 0, page_size)
+        await cached.get_by_id(1, user)
+
+        rows = [
+            ("list page, database", await measure(lambda: uncached.get_all(user, 0, page_size), repeat)),
+            ("list page, cache hit", await measure(lambda: cached.get_all(user, 0, page_size), repeat)),
+            ("single contact, database", await measure(lambda: uncached.get_by_id(1, user), repeat)),
+            ("single contact, cache hit", await measure(lambda: cached.get_by_id(1, user), repeat)),
+        ]
+
+    for name, samples in rows:
+        stats = summarize(samples)
+        print(f"{name:>26}: p50={stats['p50_ms']} ms p99={stats['p99_ms']} ms")
+    print(contact_cache.stats.snapshot())
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=10_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.page_size, args.repeat))
@@ -0,0 +1,68 @@
+"""
+Measure what sparse fieldsets save on contacts with large ``extra_data``.
+
+Usage::
+
+    python -m benchmarks.bench_fields --contacts 5000 --extra-bytes 4000 --page-size 500
+
+Every seeded contact gets ``--extra-bytes`` of notes. Each selection is
+timed through the list route's path (query rows, dump with orjson) and
+reported with the response size. ``all fields`` is what a list page cost
+before ``extra_data`` was deferred.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import update
+
+from benchmarks.common import make_engine, make_sessionmaker, measure, save_results, seed_contacts, seed_user, summarize
+from src.db.models import Contact
+from src.repository.repo_contacts import CONTACT_FIELDS, ContactRepository
+from src.services.service_contacts import dump_contact_rows, parse_fields
+
+SELECTIONS = {
+    "all fields": ",".join(CONTACT_FIELDS),
+    "default": None,
+    "names": "first_name,last_name",
+}
+
+
+async def main(contacts: int, extra_bytes: int, page_size: int, repeat: int, output: str | None) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    await seed_contacts(engine, user.id, contacts)
+    async with engine.begin() as conn:
+        await conn.execute(update(Contact).where(Contact.user_id == user.id).values(extra_data="x" * extra_bytes))
+
+    results = {}
+    async with make_sessionmaker(engine)() as session:
+        repo = ContactRepository(session)
+        for name, value in SELECTIONS.items():
+            fields = parse_fields(value)
+
+            async def page():
+                return dump_contact_rows(await repo.get_all(user, limit=page_size, as_rows=True, fields=fields), fields)
+
+            body = await page()
+            results[name] = {**summarize(await measure(page, repeat)), "bytes": len(body)}
+
+    baseline = results["all fields"]
+    for name, stats in results.items():
+        print(
+            f"{name:>10}: {stats['bytes']:>9} bytes ({stats['bytes'] / baseline['bytes']:.1%}) "
+            f"p50={stats['p50_ms']} ms ({stats['p50_ms'] / baseline['p50_ms']:.1%}) p99={stats['p99_ms']} ms"
+        )
+    params = {"contacts": contacts, "extra_bytes": extra_bytes, "page_size": page_size, "repeat": repeat}
+    print(f"results: {save_results('bench_fields', params, results, output)}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=5000)
+    parser.add_argument("--extra-bytes", type=int, default=4000)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/bench_fields-<time>.json")
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.extra_bytes, args.page_size, args.repeat, args.output))
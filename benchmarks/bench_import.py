@@ -0,0 +1,66 @@
+"""
+Compare the bulk import against creating contacts one at a time.
+
+Usage::
+
+    python -m benchmarks.bench_import --rows 50000 --single-rows 1000
+"""
+import argparse
+import asyncio
+import csv
+import io
+import time
+
+from benchmarks.common import contact_rows, make_engine, make_sessionmaker, seed_user
+from src.repository.repo_contacts import ContactRepository
+from src.schemas import ContactCreate
+from src.services.service_contacts import ContactService
+
+FIELDS = ["first_name", "last_name", "email", "phone", "birthday"]
+
+
+def csv_body(user_id: int, count: int) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(contact_rows(user_id, count))
+    return buffer.getvalue().encode()
+
+
+async def chunked(data: bytes, size: int = 64 * 1024):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def main(rows: int, single_rows: int, batch_size: int) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    body = csv_body(user.id, rows)
+
+    async with make_sessionmaker(engine)() as session:
+        start = time.perf_counter()
+        result = await ContactService(session, cache=None).import_contacts(
+            chunked(body), "csv", user, batch_size=batch_size
+        )
+        elapsed = time.perf_counter() - start
+    print(f"bulk import: {result.inserted} rows in {elapsed:.2f} s, {result.inserted / elapsed:,.0f} rows/s")
+
+    async with make_sessionmaker(engine)() as session:
+        repo = ContactRepository(session)
+        bodies = [ContactCreate(**row) for row in contact_rows(user.id, single_rows, seed=7)]
+        start = time.perf_counter()
+        for contact in bodies:
+            await repo.create(contact, user)
+        elapsed = time.perf_counter() - start
+    print(f"one by one:  {single_rows} rows in {elapsed:.2f} s, {single_rows / elapsed:,.0f} rows/s")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--single-rows", type=int, default=1_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.single_rows, args.batch_size))
@@ -0,0 +1,89 @@
+"""
+Measure ``GET /api/contacts/`` latency while a storm of logins is running.
+
+Usage::
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 20
+    python -m benchmarks.bench_login_storm --inline   # bcrypt on the event loop, as before
+
+Requires Redis on the configured host, like the application itself.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.common import make_engine, make_sessionmaker, measure, seed_contacts, seed_user, summarize
+from main import app
+from src.conf.config import config
+from src.db.db import get_db
+from src.services.service_auth import create_access_token, hash_password
+from src.services.service_password import password_hasher, pwd_context
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password"
+
+
+async def main(logins: int, concurrency: int, samples: int, inline: bool) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine, EMAIL)
+    async with make_sessionmaker(engine)() as session:
+        user = await session.merge(user)
+        user.hashed_password = hash_password(PASSWORD)
+        await session.commit()
+    await seed_contacts(engine, user.id, 1000)
+
+    session_maker = make_sessionmaker(engine)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    # The storm comes from one client, which the login limit would cut off
+    config.RATE_LIMIT_ENABLED = False
+    if inline:
+        async def verify_inline(password, hashed_password):
+            return pwd_context.verify(password, hashed_password)
+        password_hasher.verify = verify_inline
+
+    token = await create_access_token(data={"sub": EMAIL})
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def list_contacts():
+            response = await client.get("/api/contacts/", params={"limit": 20}, headers=headers)
+            response.raise_for_status()
+
+        baseline = await measure(list_contacts, samples)
+
+        remaining = logins
+
+        async def login_worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await client.post("/api/auth/login", data={"username": EMAIL, "password": PASSWORD})
+
+        storm = [asyncio.create_task(login_worker()) for _ in range(concurrency)]
+        during = await measure(list_contacts, samples)
+        await asyncio.gather(*storm)
+
+    mode = "inline bcrypt" if inline else f"thread pool ({password_hasher.max_workers} workers)"
+    print(f"mode: {mode}")
+    for name, values in (("idle", baseline), ("login storm", during)):
+        stats = summarize(values)
+        print(f"{name:>12}: p50={stats['p50_ms']} ms p95={stats['p95_ms']} ms p99={stats['p99_ms']} ms")
+
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--inline", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concurrency, args.samples, args.inline))
@@ -0,0 +1,46 @@
+"""
+Compare OFFSET and keyset pagination latency for deep pages.
+
+Usage::
+
+    python -m benchmarks.bench_pagination --contacts 200000 --page-size 100
+
+Set ``BENCH_DB_URL`` to run against Postgres instead of the default SQLite file.
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import make_engine, make_sessionmaker, measure, seed_contacts, seed_user, summarize
+from src.repository.repo_contacts import ContactRepository
+
+
+async def main(contacts: int, page_size: int, repeat: int) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    await seed_contacts(engine, user.id, contacts)
+    session_maker = make_sessionmaker(engine)
+
+    print(f"{'page':>8} {'offset p50 ms':>14} {'keyset p50 ms':>14}")
+    async with session_maker() as session:
+        repo = ContactRepository(session)
+        for page in (1, 10, 100, 1000, contacts // page_size - 1):
+            if page < 1 or page * page_size >= contacts:
+                continue
+            skip = page * page_size
+            # Keyset needs the last id of the previous page; ids are dense here.
+            last_id = (await repo.get_all(user, skip - 1, 1))[0].id
+
+            offset = await measure(lambda: repo.get_all(user, skip, page_size), repeat)
+            keyset = await measure(lambda: repo.get_all(user, 0, page_size, after=[last_id]), repeat)
+            print(f"{page:>8} {summarize(offset)['p50_ms']:>14} {summarize(keyset)['p50_ms']:>14}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.page_size, args.repeat))
@@ -0,0 +1,100 @@
+"""
+Compare the CPU cost of renewing access tokens by re-login and by refresh.
+
+Usage::
+
+    python -m benchmarks.bench_refresh --renewals 200 --concurrency 20
+
+Each virtual client renews its access token ``--renewals`` times in total,
+once with ``POST /api/auth/login`` (a bcrypt verify every time) and once
+with ``POST /api/auth/refresh`` (a Redis round trip). Process CPU time
+includes the bcrypt worker threads. Requires Redis on the configured host.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import (
+    BENCH_PASSWORD,
+    bench_email,
+    make_engine,
+    save_results,
+    seed_users,
+    summarize,
+    throughput,
+)
+from benchmarks.load_scenario import use_database
+from main import app
+from src.conf.config import config
+from src.services.service_password import password_hasher
+
+
+async def run(client: httpx.AsyncClient, renewals: int, concurrency: int, renew) -> tuple[list[float], float, float]:
+    samples, remaining = [], renewals
+
+    async def worker(index: int):
+        nonlocal remaining
+        state = {}
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            await renew(index, state)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    return samples, time.process_time() - cpu, time.perf_counter() - wall
+
+
+async def main(renewals: int, concurrency: int, output: str | None) -> None:
+    engine = await make_engine()
+    await seed_users(engine, concurrency)
+    use_database(app, engine)
+    config.RATE_LIMIT_ENABLED = False
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login(index, state):
+            response = await client.post("/api/auth/login", data={"username": bench_email(index), "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            state["refresh_token"] = response.json()["refresh_token"]
+
+        async def refresh(index, state):
+            if "refresh_token" not in state:
+                await login(index, state)
+                return
+            response = await client.post("/api/auth/refresh", json={"refresh_token": state["refresh_token"]})
+            response.raise_for_status()
+            state["refresh_token"] = response.json()["refresh_token"]
+
+        results = {}
+        for name, renew in (("login", login), ("refresh", refresh)):
+            samples, cpu, wall = await run(client, renewals, concurrency, renew)
+            results[name] = {
+                **summarize(samples),
+                "rps": throughput(samples, wall),
+                "cpu_ms_per_renewal": round(cpu * 1000 / len(samples), 3),
+            }
+
+    for name, stats in results.items():
+        print(
+            f"{name:>8}: {stats['rps']} renewals/s cpu={stats['cpu_ms_per_renewal']} ms/renewal "
+            f"p50={stats['p50_ms']} ms p99={stats['p99_ms']} ms"
+        )
+    saved = 1 - results["refresh"]["cpu_ms_per_renewal"] / results["login"]["cpu_ms_per_renewal"]
+    print(f"CPU saved per renewal: {saved:.1%} (refresh still logs each client in once)")
+    params = {"renewals": renewals, "concurrency": concurrency}
+    print(f"results: {save_results('bench_refresh', params, results, output)}")
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renewals", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/bench_refresh-<time>.json")
+    args = parser.parse_args()
+    asyncio.run(main(args.renewals, args.concurrency, args.output))
@@ -0,0 +1,143 @@
+"""
+Micro-benchmarks for every ``ContactRepository`` method and ``get_current_user``.
+
+Usage::
+
+    python -m benchmarks.bench_repo --contacts 50000 --repeat 50
+    python -m benchmarks.datagen --users 10 --contacts 1000000 && python -m benchmarks.bench_repo --reuse
+    python -m benchmarks.bench_repo --output baseline.json
+
+Without ``--reuse`` a single user with ``--contacts`` contacts is seeded
+first. Results are printed and written as JSON for
+``benchmarks.compare``. The ``get_current_user`` cases require Redis on
+the configured host, like the application itself.
+"""
+import argparse
+import asyncio
+import random
+from datetime import date
+
+from sqlalchemy import func, select
+
+from benchmarks.common import (
+    bench_email,
+    contact_rows,
+    make_engine,
+    make_sessionmaker,
+    measure,
+    save_results,
+    seed_contacts,
+    seed_users,
+    summarize,
+)
+from src.db.models import Contact, User
+from src.repository.repo_contacts import ContactRepository
+from src.schemas import ContactCreate, ContactUpdate
+from src.services import service_auth
+from src.services.service_auth import create_access_token, get_current_user
+from src.services.service_cache import redis_client
+
+
+async def repository_cases(session, user: User, repeat: int) -> dict:
+    repo = ContactRepository(session)
+    ids = list((await session.scalars(select(Contact.id).where(Contact.user_id == user.id))).all())
+    rnd = random.Random(0)
+    last_page = ids[len(ids) // 2]
+    bodies = [ContactCreate(**row) for row in contact_rows(user.id, repeat * 101, seed=99)]
+    creates, bulk = iter(bodies[:repeat]), iter(range(repeat, len(bodies), 100))
+
+    async def create():
+        contact = await repo.create(next(creates), user)
+        created.append(contact.id)
+
+    async def bulk_create():
+        start = next(bulk)
+        await repo.bulk_create(bodies[start:start + 100], user)
+        await session.commit()
+
+    async def stream_all():
+        async for _ in repo.stream_all(user):
+            pass
+
+    async def update():
+        contact_id = rnd.choice(ids)
+        body = ContactUpdate(**next(contact_rows(user.id, 1, seed=contact_id)))
+        await repo.update(contact_id, body, user)
+
+    async def batch():
+        targets = rnd.sample(ids, 20)
+        updates = {contact_id: ContactUpdate(**row) for contact_id, row in zip(targets, contact_rows(user.id, 20, seed=1))}
+        await repo.batch([], updates, [], user)
+        await session.commit()
+
+    created = []
+    cases = {
+        "get_all offset": lambda: repo.get_all(user, skip=len(ids) // 2, limit=50),
+        "get_all keyset": lambda: repo.get_all(user, limit=50, after=[last_page]),
+        "get_by_id": lambda: repo.get_by_id(rnd.choice(ids), user),
+        "search": lambda: repo.search(user, "ann", limit=50),
+        "upcoming_birthdays": lambda: repo.upcoming_birthdays(user, today=date(2025, 6, 1)),
+        "create": create,
+        "bulk_create x100": bulk_create,
+        "update": update,
+        "batch update x20": batch,
+        "delete": lambda: repo.delete(created.pop(), user),
+    }
+    results = {}
+    for name, fn in cases.items():
+        results[name] = summarize(await measure(fn, repeat))
+    # Whole-table scans are slow on big datasets, a few runs are enough
+    results["stream_all"] = summarize(await measure(stream_all, max(3, repeat // 10)))
+    return results
+
+
+async def auth_cases(session, user: User, repeat: int) -> dict:
+    token = await create_access_token(data={"sub": user.email})
+    key = f"user:{user.email}"
+
+    async def database():
+        service_auth._local_users.clear()
+        await redis_client.delete(key)
+        return await get_current_user(token, session)
+
+    async def redis_tier():
+        service_auth._local_users.clear()
+        return await get_current_user(token, session)
+
+    results = {"get_current_user database": summarize(await measure(database, repeat))}
+    results["get_current_user redis"] = summarize(await measure(redis_tier, repeat))
+    results["get_current_user local"] = summarize(await measure(lambda: get_current_user(token, session), repeat))
+    return results
+
+
+async def main(contacts: int, repeat: int, reuse: bool, skip_auth: bool, output: str | None) -> None:
+    engine = await make_engine(reset=not reuse)
+    if not reuse:
+        user_ids = await seed_users(engine, 1)
+        await seed_contacts(engine, user_ids[0], contacts)
+
+    async with make_sessionmaker(engine)() as session:
+        user = await session.scalar(select(User).where(User.email == bench_email(0)))
+        if user is None:
+            raise SystemExit("no benchmark dataset, run benchmarks.datagen first or drop --reuse")
+        contacts = await session.scalar(select(func.count()).select_from(Contact).where(Contact.user_id == user.id))
+        results = await repository_cases(session, user, repeat)
+        if not skip_auth:
+            results.update(await auth_cases(session, user, repeat))
+
+    for name, stats in results.items():
+        print(f"{name:>26}: mean={stats['mean_ms']} ms p50={stats['p50_ms']} ms p95={stats['p95_ms']} ms p99={stats['p99_ms']} ms")
+    path = save_results("bench_repo", {"repeat": repeat, "reuse": reuse, "contacts": contacts}, results, output)
+    print(f"results: {path}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--reuse", action="store_true", help="use the dataset seeded by benchmarks.datagen")
+    parser.add_argument("--skip-auth", action="store_true", help="skip the get_current_user cases (no Redis)")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/bench_repo-<time>.json")
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.repeat, args.reuse, args.skip_auth, args.output))
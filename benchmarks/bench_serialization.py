@@ -0,0 +1,103 @@
+"""
+Compare the contact list response paths in microseconds per contact.
+
+Usage::
+
+    python -m benchmarks.bench_serialization --contacts 1000 --repeat 50
+
+``orm + pydantic`` is what FastAPI does for a ``response_model`` route that
+returns ORM objects: validate every contact through ``ContactResponse``
+(from attributes, re-checking emails) and encode with the stdlib json.
+``rows + orjson`` selects the response columns as rows and dumps them with
+orjson. Both produce the same bytes. Timings are reported for the query,
+the serialization and both together.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from benchmarks.common import make_engine, make_sessionmaker, save_results, seed_contacts, seed_user, summarize
+from src.repository.repo_contacts import CONTACT_FIELDS, ContactRepository
+from src.schemas import ContactResponse
+from src.services.service_contacts import dump_contact_rows
+
+_list_adapter = TypeAdapter(List[ContactResponse])
+
+
+def fastapi_json(contacts) -> bytes:
+    # fastapi.routing.serialize_response followed by JSONResponse.render
+    value = _list_adapter.dump_python(_list_adapter.validate_python(contacts, from_attributes=True), mode="json")
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+async def timed(fn, repeat: int, count: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    stats = summarize(samples)
+    stats["us_per_contact"] = round(stats["p50_ms"] * 1000 / count, 3)
+    return stats
+
+
+async def main(contacts: int, repeat: int, output: str | None) -> None:
+    engine = await make_engine()
+    user = await seed_user(engine)
+    await seed_contacts(engine, user.id, contacts)
+
+    async with make_sessionmaker(engine)() as session:
+        repo = ContactRepository(session)
+        orm = await repo.get_all(user, limit=contacts, fields=CONTACT_FIELDS)
+        rows = await repo.get_all(user, limit=contacts, as_rows=True, fields=CONTACT_FIELDS)
+        assert fastapi_json(orm) == dump_contact_rows(rows)
+        session.expunge_all()
+
+        async def serialize_orm():
+            fastapi_json(orm)
+
+        async def serialize_rows():
+            dump_contact_rows(rows)
+
+        async def orm_end_to_end():
+            fastapi_json(await repo.get_all(user, limit=contacts, fields=CONTACT_FIELDS))
+            session.expunge_all()
+
+        async def rows_end_to_end():
+            dump_contact_rows(await repo.get_all(user, limit=contacts, as_rows=True, fields=CONTACT_FIELDS))
+
+        async def query_orm():
+            await repo.get_all(user, limit=contacts, fields=CONTACT_FIELDS)
+            session.expunge_all()
+
+        async def query_rows():
+            await repo.get_all(user, limit=contacts, as_rows=True, fields=CONTACT_FIELDS)
+
+        cases = {
+            "orm + pydantic: query": query_orm,
+            "rows + orjson: query": query_rows,
+            "orm + pydantic: serialize": serialize_orm,
+            "rows + orjson: serialize": serialize_rows,
+            "orm + pydantic: total": orm_end_to_end,
+            "rows + orjson: total": rows_end_to_end,
+        }
+        results = {name: await timed(fn, repeat, len(rows)) for name, fn in cases.items()}
+
+    for name, stats in results.items():
+        print(f"{name:>26}: {stats['us_per_contact']:>8} us/contact p50={stats['p50_ms']} ms p99={stats['p99_ms']} ms")
+    params = {"contacts": contacts, "repeat": repeat}
+    print(f"results: {save_results('bench_serialization', params, results, output)}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--contacts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/bench_serialization-<time>.json")
+    args = parser.parse_args()
+    asyncio.run(main(args.contacts, args.repeat, args.output))
@@ -0,0 +1,230 @@
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from src.db.models import Base, Contact, User, month_day
+
+BENCH_DB_URL = os.getenv(
+    "BENCH_DB_URL",
+    f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'contacts_bench.db')}",
+)
+BENCH_RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", os.path.join(os.path.dirname(__file__), "results"))
+BENCH_PASSWORD = "bench-password"
+
+
+def bench_email(index: int) -> str:
+    return f"bench-user-{index}@example.com"
+
+
+async def make_engine(url: str = BENCH_DB_URL, reset: bool = True) -> AsyncEngine:
+    """
+    Create an engine for benchmarks and (re)create the schema.
+
+    :param url: Database URL, defaults to ``BENCH_DB_URL``.
+    :param reset: Drop and recreate the schema; pass False to reuse a
+        dataset seeded by ``benchmarks.datagen``.
+    :return: Async engine bound to the schema.
+    """
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        if reset:
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+def make_sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+    return async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+async def seed_user(engine: AsyncEngine, email: str = "bench@example.com") -> User:
+    """
+    Insert a benchmark user.
+
+    :param engine: Target engine.
+    :param email: Email of the user.
+    :return: The persisted user.
+    """
+    async with make_sessionmaker(engine)() as session:
+        user = User(email=email, hashed_password="x")
+        session.add(user)
+        await session.commit()
+        return user
+
+
+async def seed_users(engine: AsyncEngine, count: int, password: str = BENCH_PASSWORD) -> List[int]:
+    """
+    Insert ``count`` users named by :func:`bench_email`, all with ``password``.
+
+    :param engine: Target engine.
+    :param count: Number of users.
+    :param password: Plain text password of every user.
+    :return: User IDs, in :func:`bench_email` index order.
+    """
+    from src.services.service_password import pwd_context
+
+    hashed_password = pwd_context.hash(password)  # one bcrypt round for all of them
+    emails = [bench_email(i) for i in range(count)]
+    async with engine.begin() as conn:
+        await conn.execute(insert(User), [{"email": email, "hashed_password": hashed_password} for email in emails])
+        ids = dict((await conn.execute(select(User.email, User.id).where(User.email.in_(emails)))).all())
+    return [ids[email] for email in emails]
+
+
+def contact_rows(user_id: int, count: int, seed: int = 42):
+    """
+    Yield deterministic contact rows for ``user_id``.
+
+    :param user_id: Owner of the contacts.
+    :param count: Number of rows to generate.
+    :param seed: Random seed, so every run produces the same dataset.
+    """
+    rnd = random.Random(seed)
+    first_names = ["Olena", "Taras", "Iryna", "Andrii", "Maria", "Petro", "Sofia", "Ivan"]
+    last_names = ["Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk"]
+    start = date(1960, 1, 1)
+    for i in range(count):
+        first = rnd.choice(first_names)
+        last = rnd.choice(last_names)
+        birthday = start + timedelta(days=rnd.randint(0, 365 * 45))
+        yield {
+            "first_name": first,
+            "last_name": f"{last}{i % 997}",
+            "email": f"{first.lower()}.{last.lower()}{i}@example.com",
+            "phone": f"+380{rnd.randint(100000000, 999999999)}",
+            "birthday": birthday,
+            "birthday_md": month_day(birthday),
+            "user_id": user_id,
+        }
+
+
+async def seed_contacts(engine: AsyncEngine, user_id: int, count: int, batch: int = 5000, seed: int = 42) -> None:
+    """
+    Bulk insert ``count`` contacts for ``user_id``.
+
+    Uses ``COPY`` on asyncpg and batched executemany INSERTs elsewhere.
+    Contacts are numbered from the user's change sequence like the
+    repository does, so none of them is left pending.
+
+    :param engine: Target engine.
+    :param user_id: Owner of the contacts.
+    :param count: Number of contacts to insert.
+    :param batch: Rows per statement.
+    :param seed: Random seed passed to :func:`contact_rows`.
+    """
+    async with engine.begin() as conn:
+        last_seq = await conn.scalar(
+            update(User).where(User.id == user_id).values(change_seq=User.change_seq + count).returning(User.change_seq)
+        )
+        first_seq = last_seq - count + 1
+        copy = None
+        if conn.dialect.driver == "asyncpg":
+            copy = (await conn.get_raw_connection()).driver_connection.copy_records_to_table
+
+        async def flush(rows):
+            if copy is not None:
+                columns = list(rows[0])
+                await copy(Contact.__tablename__, records=[tuple(row.values()) for row in rows], columns=columns)
+            else:
+                await conn.execute(insert(Contact), rows)
+
+        rows = []
+        for i, row in enumerate(contact_rows(user_id, count, seed)):
+            rows.append({**row, "change_seq": first_seq + i})
+            if len(rows) == batch:
+                await flush(rows)
+                rows = []
+        if rows:
+            await flush(rows)
+
+
+async def measure(fn: Callable[[], Awaitable], repeat: int = 20) -> List[float]:
+    """
+    Await ``fn`` ``repeat`` times and collect latencies.
+
+    :param fn: Coroutine factory to benchmark.
+    :param repeat: Number of runs.
+    :return: Latencies in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples.
+
+    :param samples: Latencies in milliseconds.
+    :return: Mean and p50/p95/p99 latencies.
+    """
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "mean_ms": round(statistics.fmean(ordered), 3),
+        "p50_ms": round(pct(50), 3),
+        "p95_ms": round(pct(95), 3),
+        "p99_ms": round(pct(99), 3),
+    }
+
+
+def throughput(samples: List[float], elapsed_seconds: float) -> float:
+    """
+    Requests per second for ``samples`` completed in ``elapsed_seconds``.
+    """
+    return round(len(samples) / elapsed_seconds, 2) if elapsed_seconds else 0.0
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, params: dict, results: Dict[str, dict], path: str | None = None) -> str:
+    """
+    Store benchmark results as JSON for :mod:`benchmarks.compare`.
+
+    :param name: Benchmark name, used in the default file name.
+    :param params: Parameters of the run (dataset size, concurrency, ...).
+    :param results: Summaries by case, see :func:`summarize`.
+    :param path: Output file; defaults to a timestamped file in
+        ``BENCH_RESULTS_DIR``.
+    :return: Path of the written file.
+    """
+    now = datetime.now(timezone.utc)
+    if path is None:
+        os.makedirs(BENCH_RESULTS_DIR, exist_ok=True)
+        path = os.path.join(BENCH_RESULTS_DIR, f"{name}-{now:%Y%m%dT%H%M%S}.json")
+    document = {
+        "benchmark": name,
+        "timestamp": now.isoformat(),
+        "git_commit": _git_commit(),
+        "database": make_url(BENCH_DB_URL).get_backend_name(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+    return path
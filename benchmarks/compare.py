@@ -0,0 +1,71 @@
+"""
+Compare two benchmark result files and fail on regressions.
+
+Usage::
+
+    python -m benchmarks.compare baseline.json current.json
+    python -m benchmarks.compare baseline.json current.json --metric p99_ms --threshold 0.2
+
+A case regresses when its latency ``--metric`` grows, or its throughput
+(``rps``, where present) drops, by more than ``--threshold`` (a
+fraction). Exits with status 1 if any case regressed, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+HIGHER_IS_BETTER = {"rps"}
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline: dict, current: dict, metric: str, threshold: float) -> list[tuple[str, str, float, float, float, bool]]:
+    """
+    Compare the cases present in both result documents.
+
+    :param baseline: Result document written by ``save_results``.
+    :param current: Result document to check against the baseline.
+    :param metric: Latency metric to compare, e.g. ``p95_ms``.
+    :param threshold: Allowed relative change before a case regresses.
+    :return: ``(case, metric, before, after, change, regressed)`` rows.
+    """
+    rows = []
+    for case, before in baseline["results"].items():
+        after = current["results"].get(case)
+        if after is None:
+            continue
+        for name in (metric, *(HIGHER_IS_BETTER & before.keys())):
+            if name not in before or name not in after or not before[name]:
+                continue
+            change = (after[name] - before[name]) / before[name]
+            worse = -change if name in HIGHER_IS_BETTER else change
+            rows.append((case, name, before[name], after[name], change, worse > threshold))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--metric", default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    baseline, current = load(args.baseline), load(args.current)
+    if baseline.get("database") != current.get("database"):
+        print(f"warning: comparing {baseline.get('database')} against {current.get('database')}")
+    rows = compare(baseline, current, args.metric, args.threshold)
+    for case, name, before, after, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{case:>26} {name:>7}: {before:>10} -> {after:>10} ({change:+.1%}) {flag}")
+    regressions = sum(row[-1] for row in rows)
+    print(f"{regressions} regression(s) over {args.threshold:.0%} "
+          f"({baseline.get('git_commit')} -> {current.get('git_commit')})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
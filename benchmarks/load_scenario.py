@@ -0,0 +1,159 @@
+"""
+Scripted load scenario: login → list → search → birthdays → update.
+
+Usage::
+
+    python -m benchmarks.load_scenario --vus 20 --iterations 25
+    python -m benchmarks.load_scenario --reuse --seeded-users 10
+    python -m benchmarks.load_scenario --base-url http://localhost:8000 --seeded-users 10
+
+Each virtual user logs in as one of the ``benchmarks.datagen`` users and
+then runs the list/search/birthdays/update flow ``--iterations`` times.
+By default the app runs in-process over ``httpx.ASGITransport`` against
+``BENCH_DB_URL``, seeding ``--seeded-users`` users with ``--contacts``
+contacts each unless ``--reuse`` is given. With ``--base-url`` the
+requests go to a running server, which must use a database seeded by
+``benchmarks.datagen`` and run with ``RATE_LIMIT_ENABLED=false``, since
+all virtual users log in from one IP. Prints throughput and p50/p95/p99
+per step and writes them as JSON for ``benchmarks.compare``. Requires
+Redis on the configured host, like the application itself.
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import (
+    BENCH_PASSWORD,
+    bench_email,
+    make_engine,
+    make_sessionmaker,
+    save_results,
+    seed_contacts,
+    seed_users,
+    summarize,
+    throughput,
+)
+
+SEARCH_TERMS = ("ann", "kov", "ivan", "maria", "son")
+
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, seeded_users: int, iterations: int):
+        self.client = client
+        self.seeded_users = seeded_users
+        self.iterations = iterations
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def step(self, name: str, method: str, url: str, **kwargs) -> httpx.Response | None:
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+        if response.is_error:
+            self.errors[name] += 1
+            return None
+        return response
+
+    async def virtual_user(self, index: int) -> None:
+        response = await self.step(
+            "login", "POST", "/api/auth/login",
+            data={"username": bench_email(index % self.seeded_users), "password": BENCH_PASSWORD},
+        )
+        if response is None:
+            return
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        for i in range(self.iterations):
+            response = await self.step("list", "GET", "/api/contacts/", params={"limit": 20, "skip": i * 20}, headers=headers)
+            await self.step("search", "GET", "/api/contacts/search/", params={"query": SEARCH_TERMS[i % len(SEARCH_TERMS)]}, headers=headers)
+            await self.step("birthdays", "GET", "/api/contacts/birthdays/upcoming", headers=headers)
+            if response is not None and response.json():
+                contact = response.json()[0]
+                body = {key: value for key, value in contact.items() if key != "id"}
+                body["phone"] = f"+380{index:03d}{i:06d}"
+                await self.step("update", "PUT", f"/api/contacts/{contact['id']}", json=body, headers=headers)
+
+
+def use_database(app, engine) -> None:
+    """
+    Point the in-process app at the benchmark engine.
+    """
+    from src.db.db import get_db, get_stream_session_factory, unit_of_work
+
+    session_maker = make_sessionmaker(engine)
+
+    async def override_get_db():
+        async with session_maker() as session:
+            async with unit_of_work(session):
+                yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_stream_session_factory] = lambda: session_maker
+
+
+async def main(args) -> None:
+    engine = None
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from main import app
+        from src.conf.config import config
+
+        config.RATE_LIMIT_ENABLED = args.rate_limit
+        engine = await make_engine(reset=not args.reuse)
+        if not args.reuse:
+            for user_id in await seed_users(engine, args.seeded_users):
+                await seed_contacts(engine, user_id, args.contacts, seed=user_id)
+        use_database(app, engine)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    async with client:
+        scenario = Scenario(client, args.seeded_users, args.iterations)
+        start = time.perf_counter()
+        await asyncio.gather(*(scenario.virtual_user(index) for index in range(args.vus)))
+        elapsed = time.perf_counter() - start
+
+    everything = [sample for samples in scenario.samples.values() for sample in samples]
+    results = {}
+    for name, samples in [*scenario.samples.items(), ("total", everything)]:
+        errors = sum(scenario.errors.values()) if name == "total" else scenario.errors[name]
+        results[name] = {
+            **summarize(samples),
+            "requests": len(samples),
+            "errors": errors,
+            "rps": throughput(samples, elapsed),
+        }
+        stats = results[name]
+        print(
+            f"{name:>10}: {stats['rps']} req/s p50={stats['p50_ms']} ms p95={stats['p95_ms']} ms "
+            f"p99={stats['p99_ms']} ms errors={errors}/{len(samples)}"
+        )
+    params = {
+        "vus": args.vus,
+        "iterations": args.iterations,
+        "seeded_users": args.seeded_users,
+        "contacts": None if args.reuse or args.base_url else args.contacts,
+        "target": args.base_url or "in-process",
+        "elapsed_s": round(elapsed, 3),
+    }
+    print(f"results: {save_results('load_scenario', params, results, args.output)}")
+    if engine is not None:
+        from src.services.service_password import password_hasher
+
+        password_hasher.shutdown()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vus", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=20, help="flows per virtual user after login")
+    parser.add_argument("--seeded-users", type=int, default=5)
+    parser.add_argument("--contacts", type=int, default=5000, help="contacts per seeded user")
+    parser.add_argument("--reuse", action="store_true", help="use the dataset seeded by benchmarks.datagen")
+    parser.add_argument("--base-url", help="run against a live server instead of in-process")
+    parser.add_argument("--rate-limit", action="store_true", help="keep rate limiting on in-process")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/load_scenario-<time>.json")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,48 @@
+"""
+Locust version of ``benchmarks.load_scenario`` for a running server.
+
+Usage::
+
+    pip install locust
+    locust -f benchmarks/locustfile.py --host http://localhost:8000 --users 50 --spawn-rate 10
+
+The server's database must be seeded with ``benchmarks.datagen``; set
+``BENCH_SEEDED_USERS`` to the number of seeded users.
+"""
+import itertools
+import os
+
+from locust import HttpUser, between, task
+
+# Same values as benchmarks.common and benchmarks.load_scenario; locust
+# loads this file on its own, without the repository on sys.path
+BENCH_PASSWORD = "bench-password"
+SEARCH_TERMS = ("ann", "kov", "ivan", "maria", "son")
+SEEDED_USERS = int(os.getenv("BENCH_SEEDED_USERS", "5"))
+_indexes = itertools.count()
+
+
+class ContactsUser(HttpUser):
+    wait_time = between(0.1, 0.5)
+
+    def on_start(self):
+        self.index = next(_indexes)
+        response = self.client.post(
+            "/api/auth/login",
+            data={"username": f"bench-user-{self.index % SEEDED_USERS}@example.com", "password": BENCH_PASSWORD},
+            name="login",
+        )
+        self.client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        self.iteration = 0
+
+    @task
+    def flow(self):
+        self.iteration += 1
+        response = self.client.get("/api/contacts/", params={"limit": 20, "skip": self.iteration % 50 * 20}, name="list")
+        self.client.get("/api/contacts/search/", params={"query": SEARCH_TERMS[self.iteration % len(SEARCH_TERMS)]}, name="search")
+        self.client.get("/api/contacts/birthdays/upcoming", name="birthdays")
+        contacts = response.json() if response.ok else []
+        if contacts:
+            body = {key: value for key, value in contacts[0].items() if key != "id"}
+            body["phone"] = f"+380{self.index:03d}{self.iteration:06d}"
+            self.client.put(f"/api/contacts/{contacts[0]['id']}", json=body, name="update")
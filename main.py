@@ -1,11 +1,49 @@
 
-from fastapi import FastAPI, Request, status
+import asyncio
+import math
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import FastAPI, Request, Response, status
 from starlette.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi.errors import RateLimitExceeded
-from src.api import api_contacts, api_users, api_auth
+from src.api import api_contacts, api_users, api_auth, api_metrics
+from src.conf.config import config
+from src.db.db import sessionmanager
+from src.db.instrumentation import QueryStatsMiddleware
+from src.services.service_auth import listen_for_user_invalidations
+from src.services.service_metrics import (
+    PrometheusMiddleware,
+    http_rate_limited,
+    mark_process_dead,
+    render_metrics,
+    route_template,
+)
+from src.services.service_password import password_hasher
+from src.services.service_rate_limit import RateLimitExceeded
+from src.services.services_email import email_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    health_checks = None
+    if sessionmanager.has_replicas:
+        health_checks = asyncio.create_task(
+            sessionmanager.run_health_checks(config.DB_REPLICA_HEALTH_INTERVAL)
+        )
+    user_invalidations = asyncio.create_task(listen_for_user_invalidations())
+    yield
+    user_invalidations.cancel()
+    await asyncio.gather(user_invalidations, return_exceptions=True)
+    if health_checks is not None:
+        health_checks.cancel()
+        with suppress(asyncio.CancelledError):
+            await health_checks
+    await email_queue.close()
+    password_hasher.shutdown()
+    await sessionmanager.close()
+    mark_process_dead()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -16,17 +54,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(QueryStatsMiddleware, server_timing=config.SERVER_TIMING_ENABLED)
+app.add_middleware(PrometheusMiddleware)
+
 # Rate limiting
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+    http_rate_limited.labels(route_template(request.scope)).inc()
     return JSONResponse(
         status_code=status.HTTP_429_TOO_MANY_REQUESTS,
         content={"error": "Перевищено ліміт запитів. Спробуйте пізніше."},
+        # Retry-After 0 would have clients retry at once
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
     )
 
 app.include_router(api_auth.router, prefix="/api")
 app.include_router(api_users.router, prefix="/api")
 app.include_router(api_contacts.router, prefix="/api")
+app.include_router(api_metrics.router, prefix="/api")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 if __name__ == "__main__":
     import uvicorn
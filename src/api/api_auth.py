@@ -1,30 +1,39 @@
 import secrets
 from datetime import timedelta, datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.db import get_db
+from src.conf.config import config
+from src.db.db import get_db, commit_or_flush, after_commit
 from src.db.models import PasswordResetToken
 from src.repository.repo_users import UserRepository
-from src.schemas import UserCreate, UserResponse, Token
+from src.schemas import UserCreate, UserResponse, Token, RefreshRequest
 from src.services.service_auth import (
+    CurrentUser,
+    get_current_user,
+    load_current_user,
     register_user,
-    pwd_context,
+    revoke_tokens,
     create_access_token,
-    hash_password,
 )
-from src.services.services_email import send_email
+from src.services.service_password import password_hasher
+from src.services.service_rate_limit import limiter
+from src.services.service_sessions import InvalidRefreshToken, refresh_sessions
+from src.services.services_email import email_queue
 
 router = APIRouter(prefix="/auth", tags=["auth"])
-limiter = Limiter(key_func=get_remote_address)
+password_reset_limit = limiter.limit(config.RATE_LIMIT_PASSWORD_RESET, "password_reset")
 
 
-@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/signup",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limiter.limit(config.RATE_LIMIT_SIGNUP, "signup"))],
+)
 async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
     repo = UserRepository(db)
     existing = await repo.get_by_email(user.email)
@@ -33,21 +42,50 @@ async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
     return await register_user(user, repo)
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(limiter.limit(config.RATE_LIMIT_LOGIN, "login"))])
 async def login(
+        request: Request,
         form_data: OAuth2PasswordRequestForm = Depends(),
         db: AsyncSession = Depends(get_db)
 ):
     repo = UserRepository(db)
     user = await repo.get_by_email(form_data.username)
-    if not user or not pwd_context.verify(form_data.password, user.hashed_password):
+    # Give the connection back to the pool while bcrypt runs
+    await db.close()
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    access_token = await create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token = await create_access_token(data=CurrentUser.from_user(user).claims())
+    session = await refresh_sessions.create(user.id, user.email, request.headers.get("user-agent", ""))
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": session.refresh_token}
+
+
+@router.post("/refresh", response_model=Token, dependencies=[Depends(limiter.limit(config.RATE_LIMIT_REFRESH, "refresh"))])
+async def refresh(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Renewal costs a Redis round trip and a cached user lookup, no bcrypt
+    try:
+        session = await refresh_sessions.rotate(body.refresh_token)
+    except InvalidRefreshToken:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    current_user = await load_current_user(session.email, db)
+    access_token = await create_access_token(data=current_user.claims())
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": session.refresh_token}
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: RefreshRequest):
+    await refresh_sessions.revoke(body.refresh_token)
+
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_all(current_user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    user = await UserRepository(db).bump_token_version(current_user.id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    await after_commit(db, lambda: revoke_tokens(user))
 
 
-@router.post("/request-password-reset")
+@router.post("/request-password-reset", dependencies=[Depends(password_reset_limit)])
 async def request_password_reset(user_email, db: AsyncSession = Depends(get_db)):
     user = await UserRepository(db).get_by_email(user_email)
     if not user:
@@ -58,19 +96,20 @@ async def request_password_reset(user_email, db: AsyncSession = Depends(get_db))
 
     reset_token = PasswordResetToken(email=user.email, token=token, expires_at=expires_at)
     db.add(reset_token)
-    await db.commit()
+    await commit_or_flush(db)
 
-    reset_link = f"{router}/reset-password?token={token}"
+    reset_link = f"{config.FRONTEND_URL}/reset-password?token={token}"
 
-    await send_email(
+    # Only mail the link once the token is stored
+    await after_commit(db, lambda: email_queue.enqueue(
         to_email=user.email,
         subject="Password Reset Request",
         body=f"Click here to reset your password: {reset_link}"
-    )
+    ))
 
     return {"message": "Password reset link sent to email"}
 
-@router.post("/reset-password")
+@router.post("/reset-password", dependencies=[Depends(password_reset_limit)])
 async def reset_password(token: str, new_password: str, db: AsyncSession = Depends(get_db)):
 
     stmt = select(PasswordResetToken).where(PasswordResetToken.token == token)
@@ -80,12 +119,13 @@ async def reset_password(token: str, new_password: str, db: AsyncSession = Depen
     if not token_entry or token_entry.expires_at < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user = await UserRepository(db).get_by_email(token_entry.get("email"))
+    hashed_password = await password_hasher.hash(new_password)
+    user = await UserRepository(db).update_password(token_entry.email, hashed_password)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    user.password = hash_password(new_password)
     await db.delete(token_entry)
-    await db.commit()
+    await commit_or_flush(db)
+    await after_commit(db, lambda: revoke_tokens(user))
 
     return {"message": "Password has been reset successfully"}
@@ -1,39 +1,129 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal
 
-from src.db.db import get_db
-from src.db.models import User
-from src.schemas import ContactCreate, ContactUpdate, ContactResponse
-from src.services.service_auth import get_current_user
-from src.services.service_contacts import ContactService
+from src.db.db import get_db, get_read_db, get_stream_session_factory
+from src.schemas import ContactCreate, ContactUpdate, ContactResponse, ContactListItem, ContactSort, ContactFilters, ContactChanges, ContactImportResult, ContactBatchRequest, ContactBatchResponse
+from src.services.service_auth import CurrentUser, get_token_user
+from src.services.service_contacts import ContactService, InvalidFieldsError, parse_fields
+from src.services.service_export import export_contacts as export_contacts_stream, EXPORT_EXTENSIONS, EXPORT_MEDIA_TYPES
+from src.services.service_import import detect_format, UnsupportedImportFormatError
+from src.services.service_pagination import InvalidCursorError
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 
+def _json(body: bytes, headers: dict | None = None) -> Response:
+    # Bodies are serialized by the service; returning a Response skips
+    # FastAPI's response_model validation and re-encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _fields(fields: str | None = Query(None, description="Comma-separated fields to return; extra_data only when listed")) -> tuple[str, ...]:
+    try:
+        return parse_fields(fields)
+    except InvalidFieldsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _if_none_match(request: Request) -> set[str]:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    header = request.headers.get("if-none-match", "")
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+def _accepts_gzip(request: Request) -> bool:
+    # Accept-Encoding lists codings with optional q-values; q=0 refuses a
+    # coding, and "*" covers every coding not listed by name
+    qualities = {}
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, *params = (item.strip() for item in part.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0))) > 0
+
+
 @router.post("/", response_model=ContactResponse, status_code=status.HTTP_201_CREATED)
-async def create_contact(body: ContactCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_contact(body: ContactCreate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
     return await service.create(body, current_user)
 
 
-@router.get("/", response_model=List[ContactResponse])
-async def get_all_contacts(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.post("/batch", response_model=ContactBatchResponse)
+async def batch_contacts(body: ContactBatchRequest, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
-    return await service.get_all(current_user, skip, limit)
+    return await service.batch(body, current_user)
 
 
-@router.get("/{contact_id}", response_model=ContactResponse)
-async def get_contact(contact_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.post("/import", response_model=ContactImportResult)
+async def import_contacts(request: Request, fmt: str | None = Query(None, alias="format"), db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_token_user)):
+    try:
+        fmt = detect_format(request.headers.get("content-type"), fmt)
+    except UnsupportedImportFormatError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+    service = ContactService(db)
+    return await service.import_contacts(request.stream(), fmt, current_user)
+
+
+@router.get("/", response_model=List[ContactListItem])
+async def get_all_contacts(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), cursor: str | None = None, sort: ContactSort = "id", filters: ContactFilters = Depends(), fields: tuple[str, ...] = Depends(_fields), db: AsyncSession = Depends(get_read_db), current_user: CurrentUser = Depends(get_token_user)):
+    service = ContactService(db)
+    try:
+        body, next_cursor = await service.get_all(current_user, skip, limit, cursor, fields, sort, filters)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return _json(body, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
+@router.get("/export")
+async def export_contacts(request: Request, fmt: Literal["csv", "jsonl", "vcard"] = Query("csv", alias="format"), session_factory = Depends(get_stream_session_factory), current_user: CurrentUser = Depends(get_token_user)):
+    compress = _accepts_gzip(request)
+    headers = {"Content-Disposition": f'attachment; filename="contacts.{EXPORT_EXTENSIONS[fmt]}"', "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_contacts_stream(session_factory, current_user, fmt, compress=compress),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=headers,
+    )
+
+
+@router.get("/changes", response_model=ContactChanges)
+async def contact_changes(since: str | None = None, limit: int = Query(500, ge=1, le=1000), db: AsyncSession = Depends(get_read_db), current_user: CurrentUser = Depends(get_token_user)):
+    service = ContactService(db)
+    try:
+        return _json(await service.changes(current_user, since, limit))
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+
+@router.get("/{contact_id}", response_model=ContactResponse, responses={304: {"description": "Not modified"}})
+async def get_contact(contact_id: int, request: Request, db: AsyncSession = Depends(get_read_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
     contact = await service.get_by_id(contact_id, current_user)
     if contact is None:
         raise HTTPException(status_code=404, detail="Contact not found")
-    return contact
+    # Strong ETag over the exact bytes sent; updated_at changes with every write
+    body = ContactResponse.model_validate(contact).model_dump_json().encode()
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if {etag, "*"} & _if_none_match(request):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.put("/{contact_id}", response_model=ContactResponse)
-async def update_contact(contact_id: int, body: ContactUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_contact(contact_id: int, body: ContactUpdate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
     contact = await service.update(contact_id, body, current_user)
     if contact is None:
@@ -42,7 +132,7 @@ async def update_contact(contact_id: int, body: ContactUpdate, db: AsyncSession
 
 
 @router.delete("/{contact_id}", response_model=ContactResponse)
-async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
     contact = await service.delete(contact_id, current_user)
     if contact is None:
@@ -50,13 +140,13 @@ async def delete_contact(contact_id: int, db: AsyncSession = Depends(get_db), cu
     return contact
 
 
-@router.get("/search/", response_model=List[ContactResponse])
-async def search_contacts(query: str, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/search/", response_model=List[ContactListItem])
+async def search_contacts(query: str, skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500), fields: tuple[str, ...] = Depends(_fields), db: AsyncSession = Depends(get_read_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
-    return await service.search(current_user, query)
+    return _json(await service.search(current_user, query, skip, limit, fields))
 
 
-@router.get("/birthdays/upcoming", response_model=List[ContactResponse])
-async def upcoming_birthdays(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/birthdays/upcoming", response_model=List[ContactListItem])
+async def upcoming_birthdays(fields: tuple[str, ...] = Depends(_fields), db: AsyncSession = Depends(get_read_db), current_user: CurrentUser = Depends(get_token_user)):
     service = ContactService(db)
-    return await service.upcoming_birthdays(current_user)
+    return _json(await service.upcoming_birthdays(current_user, fields))
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+
+from src.db.db import sessionmanager
+from src.db.instrumentation import query_fingerprints
+from src.services.service_auth import CurrentUser, get_current_user, ensure_is_admin
+from src.services.service_cache import cache_stats
+from src.services.service_password import password_hasher
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/db")
+async def db_pool_metrics(current_user: CurrentUser = Depends(get_current_user)):
+    ensure_is_admin(current_user)
+    return sessionmanager.pool_status()
+
+
+@router.get("/auth")
+async def password_hasher_metrics(current_user: CurrentUser = Depends(get_current_user)):
+    ensure_is_admin(current_user)
+    return password_hasher.stats()
+
+
+@router.get("/cache")
+async def cache_metrics(current_user: CurrentUser = Depends(get_current_user)):
+    ensure_is_admin(current_user)
+    return cache_stats.snapshot()
+
+
+@router.get("/queries")
+async def query_metrics(limit: int = 50, current_user: CurrentUser = Depends(get_current_user)):
+    ensure_is_admin(current_user)
+    return query_fingerprints.snapshot(limit)
@@ -1,41 +1,75 @@
-import os
+import logging
 
-from fastapi import APIRouter, Depends, UploadFile, File
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import redis.asyncio as redis
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import Request
-from src.db.db import get_db
-from src.db.models import User
+from src.db.db import get_db, after_commit
 from src.repository.repo_users import UserRepository
 from src.schemas import UserResponse
-from src.services.service_auth import get_current_user, ensure_is_admin
+from src.services.service_auth import CurrentUser, get_current_user, ensure_is_admin, invalidate_user
+from src.services.service_rate_limit import limiter
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/user", tags=["user"])
-limiter = Limiter(key_func=get_remote_address)
 
-@router.get("/me", response_model=UserResponse)
-@limiter.limit("5/minute")
-async def get_me( request: Request, current_user: User = Depends(get_current_user)):
+# The avatar form is read from the stream by read_avatar rather than parsed
+# by FastAPI, which would buffer it first, so it is documented by hand
+_AVATAR_FORM = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+async def _invalidate_after_update(email: str) -> None:
+    # The change is committed: a cache outage must not turn it into a 500.
+    # Stale copies expire with USER_CACHE_LOCAL_TTL / USER_CACHE_TTL.
+    try:
+        await invalidate_user(email)
+    except redis.RedisError:
+        logger.warning("Could not invalidate the cached user %s", email, exc_info=True)
+
+
+@router.get("/me", response_model=UserResponse, dependencies=[Depends(limiter.limit("5/minute", "me"))])
+async def get_me(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
 
-@router.post("/avatar")
+@router.post("/avatar", openapi_extra=_AVATAR_FORM)
 async def upload_avatar_route(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     ensure_is_admin(current_user)
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
 
-    temp_path = os.path.join(temp_dir, f"{current_user.id}_{file.filename}")
-    with open(temp_path, "wb") as f:
-        f.write(await file.read())
+    from src.services.service_cloudinary import (
+        read_avatar,
+        normalize_avatar,
+        upload_avatar,
+        AvatarTooLargeError,
+        UnsupportedAvatarError,
+    )
+    try:
+        image = await normalize_avatar(await read_avatar(request.headers, request.stream()))
+    except AvatarTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except UnsupportedAvatarError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
 
-    from src.services.service_cloudinary import upload_avatar
-    avatar_url = await upload_avatar(temp_path, public_id=f"user_avatars/{current_user.id}")
-    os.remove(temp_path)
+    avatar_url = await upload_avatar(image, public_id=f"user_avatars/{current_user.id}")
 
-    updated_user = await UserRepository(db).update_avatar(current_user, avatar_url)
+    updated_user = await UserRepository(db).update_avatar(current_user.id, avatar_url)
+    if updated_user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    await after_commit(db, lambda: _invalidate_after_update(updated_user.email))
     return {"avatar_url": updated_user.avatar_url}
@@ -16,6 +16,25 @@ class Config:
         f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
 
+    # DB pool, per worker process
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+    # Read replicas, comma separated async URLs
+    DB_REPLICA_URLS = [url for url in os.getenv("DB_REPLICA_URLS", "").split(",") if url]
+    DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")
+    DB_REPLICA_HEALTH_INTERVAL = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL", "10"))
+    DB_READ_YOUR_WRITES_SECONDS = float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+    # Query instrumentation
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    DB_QUERY_FINGERPRINTS_MAX = int(os.getenv("DB_QUERY_FINGERPRINTS_MAX", "500"))
+    SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
     # alembic
     SYNC_DB_URL = (
         f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
@@ -25,22 +44,54 @@ class Config:
     JWT_SECRET = os.getenv("JWT_SECRET")
     JWT_ALGORITHM = "HS256"
     JWT_EXPIRATION_SECONDS = 3600
+    # Authorize from token claims on hot routes instead of loading the user
+    AUTH_FAST_PATH = os.getenv("AUTH_FAST_PATH", "false").lower() == "true"
+    TOKEN_VERSION_REFRESH_SECONDS = float(os.getenv("TOKEN_VERSION_REFRESH_SECONDS", "5"))
+    REFRESH_TOKEN_TTL_SECONDS = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(30 * 24 * 3600)))
+
+    # PASSWORD HASHING
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
 
     # CLOUDINARY
     CLOUDINARY_CLOUD_NAME=os.getenv("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY=os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET=os.getenv("CLOUDINARY_API_SECRET")
+    CLOUDINARY_UPLOAD_PREFIX=os.getenv("CLOUDINARY_UPLOAD_PREFIX")
+
+    # AVATARS
+    AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+    AVATAR_CONTENT_TYPES = ("image/jpeg", "image/png", "image/gif", "image/webp")
+    AVATAR_SIZE = int(os.getenv("AVATAR_SIZE", "256"))
+    AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", "4"))
 
     # REDIS
     redis_host: str = "localhost"
     redis_port: int = 6379
+    CONTACT_CACHE_TTL = int(os.getenv("CONTACT_CACHE_TTL", "300"))
+    CONTACT_IMPORT_BATCH_SIZE = int(os.getenv("CONTACT_IMPORT_BATCH_SIZE", "1000"))
+    CONTACT_IMPORT_MAX_ERRORS = int(os.getenv("CONTACT_IMPORT_MAX_ERRORS", "100"))
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "600"))
+    USER_CACHE_LOCAL_TTL = float(os.getenv("USER_CACHE_LOCAL_TTL", "30"))
+    USER_CACHE_LOCAL_SIZE = int(os.getenv("USER_CACHE_LOCAL_SIZE", "10000"))
+
+    # RATE LIMITS, "<count>/<second|minute|hour|day>" per user or IP
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+    RATE_LIMIT_SIGNUP = os.getenv("RATE_LIMIT_SIGNUP", "5/minute")
+    RATE_LIMIT_REFRESH = os.getenv("RATE_LIMIT_REFRESH", "30/minute")
+    RATE_LIMIT_PASSWORD_RESET = os.getenv("RATE_LIMIT_PASSWORD_RESET", "5/hour")
 
     # SMTP
 
     SMTP_HOST=os.getenv("SMTP_HOST")
-    SMTP_PORT=os.getenv("SMTP_PORT")
+    SMTP_PORT=int(os.getenv("SMTP_PORT", "587"))
     SMTP_USER=os.getenv("SMTP_USER")
     SMTP_PASSWORD=os.getenv("SMTP_PASSWORD")
+    SMTP_USE_TLS=os.getenv("SMTP_USE_TLS", "true").lower() == "true"
     FRONTEND_URL=os.getenv("FRONTEND_URL")
 
+    # EMAIL QUEUE
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+    EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "5"))
+
 config = Config()
@@ -1,20 +1,256 @@
+import asyncio
 import contextlib
+import hashlib
+import itertools
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Sequence
 
+import redis.asyncio as redis
+from fastapi import Depends, Request
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
+    AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.conf.config import config
+from src.db.instrumentation import instrument_engine
+from src.services.service_cache import redis_client
+from src.services.service_metrics import db_pool_checked_out, db_pool_checkout_wait, db_pool_size
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts wait for a connection.
+
+    Only checkouts that find no idle connection and no overflow left are
+    counted: they block until another one is checked in. Checkouts that
+    take an idle connection or open a new one do not wait on the pool, so
+    connect time never ends up in the wait statistics.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _must_wait(self) -> bool:
+        return not self.checkedin() and -1 < self._max_overflow <= self.overflow()
+
+    def _do_get(self):
+        if not self._must_wait():
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            db_pool_checkout_wait.observe(waited)
+            self.wait_count += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def engine_options(url: str) -> dict:
+    """
+    Build ``create_async_engine`` keyword arguments from the config.
+
+    Pool settings only apply to server databases; SQLite keeps the
+    SQLAlchemy defaults.
+
+    :param url: Database URL.
+    :return: Keyword arguments for ``create_async_engine``.
+    """
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return {}
+    options = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+    if backend == "postgresql":
+        options["connect_args"] = {"prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+class WriteTrackingSession(Session):
+    """Session that flags itself in ``info["wrote"]`` once it modifies data."""
+
+
+@event.listens_for(WriteTrackingSession, "after_flush")
+def _flag_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(WriteTrackingSession, "do_orm_execute")
+def _flag_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+UNIT_OF_WORK = "unit_of_work"
+# Set in ``info`` of sessions bound to a read replica, whose rows may lag
+REPLICA = "replica"
+_AFTER_COMMIT = "after_commit"
+
+
+async def commit_or_flush(session: AsyncSession) -> None:
+    """
+    Make pending changes durable.
+
+    Commits, unless the session is in a :func:`unit_of_work`, in which
+    case the changes are only flushed and committed once at its end.
+
+    :param session: Session with pending changes.
+    """
+    if session.info.get(UNIT_OF_WORK):
+        await session.flush()
+    else:
+        await session.commit()
+
+
+async def after_commit(session: AsyncSession, callback: Callable[[], Awaitable]) -> None:
+    """
+    Run ``callback`` once the session's changes are committed.
+
+    Outside a :func:`unit_of_work` changes are committed as they are made,
+    so the callback runs right away.
+
+    :param session: Session whose commit to wait for.
+    :param callback: Coroutine factory, e.g. a cache invalidation.
+    """
+    if session.info.get(UNIT_OF_WORK):
+        session.info.setdefault(_AFTER_COMMIT, []).append(callback)
+    else:
+        await callback()
+
+
+@contextlib.asynccontextmanager
+async def unit_of_work(session: AsyncSession):
+    """
+    Commit everything done with ``session`` once, when the block exits.
+
+    Repositories only flush inside the block. Nothing is committed if the
+    block raises or did not write anything, and the callbacks registered
+    with :func:`after_commit` run after a successful commit.
+
+    :param session: Request-scoped session.
+    """
+    session.info[UNIT_OF_WORK] = True
+    try:
+        yield session
+        if session.in_transaction() and (
+            session.info.get("wrote") or session.new or session.dirty or session.deleted
+        ):
+            await session.commit()
+        for callback in session.info.pop(_AFTER_COMMIT, []):
+            await callback()
+    finally:
+        session.info.pop(_AFTER_COMMIT, None)
+        session.info.pop(UNIT_OF_WORK, None)
+
+
+def _export_pool_metrics(engine: AsyncEngine, name: str) -> None:
+    if isinstance(engine.pool, AsyncAdaptedQueuePool):
+        db_pool_size.labels(name).set(engine.pool.size())
+    checked_out = db_pool_checked_out.labels(name)
+    event.listen(engine.sync_engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine.sync_engine, "checkin", lambda *args: checked_out.dec())
+
+
+def _pool_status(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(
+            wait_count=pool.wait_count,
+            wait_seconds_total=round(pool.wait_seconds_total, 6),
+            wait_seconds_max=round(pool.wait_seconds_max, 6),
+        )
+    return status
+
+
+class _Replica:
+    def __init__(self, url: str, name: str, **engine_kwargs):
+        self.engine = create_async_engine(url, **engine_kwargs)
+        instrument_engine(self.engine)
+        _export_pool_metrics(self.engine, name)
+        self.session_maker = async_sessionmaker(
+            autoflush=False, autocommit=False, expire_on_commit=False, bind=self.engine
+        )
+        self.healthy = True
+
+    def checked_out(self) -> int:
+        pool = self.engine.pool
+        return pool.checkedout() if isinstance(pool, AsyncAdaptedQueuePool) else 0
+
 
 class DatabaseSessionManager:
-    def __init__(self, url: str):
-        self._engine: AsyncEngine | None = create_async_engine(url)
+    def __init__(
+        self,
+        url: str,
+        replica_urls: Sequence[str] = (),
+        replica_strategy: str = "round_robin",
+        sticky_seconds: float = 5.0,
+        sticky_client=redis_client,
+        **engine_kwargs,
+    ):
+        """
+        Initialize engines for the primary database and its read replicas.
+
+        :param url: Primary database URL.
+        :param replica_urls: Read replica URLs.
+        :param replica_strategy: ``round_robin`` or ``least_connections``.
+        :param sticky_seconds: How long a client reads from the primary
+            after it wrote something.
+        :param sticky_client: Async Redis client holding the recent
+            writers, shared by every worker process.
+        :param engine_kwargs: Extra ``create_async_engine`` arguments.
+        """
+        self._engine: AsyncEngine | None = create_async_engine(url, **engine_kwargs)
+        instrument_engine(self._engine)
+        _export_pool_metrics(self._engine, "primary")
         self._session_maker: async_sessionmaker = async_sessionmaker(
-            autoflush=False, autocommit=False, bind=self._engine
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+            bind=self._engine,
+            sync_session_class=WriteTrackingSession,
         )
+        self._replicas = [
+            _Replica(replica_url, f"replica{index}", **engine_kwargs)
+            for index, replica_url in enumerate(replica_urls)
+        ]
+        self._replica_strategy = replica_strategy
+        self._next_replica = itertools.count()
+        self._sticky_seconds = sticky_seconds
+        self._sticky_client = sticky_client
+
+    @property
+    def has_replicas(self) -> bool:
+        return bool(self._replicas)
 
     @contextlib.asynccontextmanager
     async def session(self):
@@ -29,8 +265,173 @@ class DatabaseSessionManager:
         finally:
             await session.close()
 
-sessionmanager = DatabaseSessionManager(config.DB_URL)
+    def _pick_replica(self) -> _Replica | None:
+        healthy = [replica for replica in self._replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self._replica_strategy == "least_connections":
+            return min(healthy, key=_Replica.checked_out)
+        return healthy[next(self._next_replica) % len(healthy)]
+
+    @contextlib.asynccontextmanager
+    async def read_session(self):
+        """
+        Open a session on a healthy read replica.
+
+        Falls back to the primary when no replica is configured or healthy.
+        """
+        replica = self._pick_replica()
+        if replica is None:
+            async with self.session() as session:
+                yield session
+            return
+        session = replica.session_maker()
+        session.info[REPLICA] = True
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    async def check_replicas(self, timeout: float = 2.0) -> None:
+        """
+        Probe every replica with ``SELECT 1`` and update its health flag.
+
+        :param timeout: Seconds to wait for each replica.
+        """
+        async def ping(replica: _Replica):
+            async with replica.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        async def probe(replica: _Replica):
+            try:
+                await asyncio.wait_for(ping(replica), timeout)
+                replica.healthy = True
+            except (SQLAlchemyError, OSError, asyncio.TimeoutError):
+                replica.healthy = False
+
+        await asyncio.gather(*(probe(replica) for replica in self._replicas))
+
+    async def run_health_checks(self, interval: float) -> None:
+        """
+        Check replica health every ``interval`` seconds until cancelled.
+
+        :param interval: Seconds between checks.
+        """
+        while True:
+            await self.check_replicas()
+            await asyncio.sleep(interval)
+
+    def _sticky_key(self, key: str) -> str:
+        # Client keys can be bearer tokens, keep them out of Redis
+        return f"rw:{hashlib.sha256(key.encode()).hexdigest()}"
+
+    async def mark_write(self, key: str) -> None:
+        """
+        Route reads of ``key`` to the primary for a while after a write.
+
+        The mark is a Redis key that expires after ``sticky_seconds``, so
+        the next read is routed to the primary whichever worker serves it.
+
+        :param key: Client identity, see :func:`client_key`.
+        """
+        if not self._replicas:
+            return
+        try:
+            await self._sticky_client.set(self._sticky_key(key), 1, px=int(self._sticky_seconds * 1000))
+        except redis.RedisError:
+            logger.warning("Could not mark a write for read-your-writes routing", exc_info=True)
+
+    async def is_sticky(self, key: str) -> bool:
+        """
+        Whether reads of ``key`` must still go to the primary.
+
+        Redis errors answer yes: the primary is never stale.
+
+        :param key: Client identity, see :func:`client_key`.
+        """
+        try:
+            return bool(await self._sticky_client.exists(self._sticky_key(key)))
+        except redis.RedisError:
+            logger.warning("Read-your-writes check failed, reading from the primary", exc_info=True)
+            return True
+
+    async def close(self):
+        """
+        Close every pooled connection.
+
+        The engines stay usable and reconnect lazily, so this is safe to
+        call from an application shutdown hook.
+        """
+        if self._engine is not None:
+            await self._engine.dispose()
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+    def pool_status(self) -> dict:
+        """
+        Snapshot of the connection pools of this worker process.
+
+        :return: Pool size, checked in/out and overflow connections and
+            checkout wait statistics of the primary, plus the same for
+            each replica together with its health.
+        """
+        status = {"pid": os.getpid(), **_pool_status(self._engine)}
+        if self._replicas:
+            status["replicas"] = [
+                {"healthy": replica.healthy, **_pool_status(replica.engine)}
+                for replica in self._replicas
+            ]
+        return status
+
+sessionmanager = DatabaseSessionManager(
+    config.DB_URL,
+    replica_urls=config.DB_REPLICA_URLS,
+    replica_strategy=config.DB_REPLICA_STRATEGY,
+    sticky_seconds=config.DB_READ_YOUR_WRITES_SECONDS,
+    **engine_options(config.DB_URL),
+)
+
 
-async def get_db():
+def client_key(request: Request) -> str:
+    """
+    Identify the client behind a request for read-your-writes routing.
+
+    :param request: Incoming request.
+    :return: The bearer token if present, else the client address.
+    """
+    return request.headers.get("authorization") or (request.client.host if request.client else "")
+
+
+async def get_db(request: Request):
     async with sessionmanager.session() as session:
-        yield session
\ No newline at end of file
+        async with unit_of_work(session):
+            yield session
+        if session.info.get("wrote"):
+            await sessionmanager.mark_write(client_key(request))
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Session for read-only endpoints.
+
+    Uses a read replica unless none is configured or the client wrote
+    recently, in which case the request's primary session is reused.
+    """
+    if not sessionmanager.has_replicas or await sessionmanager.is_sticky(client_key(request)):
+        yield db
+        return
+    async with sessionmanager.read_session() as session:
+        yield session
+
+
+async def get_stream_session_factory(request: Request):
+    """
+    Session factory for streaming responses.
+
+    Yield dependencies are finalized before a streaming body is sent, so
+    streams open their own session with the returned factory. It follows
+    the same replica and read-your-writes rules as :func:`get_read_db`.
+    """
+    if not sessionmanager.has_replicas or await sessionmanager.is_sticky(client_key(request)):
+        return sessionmanager.session
+    return sessionmanager.read_session
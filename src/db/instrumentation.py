@@ -0,0 +1,242 @@
+import contextlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.conf.config import config
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# Bind placeholders of every paramstyle, with an asyncpg cast if present
+_PLACEHOLDER = re.compile(r"(?:\$\?|%\(\w+\)s|(?<![:\w]):(?!:)\w+|\?)(?:::\w+)?")
+_IN_LIST = re.compile(r"\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normalize a SQL statement so that executions differing only in
+    literals, placeholders or IN-list length share one fingerprint.
+
+    :param statement: SQL as sent to the driver.
+    :return: Normalized statement.
+    """
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _STRING.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _PLACEHOLDER.sub("?", normalized)
+    normalized = _IN_LIST.sub("IN (...)", normalized)
+    return _VALUES_LIST.sub(r"\1, ...", normalized)
+
+
+@dataclass
+class RequestQueryStats:
+    """Statements executed on behalf of one request."""
+
+    count: int = 0
+    total_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_statement: str | None = None
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        """
+        Format the stats as a ``Server-Timing`` header value.
+
+        :return: Header value, durations in milliseconds.
+        """
+        return (
+            f'db;dur={self.total_seconds * 1000:.2f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_seconds * 1000:.2f}"
+        )
+
+
+_current_stats: ContextVar[RequestQueryStats | None] = ContextVar("request_query_stats", default=None)
+
+
+@contextlib.contextmanager
+def track_queries():
+    """
+    Collect the statements executed in the current context.
+
+    :return: The stats object, filled in as statements run.
+    """
+    stats = RequestQueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryFingerprints:
+    """
+    In-process totals per statement fingerprint.
+
+    Holds at most ``max_entries`` fingerprints; executions of further ones
+    are only counted in ``dropped``.
+    """
+
+    def __init__(self, max_entries: int, slow_seconds: float):
+        self.max_entries = max_entries
+        self.slow_seconds = slow_seconds
+        self.dropped = 0
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        key = fingerprint(statement)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self.dropped += 1
+                    return
+                entry = self._entries[key] = {"count": 0, "slow": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if seconds >= self.slow_seconds:
+                entry["slow"] += 1
+
+    def snapshot(self, limit: int = 50) -> dict:
+        """
+        Fingerprints that took the most time in total.
+
+        :param limit: Maximum number of fingerprints to return.
+        :return: Fingerprints with their count, slow count, total, mean
+            and max duration in milliseconds.
+        """
+        with self._lock:
+            items = sorted(self._entries.items(), key=lambda item: item[1]["total_seconds"], reverse=True)[:limit]
+        return {
+            "slow_query_ms": self.slow_seconds * 1000,
+            "dropped": self.dropped,
+            "statements": [
+                {
+                    "fingerprint": key,
+                    "count": entry["count"],
+                    "slow": entry["slow"],
+                    "total_ms": round(entry["total_seconds"] * 1000, 3),
+                    "mean_ms": round(entry["total_seconds"] * 1000 / entry["count"], 3),
+                    "max_ms": round(entry["max_seconds"] * 1000, 3),
+                }
+                for key, entry in items
+            ],
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.dropped = 0
+
+
+query_fingerprints = QueryFingerprints(config.DB_QUERY_FINGERPRINTS_MAX, config.DB_SLOW_QUERY_MS / 1000)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    query_fingerprints.record(statement, seconds)
+    if seconds >= query_fingerprints.slow_seconds:
+        logger.warning(
+            "Slow query (%.1f ms): %s",
+            seconds * 1000,
+            fingerprint(statement),
+            extra={"duration_ms": round(seconds * 1000, 3), "fingerprint": fingerprint(statement)},
+        )
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute; drop its start
+    # so the stack of a pooled connection does not grow with every error
+    if context.connection is not None:
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Time every statement executed through ``engine``.
+
+    :param engine: Engine to instrument.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that tracks the statements of each HTTP request.
+
+    Adds a ``Server-Timing`` header (when enabled) and logs one structured
+    line per request. Statements run while a streaming body is being sent
+    are not included.
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        with track_queries() as stats:
+            async def send_with_timing(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if self.server_timing:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"server-timing", stats.server_timing().encode()))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                logger.info(
+                    "%s %s %s: %d queries in %.1f ms",
+                    scope["method"],
+                    scope["path"],
+                    status_code,
+                    stats.count,
+                    stats.total_seconds * 1000,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "queries": stats.count,
+                        "db_ms": round(stats.total_seconds * 1000, 3),
+                        "slowest_ms": round(stats.slowest_seconds * 1000, 3),
+                        "slowest_query": fingerprint(stats.slowest_statement) if stats.slowest_statement else None,
+                    },
+                )
@@ -1,12 +1,28 @@
 import enum
-from datetime import date, datetime
-from sqlalchemy import String, Integer, Date, Text, Boolean, ForeignKey, Enum, DateTime
-from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, relationship
+from datetime import date, datetime, timezone
+from sqlalchemy import String, Integer, BigInteger, SmallInteger, Date, Text, Boolean, ForeignKey, Enum, DateTime, Index, DDL, event, func
+from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase, relationship, validates
 from typing import List, Optional
 
 class Base(DeclarativeBase):
     pass
 
+def month_day(value: date) -> int:
+    """
+    Encode a date as ``MMDD`` so birthdays sort by calendar day regardless of year.
+
+    :param value: Date to encode.
+    :return: ``month * 100 + day``.
+    """
+    return value.month * 100 + value.day
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _default_birthday_md(context) -> int:
+    return month_day(context.get_current_parameters()["birthday"])
+
 class UserRole(str, enum.Enum):
     USER = "user"
     ADMIN = "admin"
@@ -19,6 +35,10 @@ class User(Base):
     hashed_password: Mapped[str] = mapped_column(String)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Bumped to revoke every access token issued before
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    # Last change sequence number handed out to the user's contacts
+    change_seq: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
     avatar_url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     role: Mapped[UserRole] = mapped_column(
         Enum(UserRole, name="user_role", create_type=False),
@@ -31,18 +51,61 @@ class User(Base):
 
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        Index("ix_contacts_user_id_id", "user_id", "id"),
+        Index("ix_contacts_user_id_last_name_first_name", "user_id", "last_name", "first_name"),
+        Index("ix_contacts_user_id_email", "user_id", "email"),
+        Index("ix_contacts_user_id_first_name_id", "user_id", "first_name", "id"),
+        Index("ix_contacts_user_id_birthday_id", "user_id", "birthday", "id"),
+        Index("ix_contacts_user_id_birthday_md", "user_id", "birthday_md"),
+        Index("ix_contacts_user_id_change_seq", "user_id", "change_seq"),
+        # Trigram indexes serve the ILIKE '%q%' predicates of contact search
+        Index("ix_contacts_first_name_trgm", "first_name",
+              postgresql_using="gin", postgresql_ops={"first_name": "gin_trgm_ops"}),
+        Index("ix_contacts_last_name_trgm", "last_name",
+              postgresql_using="gin", postgresql_ops={"last_name": "gin_trgm_ops"}),
+        Index("ix_contacts_email_trgm", "email",
+              postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+    )
 
-    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    id: Mapped[int] = mapped_column(primary_key=True)
     first_name: Mapped[str] = mapped_column(String(50))
     last_name: Mapped[str] = mapped_column(String(50))
-    email: Mapped[str] = mapped_column(String(100), index=True)
+    email: Mapped[str] = mapped_column(String(100))
     phone: Mapped[str] = mapped_column(String(20))
     birthday: Mapped[date] = mapped_column(Date)
-    extra_data: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Birthday as MMDD, kept in sync with ``birthday`` for index range scans
+    birthday_md: Mapped[int] = mapped_column(SmallInteger, default=_default_birthday_md)
+    # Unbounded; only loaded when asked for (undefer / load_only)
+    extra_data: Mapped[str | None] = mapped_column(Text, nullable=True, deferred=True, deferred_raiseload=True)
+
+    # Timestamps have server defaults too, for COPY, which skips the Python ones
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+
+    # Sync metadata: every write takes the next number of the owner's
+    # sequence, deletes only set the tombstone
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow, onupdate=utcnow, server_default=func.now()
+    )
+    deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    change_seq: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
 
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     user: Mapped["User"] = relationship(back_populates="contacts")
 
+    @validates("birthday")
+    def _sync_birthday_md(self, key, value):
+        if value is not None:
+            self.birthday_md = month_day(value)
+        return value
+
+
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
 
 class PasswordResetToken(Base):
     __tablename__ = "password_reset_tokens"
@@ -1,11 +1,50 @@
-from typing import List, Any, Coroutine, Sequence
+import calendar
+from typing import List, Any, AsyncIterator, Coroutine, Sequence
 from datetime import date, timedelta
 
-from sqlalchemy import select, or_, func, Row, RowMapping
+from sqlalchemy import select, insert, update, delete, literal, or_, func, case, tuple_, Row, RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, undefer
+
+from src.db.db import commit_or_flush
+from src.db.models import Contact, User, month_day, utcnow
+from src.schemas import ContactCreate, ContactUpdate, ContactResponse, ContactFilters
+
+# Internal columns left out of streamed rows
+_STREAM_EXCLUDED = {"user_id", "birthday_md", "created_at", "updated_at", "deleted_at", "change_seq"}
+
+# change_seq of rows inserted by bulk_create(sequence=False) until
+# sequence_pending() numbers them; real numbers start at 1
+PENDING_SEQ = 0
+
+# ContactResponse fields in order. List reads leave out the unbounded
+# extra_data unless it is asked for.
+CONTACT_FIELDS = tuple(ContactResponse.model_fields)
+LIST_FIELDS = tuple(name for name in CONTACT_FIELDS if name != "extra_data")
+
+# Whitelisted list orders and their sort keys. Keys end with the ID, so they
+# are unique for keyset pagination, and each has a (user_id, ...) index.
+CONTACT_SORTS = {
+    "id": ("id",),
+    "last_name": ("last_name", "first_name", "id"),
+    "first_name": ("first_name", "id"),
+    "birthday": ("birthday", "id"),
+}
+
+# extra_data is deferred on the model; reads returning whole contacts load it
+_WITH_EXTRA_DATA = undefer(Contact.extra_data)
+
+
+def _select(as_rows: bool, fields: Sequence[str], *extra):
+    columns = [getattr(Contact, name) for name in fields]
+    if as_rows:
+        return select(*columns, *extra)
+    return select(Contact).options(load_only(*columns, *extra))
+
+
+def _fetch_all(result, as_rows: bool) -> Sequence[Contact] | Sequence[Row]:
+    return result.all() if as_rows else result.scalars().all()
 
-from src.db.models import Contact, User
-from src.schemas import ContactCreate, ContactUpdate
 
 class ContactRepository:
     def __init__(self, db: AsyncSession):
@@ -16,18 +55,120 @@ class ContactRepository:
         """
         self.db = db
 
-    async def get_all(self, user:User, skip: int = 0, limit: int = 100) -> Sequence[Contact]:
+    async def _reserve_change_seq(self, user:User, count: int = 1) -> int:
+        """
+        Reserve ``count`` consecutive numbers of the user's change sequence.
+
+        The counter lives on the user row, whose lock also orders
+        concurrent writers of the same user, so a change feed reader never
+        sees a number committed after a higher one.
+
+        The lock is held until the transaction ends and blocks every other
+        write to the user row: other contact writes of the user, password
+        changes and logout-all. Long transactions must reserve right
+        before they commit, see :meth:`sequence_pending`.
+
+        :param user: The owner of the contacts being written.
+        :param count: Numbers to reserve.
+        :return: The first reserved number.
+        """
+        stmt = (
+            update(User)
+            .where(User.id == user.id)
+            .values(change_seq=User.change_seq + count)
+            .returning(User.change_seq)
+            .execution_options(synchronize_session=False)
+        )
+        return await self.db.scalar(stmt) - count + 1
+
+    async def _release_change_seq(self, user:User, count: int = 1) -> None:
+        """
+        Give back the last ``count`` numbers reserved in this transaction.
+
+        The user row lock taken by :meth:`_reserve_change_seq` is still
+        held, so nobody reserved after them and the sequence stays
+        gap-free when a write matches no contact.
+
+        :param user: The owner of the contacts being written.
+        :param count: Unused numbers.
+        """
+        stmt = (
+            update(User)
+            .where(User.id == user.id)
+            .values(change_seq=User.change_seq - count)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(stmt)
+
+    async def get_all(
+        self,
+        user:User,
+        skip: int = 0,
+        limit: int = 100,
+        after: Sequence[Any] | None = None,
+        as_rows: bool = False,
+        fields: Sequence[str] = LIST_FIELDS,
+        sort: str = "id",
+        descending: bool = False,
+        filters: ContactFilters | None = None,
+    ) -> Sequence[Contact] | Sequence[Row]:
         """
-        Retrieve all contacts for a given user.
+        Retrieve all contacts for a given user in a whitelisted order.
+
+        When ``after`` is given the page starts right after that sort key
+        (keyset pagination): a row comparison such as
+        ``(last_name, first_name, id) > (...)`` lets the matching
+        ``(user_id, ...)`` index seek directly to the page instead of
+        scanning ``skip`` rows.
 
         :param user: The user who owns the contacts.
         :param skip: Number of records to skip.
         :param limit: Maximum number of records to return.
-        :return: A sequence of Contact objects.
+        :param after: Sort key of the last contact on the previous page.
+        :param as_rows: Return rows of the ``fields`` columns, followed by
+            the sort key columns, instead of Contact objects.
+        :param fields: ContactResponse fields to load, in response order;
+            Contact objects get the others deferred (``load_only``).
+        :param sort: A key of :data:`CONTACT_SORTS`.
+        :param descending: Reverse the order.
+        :param filters: Optional birthday month, email domain and creation
+            time filters.
+        :return: A sequence of Contact objects or rows.
         """
-        stmt = select(Contact).filter_by(user=user).offset(skip).limit(limit)
+        key = [getattr(Contact, name) for name in CONTACT_SORTS[sort]]
+        extra = [column.label(f"sort_{i}") for i, column in enumerate(key)] if as_rows else key
+        stmt = _select(as_rows, fields, *extra).where(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+        if filters is not None:
+            stmt = stmt.where(*_filter_clauses(filters))
+        if after is not None:
+            stmt = stmt.where(tuple_(*key) < tuple_(*after) if descending else tuple_(*key) > tuple_(*after))
+        stmt = stmt.order_by(*(column.desc() if descending else column for column in key)).limit(limit)
+        if skip:
+            stmt = stmt.offset(skip)
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return _fetch_all(result, as_rows)
+
+    async def stream_all(self, user:User, batch_size: int = 1000) -> AsyncIterator[Sequence[RowMapping]]:
+        """
+        Stream every contact of a user, ordered by ID, through a server-side cursor.
+
+        Rows are fetched ``batch_size`` at a time and returned as mappings
+        rather than ORM objects, so memory use does not grow with the
+        number of contacts.
+
+        :param user: The user who owns the contacts.
+        :param batch_size: Rows fetched per round trip.
+        :return: Async iterator of batches of contact rows.
+        """
+        stmt = (
+            select(*(column for column in Contact.__table__.columns if column.name not in _STREAM_EXCLUDED))
+            .where(Contact.user_id == user.id, Contact.deleted_at.is_(None))
+            .order_by(Contact.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await self.db.stream(stmt)
+        async for partition in result.mappings().partitions():
+            yield partition
 
     async def get_by_id(self, contact_id: int, user:User) -> Contact | None:
         """
@@ -37,7 +178,7 @@ class ContactRepository:
         :param user: The owner user.
         :return: Contact if found, else None.
         """
-        stmt = select(Contact).filter_by(id=contact_id, user=user)
+        stmt = select(Contact).filter_by(id=contact_id, user_id=user.id, deleted_at=None).options(_WITH_EXTRA_DATA)
         contact = await self.db.execute(stmt)
         return contact.scalar_one_or_none()
 
@@ -49,11 +190,88 @@ class ContactRepository:
         :param user: The user who creates the contact.
         :return: The created contact.
         """
-        contact = Contact(**body.model_dump(exclude_unset=True), user=user)
-        self.db.add(contact)
-        await self.db.commit()
-        await self.db.refresh(contact)
-        return await self.get_by_id(contact.id, user)
+        values = body.model_dump(exclude_unset=True)
+        change_seq = await self._reserve_change_seq(user)
+        stmt = (
+            insert(Contact)
+            .values(**values, birthday_md=month_day(body.birthday), user_id=user.id, change_seq=change_seq)
+            .returning(Contact)
+            .options(_WITH_EXTRA_DATA)
+        )
+        contact = await self.db.scalar(stmt)
+        await commit_or_flush(self.db)
+        return contact
+
+    async def bulk_create(self, bodies: Sequence[ContactCreate], user:User, sequence: bool = True) -> int:
+        """
+        Insert many contacts for the user without loading them back.
+
+        Uses ``COPY`` on asyncpg and a batched executemany INSERT elsewhere.
+        Does not commit.
+
+        :param bodies: Validated contact data.
+        :param user: The user who owns the contacts.
+        :param sequence: Reserve change numbers now. Pass False when more
+            batches follow in the same transaction, and call
+            :meth:`sequence_pending` once before committing.
+        :return: Number of inserted contacts.
+        """
+        if not bodies:
+            return 0
+        now = utcnow()
+        first_seq = await self._reserve_change_seq(user, len(bodies)) if sequence else None
+        rows = [
+            {
+                **body.model_dump(),
+                "birthday_md": month_day(body.birthday),
+                "user_id": user.id,
+                "change_seq": PENDING_SEQ if first_seq is None else first_seq + i,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i, body in enumerate(bodies)
+        ]
+        connection = await self.db.connection()
+        if connection.dialect.driver == "asyncpg":
+            raw = await connection.get_raw_connection()
+            columns = list(rows[0])
+            await raw.driver_connection.copy_records_to_table(
+                Contact.__tablename__, records=[tuple(row[c] for c in columns) for row in rows], columns=columns
+            )
+            # COPY bypasses the ORM events that mark the session as written
+            self.db.info["wrote"] = True
+        else:
+            await self.db.execute(insert(Contact), rows)
+        return len(rows)
+
+    async def sequence_pending(self, user:User) -> int:
+        """
+        Number the contacts inserted with ``bulk_create(sequence=False)``.
+
+        Reserves the change numbers, and so takes the user row lock, only
+        now, so it is held from here to the commit rather than for the
+        whole import. Rows are numbered in insertion (ID) order.
+        Does not commit.
+
+        :param user: The owner of the contacts.
+        :return: Number of contacts numbered.
+        """
+        pending = (Contact.user_id == user.id, Contact.change_seq == PENDING_SEQ)
+        count = await self.db.scalar(select(func.count()).where(*pending))
+        if not count:
+            return 0
+        first_seq = await self._reserve_change_seq(user, count)
+        numbered = select(
+            Contact.id, (func.row_number().over(order_by=Contact.id) + (first_seq - 1)).label("seq")
+        ).where(*pending).subquery()
+        stmt = (
+            update(Contact)
+            .where(Contact.id == numbered.c.id)
+            .values(change_seq=numbered.c.seq)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.execute(stmt)
+        return count
 
     async def update(self, contact_id: int, body: ContactUpdate, user:User) -> Contact | None:
         """
@@ -64,62 +282,274 @@ class ContactRepository:
         :param user: The contact owner.
         :return: The updated contact or None if not found.
         """
-        contact = await self.get_by_id(contact_id, user)
+        change_seq = await self._reserve_change_seq(user)
+        stmt = (
+            update(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at.is_(None))
+            .values(**body.model_dump(), birthday_md=month_day(body.birthday), change_seq=change_seq)
+            .returning(Contact)
+            .options(_WITH_EXTRA_DATA)
+            .execution_options(synchronize_session="fetch")
+        )
+        contact = await self.db.scalar(stmt)
         if contact:
-            for field, value in body.model_dump().items():
-                setattr(contact, field, value)
-            await self.db.commit()
-            await self.db.refresh(contact)
+            await commit_or_flush(self.db)
+        else:
+            await self._release_change_seq(user)
         return contact
 
     async def delete(self, contact_id: int, user:User) -> Contact | None:
         """
         Delete a contact by ID.
 
+        The row stays behind as a tombstone (``deleted_at`` set) so the
+        change feed can report the deletion.
+
         :param contact_id: The ID of the contact to delete.
         :param user: The contact owner.
         :return: The deleted contact or None if not found.
         """
-        contact = await self.get_by_id(contact_id, user)
+        change_seq = await self._reserve_change_seq(user)
+        stmt = (
+            update(Contact)
+            .where(Contact.id == contact_id, Contact.user_id == user.id, Contact.deleted_at.is_(None))
+            .values(deleted_at=utcnow(), change_seq=change_seq)
+            .returning(Contact)
+            .options(_WITH_EXTRA_DATA)
+            .execution_options(synchronize_session="fetch")
+        )
+        contact = await self.db.scalar(stmt)
         if contact:
-            await self.db.delete(contact)
-            await self.db.commit()
+            await commit_or_flush(self.db)
+        else:
+            await self._release_change_seq(user)
         return contact
 
-    async def search(self, user:User, query: str) -> Sequence[Contact]:
+    async def search(
+        self,
+        user:User,
+        query: str,
+        skip: int = 0,
+        limit: int = 50,
+        as_rows: bool = False,
+        fields: Sequence[str] = LIST_FIELDS,
+    ) -> Sequence[Contact] | Sequence[Row]:
         """
         Search for contacts matching a query string.
 
+        On PostgreSQL the ILIKE predicates are served by the pg_trgm GIN
+        indexes and results are ranked by trigram similarity. Other
+        dialects fall back to ranking prefix matches first.
+
         :param user: The owner of the contacts.
         :param query: Search string (name/email).
-        :return: A sequence of matching contacts.
-        """
-        stmt = select(Contact).where(
-            Contact.user_id == user.id).where(
-            or_(
-                Contact.first_name.ilike(f"%{query}%"),
-                Contact.last_name.ilike(f"%{query}%"),
-                Contact.email.ilike(f"%{query}%")
-            )
+        :param skip: Number of ranked results to skip.
+        :param limit: Maximum number of results to return.
+        :param as_rows: Return rows instead of Contact objects, see :meth:`get_all`.
+        :param fields: Fields to load, see :meth:`get_all`.
+        :return: A sequence of matching contacts, best matches first.
+        """
+        columns = (Contact.first_name, Contact.last_name, Contact.email)
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = _select(as_rows, fields).where(
+            Contact.user_id == user.id, Contact.deleted_at.is_(None)).where(
+            or_(*(column.ilike(f"%{escaped}%", escape="\\") for column in columns))
         )
+        if self.db.get_bind().dialect.name == "postgresql":
+            rank = func.greatest(*(func.similarity(column, query) for column in columns)).desc()
+        else:
+            rank = case(
+                (or_(*(column.ilike(f"{escaped}%", escape="\\") for column in columns)), 0),
+                else_=1,
+            )
+        stmt = stmt.order_by(rank, Contact.id).limit(limit)
+        if skip:
+            stmt = stmt.offset(skip)
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return _fetch_all(result, as_rows)
 
-    async def upcoming_birthdays(self, user:User) -> Sequence[Contact]:
+    async def upcoming_birthdays(
+        self,
+        user:User,
+        today: date | None = None,
+        days: int = 7,
+        as_rows: bool = False,
+        fields: Sequence[str] = LIST_FIELDS,
+    ) -> Sequence[Contact] | Sequence[Row]:
         """
-        Get contacts with birthdays in the next 7 days.
+        Get contacts with birthdays in the next ``days`` days.
+
+        Filters on the indexed ``birthday_md`` column, splitting the range in
+        two when the window wraps from December into January. February 29
+        birthdays are included on February 28 in non-leap years.
 
         :param user: The owner of the contacts.
-        :return: A sequence of contacts with upcoming birthdays.
-        """
-        today = date.today()
-        end = today + timedelta(days=7)
-        stmt = select(Contact).where(
-            Contact.user_id == user.id).where(
-            func.date_part('doy', Contact.birthday).between(
-                func.date_part('doy', today),
-                func.date_part('doy', end)
+        :param today: First day of the window, defaults to the current date.
+        :param days: Length of the window in days.
+        :param as_rows: Return rows instead of Contact objects, see :meth:`get_all`.
+        :param fields: Fields to load, see :meth:`get_all`.
+        :return: A sequence of contacts ordered by upcoming birthday.
+        """
+        today = today or date.today()
+        end = today + timedelta(days=days)
+        start_md, end_md = month_day(today), month_day(end)
+        if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+            end_md = month_day(date(2000, 2, 29))
+
+        if start_md <= end_md:
+            in_window = Contact.birthday_md.between(start_md, end_md)
+        else:
+            in_window = or_(Contact.birthday_md >= start_md, Contact.birthday_md <= end_md)
+        stmt = _select(as_rows, fields).where(
+            Contact.user_id == user.id, Contact.deleted_at.is_(None)).where(
+            in_window
+        ).order_by(case((Contact.birthday_md < start_md, 1), else_=0), Contact.birthday_md, Contact.id)
+        result = await self.db.execute(stmt)
+        return _fetch_all(result, as_rows)
+
+    async def batch(
+        self, creates: Sequence[ContactCreate], updates: dict[int, ContactUpdate], delete_ids: Sequence[int], user:User
+    ) -> tuple[list[Contact], dict[int, Contact], dict[int, Contact]]:
+        """
+        Apply many creates, updates and deletes with one statement each.
+
+        Updates are a single ``UPDATE ... WHERE id IN`` with per-row values
+        picked by ``CASE``; creates and deletes use RETURNING, so nothing is
+        read back separately. Deletes leave tombstones, see :meth:`delete`.
+        Contacts of other users, deleted ones and repeated IDs are left
+        untouched and simply missing from the result, without using up
+        change numbers. Does not commit.
+
+        :param creates: Data of the contacts to create.
+        :param updates: New data by contact ID.
+        :param delete_ids: IDs of the contacts to delete.
+        :param user: The contact owner.
+        :return: Created contacts in input order, and updated and deleted
+            contacts by ID.
+        """
+        total = len(creates) + len(updates) + len(delete_ids)
+        if not total:
+            return [], {}, {}
+        # One block of sequence numbers for the whole batch
+        first_seq = await self._reserve_change_seq(user, total)
+        if updates or delete_ids:
+            # Every writer of the user's contacts reserves first, so the
+            # row lock taken above keeps this set valid until commit
+            stmt = select(Contact.id).where(
+                Contact.user_id == user.id, Contact.id.in_([*updates, *delete_ids]), Contact.deleted_at.is_(None)
             )
-        )
+            live = set((await self.db.scalars(stmt)).all())
+            updates = {contact_id: body for contact_id, body in updates.items() if contact_id in live}
+            delete_ids = [contact_id for contact_id in dict.fromkeys(delete_ids) if contact_id in live]
+            unused = total - len(creates) - len(updates) - len(delete_ids)
+            if unused:
+                await self._release_change_seq(user, unused)
+        seqs = iter(range(first_seq, 1 << 62))
+
+        created = []
+        if creates:
+            rows = [
+                {**body.model_dump(), "birthday_md": month_day(body.birthday), "user_id": user.id, "change_seq": next(seqs)}
+                for body in creates
+            ]
+            stmt = insert(Contact).returning(Contact, sort_by_parameter_order=True).options(_WITH_EXTRA_DATA)
+            result = await self.db.scalars(stmt, rows)
+            created = list(result.all())
+
+        updated = {}
+        if updates:
+            columns = Contact.__table__.columns
+            # Typed literals so drivers that need it (asyncpg) get explicit casts
+            values = {
+                field: case(
+                    {
+                        contact_id: literal(getattr(body, field), columns[field].type)
+                        for contact_id, body in updates.items()
+                    },
+                    value=Contact.id,
+                )
+                for field in ContactUpdate.model_fields
+            }
+            values["birthday_md"] = case(
+                {
+                    contact_id: literal(month_day(body.birthday), columns.birthday_md.type)
+                    for contact_id, body in updates.items()
+                },
+                value=Contact.id,
+            )
+            values["change_seq"] = _seq_case(updates, seqs)
+            stmt = (
+                update(Contact)
+                .where(Contact.user_id == user.id, Contact.id.in_(updates), Contact.deleted_at.is_(None))
+                .values(values)
+                .returning(Contact)
+                .options(_WITH_EXTRA_DATA)
+                .execution_options(synchronize_session="fetch")
+            )
+            updated = {contact.id: contact for contact in (await self.db.scalars(stmt)).all()}
+
+        deleted = {}
+        if delete_ids:
+            stmt = (
+                update(Contact)
+                .where(Contact.user_id == user.id, Contact.id.in_(delete_ids), Contact.deleted_at.is_(None))
+                .values(deleted_at=utcnow(), change_seq=_seq_case(delete_ids, seqs))
+                .returning(Contact)
+                .options(_WITH_EXTRA_DATA)
+                .execution_options(synchronize_session="fetch")
+            )
+            deleted = {contact.id: contact for contact in (await self.db.scalars(stmt)).all()}
+        return created, updated, deleted
+
+    async def changes(
+        self, user:User, since: int = 0, limit: int = 500, as_rows: bool = False
+    ) -> Sequence[Contact] | Sequence[Row]:
+        """
+        Contacts changed after a point of the user's change sequence.
+
+        Includes tombstones of deleted contacts, except on a full sync
+        (``since`` 0) where only live contacts matter. Served by the
+        ``(user_id, change_seq)`` index.
+
+        :param user: The owner of the contacts.
+        :param since: Last change sequence number the client has seen.
+        :param limit: Maximum number of contacts to return.
+        :param as_rows: Return rows of all response columns followed by
+            ``deleted_at`` and ``change_seq``, see :meth:`get_all`.
+        :return: Changed contacts in change order.
+        """
+        stmt = _select(as_rows, CONTACT_FIELDS, Contact.deleted_at, Contact.change_seq).where(Contact.user_id == user.id)
+        if since:
+            stmt = stmt.where(Contact.change_seq > since)
+        else:
+            stmt = stmt.where(Contact.deleted_at.is_(None))
+        stmt = stmt.order_by(Contact.change_seq, Contact.id).limit(limit)
         result = await self.db.execute(stmt)
-        return result.scalars().all()
\ No newline at end of file
+        return _fetch_all(result, as_rows)
+
+
+def _month_window(first: int, last: int):
+    start, end = first * 100 + 1, last * 100 + 31
+    if first <= last:
+        return Contact.birthday_md.between(start, end)
+    return or_(Contact.birthday_md >= start, Contact.birthday_md <= end)
+
+
+def _filter_clauses(filters: ContactFilters) -> list:
+    clauses = []
+    if filters.birthday_month_from:
+        clauses.append(_month_window(filters.birthday_month_from, filters.birthday_month_to))
+    if filters.email_domain:
+        # Served by the email trigram index on PostgreSQL
+        domain = filters.email_domain.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        clauses.append(Contact.email.ilike(f"%@{domain}", escape="\\"))
+    if filters.created_after:
+        clauses.append(Contact.created_at > filters.created_after)
+    return clauses
+
+
+def _seq_case(ids, seqs):
+    return case(
+        {contact_id: literal(next(seqs), Contact.__table__.columns.change_seq.type) for contact_id in ids},
+        value=Contact.id,
+    )
@@ -1,5 +1,6 @@
-from sqlalchemy import select
+from sqlalchemy import select, insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from src.db.db import commit_or_flush
 from src.db.models import User
 
 class UserRepository:
@@ -22,6 +23,18 @@ class UserRepository:
         result = await self.db.execute(stmt)
         return result.scalar_one_or_none()
 
+    async def token_versions(self) -> dict[int, int]:
+        """
+        Token versions of the users who ever revoked their tokens.
+
+        Reads the whole users table; meant for rebuilding the Redis copy,
+        not for requests.
+
+        :return: Mapping of user ID to token version, for versions above 0.
+        """
+        result = await self.db.execute(select(User.id, User.token_version).where(User.token_version > 0))
+        return dict(result.all())
+
     async def create_user(self, email: str, hashed_password: str) -> User:
         """
         Create a new user with hashed password.
@@ -30,21 +43,58 @@ class UserRepository:
         :param hashed_password: Password hash.
         :return: The created User object.
         """
-        user = User(email=email, hashed_password=hashed_password)
-        self.db.add(user)
-        await self.db.commit()
-        await self.db.refresh(user)
+        stmt = insert(User).values(email=email, hashed_password=hashed_password).returning(User)
+        user = await self.db.scalar(stmt)
+        await commit_or_flush(self.db)
         return user
 
-    async def update_avatar(self, user: User, avatar_url: str) -> User:
+    async def update_avatar(self, user_id: int, avatar_url: str) -> User | None:
         """
         Update the avatar URL of a user.
 
-        :param user: The user to update.
+        :param user_id: ID of the user to update.
         :param avatar_url: New avatar URL.
-        :return: The updated User object.
+        :return: The updated User object, or None if there is no such user.
+        """
+        stmt = update(User).where(User.id == user_id).values(avatar_url=avatar_url).returning(User)
+        user = await self.db.scalar(stmt)
+        if user:
+            await commit_or_flush(self.db)
+        return user
+
+    async def update_password(self, email: str, hashed_password: str) -> User | None:
         """
-        user.avatar_url = avatar_url
-        await self.db.commit()
-        await self.db.refresh(user)
-        return user
\ No newline at end of file
+        Replace the password hash of a user and revoke their access tokens.
+
+        :param email: Email of the user.
+        :param hashed_password: New password hash.
+        :return: The updated User object, or None if there is no such user.
+        """
+        stmt = (
+            update(User)
+            .where(User.email == email)
+            .values(hashed_password=hashed_password, token_version=User.token_version + 1)
+            .returning(User)
+        )
+        user = await self.db.scalar(stmt)
+        if user:
+            await commit_or_flush(self.db)
+        return user
+
+    async def bump_token_version(self, user_id: int) -> User | None:
+        """
+        Revoke every access token issued to a user so far.
+
+        :param user_id: ID of the user.
+        :return: The updated User object, or None if there is no such user.
+        """
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(token_version=User.token_version + 1)
+            .returning(User)
+        )
+        user = await self.db.scalar(stmt)
+        if user:
+            await commit_or_flush(self.db)
+        return user
@@ -1,6 +1,6 @@
-from datetime import date
-from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from datetime import date, datetime
+from pydantic import BaseModel, EmailStr, Field, create_model, model_validator
+from typing import Annotated, List, Literal, Optional, Union
 from enum import Enum
 
 
@@ -21,10 +21,87 @@ class ContactUpdate(ContactBase):
 
 class ContactResponse(ContactBase):
     id: int
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
 
+# List item with only the fields picked by ``fields=``; the ID is always present
+ContactListItem = create_model(
+    "ContactListItem",
+    **{
+        name: (field.annotation, ...) if name == "id" else (Optional[field.annotation], None)
+        for name, field in ContactResponse.model_fields.items()
+    },
+)
+
+# Orders of contact lists; a leading "-" sorts descending
+ContactSort = Literal[
+    "id", "-id", "last_name", "-last_name", "first_name", "-first_name", "birthday", "-birthday"
+]
+
+class ContactFilters(BaseModel):
+    birthday_month_from: Optional[int] = Field(None, ge=1, le=12)
+    birthday_month_to: Optional[int] = Field(None, ge=1, le=12)
+    email_domain: Optional[str] = Field(None, max_length=100, pattern=r"^[A-Za-z0-9.-]+$")
+    created_after: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def single_month(self):
+        # One bound alone selects that month; from > to wraps over the new year
+        self.birthday_month_from = self.birthday_month_from or self.birthday_month_to
+        self.birthday_month_to = self.birthday_month_to or self.birthday_month_from
+        return self
+
+class ContactChanges(BaseModel):
+    changed: List[ContactResponse]
+    deleted: List[int]
+    next_token: str
+    has_more: bool
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ContactImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+
+class BatchCreate(BaseModel):
+    op: Literal["create"]
+    data: ContactCreate
+
+class BatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    data: ContactUpdate
+
+class BatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+ContactBatchOperation = Annotated[Union[BatchCreate, BatchUpdate, BatchDelete], Field(discriminator="op")]
+
+class ContactBatchRequest(BaseModel):
+    operations: List[ContactBatchOperation] = Field(min_length=1, max_length=500)
+
+    @model_validator(mode="after")
+    def unique_ids(self):
+        ids = [operation.id for operation in self.operations if not isinstance(operation, BatchCreate)]
+        if len(ids) != len(set(ids)):
+            raise ValueError("Each contact ID may appear in only one operation")
+        return self
+
+class ContactBatchResult(BaseModel):
+    index: int
+    op: Literal["create", "update", "delete"]
+    status: Literal["created", "updated", "deleted", "not_found"]
+    contact: Optional[ContactResponse] = None
+
+class ContactBatchResponse(BaseModel):
+    results: List[ContactBatchResult]
+
 # User
 class UserBase(BaseModel):
     email: EmailStr
@@ -52,3 +129,7 @@ class LoginModel(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
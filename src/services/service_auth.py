@@ -1,9 +1,15 @@
+import asyncio
 import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable
 
-from passlib.context import CryptContext
+import redis.asyncio as redis
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, timezone
 from typing import Optional
@@ -11,13 +17,224 @@ from typing import Optional
 from src.conf.config import config
 from src.schemas import UserCreate
 from src.repository.repo_users import UserRepository
-from src.db.db import get_db
+from src.db.db import get_db, sessionmanager
 from src.db.models import User, UserRole
-from src.services.service_cache import redis_client
+from src.services.service_cache import LocalTTLCache, cache_stats, redis_client
+from src.services.service_password import pwd_context, password_hasher
+from src.services.service_sessions import refresh_sessions
+
+logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+USER_INVALIDATION_CHANNEL = "user:invalidate"
+TOKEN_VERSIONS_KEY = "user:token_versions"
+# Present in the hash once it was rebuilt from the database; a hash
+# without it was flushed or evicted and may be missing revocations
+_LOADED_FIELD = "loaded"
+
+# Raises users' token versions (ARGV[2..] as id, version pairs), never
+# lowers them, so racing revocations settle on the highest one. ARGV[1]
+# is 1 when the pairs are a full rebuild from the database.
+_RAISE_TOKEN_VERSIONS = """
+for i = 2, #ARGV, 2 do
+    local current = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    if tonumber(ARGV[i + 1]) > current then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+if ARGV[1] == '1' then
+    redis.call('HSET', KEYS[1], '""" + _LOADED_FIELD + """', 1)
+end
+return 1
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    """
+    Authenticated user as seen by request handlers.
+
+    A plain immutable snapshot of the user row without the password hash,
+    cheap to cache and share between requests. Load the ``User`` row
+    through ``UserRepository`` when it has to be modified.
+    """
+
+    id: int
+    email: str
+    avatar_url: str | None
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        """
+        Snapshot an ORM user.
+
+        :param user: User row.
+        :return: The principal.
+        """
+        return cls(
+            id=user.id,
+            email=user.email,
+            avatar_url=user.avatar_url,
+            role=user.role,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            token_version=user.token_version,
+        )
+
+    def claims(self) -> dict:
+        """
+        Access token claims carrying everything but the avatar.
+
+        :return: Claims for :func:`create_access_token`.
+        """
+        return {
+            "sub": self.email,
+            "uid": self.id,
+            "role": self.role.value,
+            "act": self.is_active,
+            "vfd": self.is_verified,
+            "tv": self.token_version,
+        }
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> "CurrentUser | None":
+        """
+        Rebuild the user from access token claims.
+
+        :param payload: Decoded token.
+        :return: The principal without ``avatar_url``, or None for tokens
+            issued without the claims.
+        """
+        try:
+            return cls(
+                id=payload["uid"],
+                email=payload["sub"],
+                avatar_url=None,
+                role=UserRole(payload["role"]),
+                is_active=payload["act"],
+                is_verified=payload["vfd"],
+                token_version=payload["tv"],
+            )
+        except (KeyError, ValueError):
+            return None
+
+    def to_json(self) -> str:
+        return json.dumps({**asdict(self), "role": self.role.value})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "CurrentUser":
+        data = json.loads(raw)
+        data["role"] = UserRole(data["role"])
+        return cls(**data)
+
+
+class TokenVersions:
+    """
+    Per-worker snapshot of users' token versions.
+
+    Only users who revoked their tokens have an entry in the Redis hash
+    ``TOKEN_VERSIONS_KEY``, so the map stays small and is reloaded with a
+    single HGETALL every ``refresh_interval`` seconds rather than read per
+    request. A revocation reaches the other workers within that interval.
+
+    The database stays the source of truth: when the hash was flushed or
+    evicted, the next refresh rebuilds it from the users table.
+    """
+
+    def __init__(
+        self,
+        client,
+        refresh_interval: float,
+        key: str = TOKEN_VERSIONS_KEY,
+        load: Callable[[], Awaitable[dict[int, int]]] | None = None,
+    ):
+        """
+        Initialize the snapshot.
+
+        :param client: Async Redis client.
+        :param refresh_interval: Seconds between reloads.
+        :param key: Redis hash of ``user id -> version``.
+        :param load: Coroutine factory reading every version above 0 from
+            the database; defaults to ``UserRepository.token_versions``.
+        """
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.key = key
+        self.load = load or _load_token_versions
+        self._versions: dict[int, int] = {}
+        self._loaded_at = float("-inf")
+        self._raise = client.register_script(_RAISE_TOKEN_VERSIONS)
+
+    async def current(self, user_id: int) -> int:
+        """
+        Lowest token version still accepted for a user.
+
+        :param user_id: User ID.
+        :return: The version, 0 if the user never revoked their tokens.
+        """
+        if time.monotonic() - self._loaded_at >= self.refresh_interval:
+            await self.refresh()
+        return self._versions.get(user_id, 0)
+
+    async def refresh(self) -> None:
+        """
+        Reload the snapshot; on Redis errors the previous one is kept.
+
+        Rebuilds the hash from the database when it lacks the marker left
+        by the last rebuild.
+        """
+        # Set first so concurrent requests keep using the old snapshot
+        self._loaded_at = time.monotonic()
+        try:
+            raw = await self.client.hgetall(self.key)
+        except redis.RedisError:
+            logger.warning("Token version refresh failed", exc_info=True)
+            return
+        versions = {int(user_id): int(version) for user_id, version in raw.items() if user_id != _LOADED_FIELD}
+        if _LOADED_FIELD not in raw:
+            versions = await self._rebuild(versions)
+        self._versions = versions
+
+    async def _rebuild(self, versions: dict[int, int]) -> dict[int, int]:
+        try:
+            stored = await self.load()
+        except (SQLAlchemyError, OSError):
+            logger.warning("Token versions could not be loaded from the database", exc_info=True)
+            return versions
+        for user_id, version in stored.items():
+            versions[user_id] = max(version, versions.get(user_id, 0))
+        try:
+            await self._raise(keys=[self.key], args=[1, *(value for pair in stored.items() for value in pair)])
+        except redis.RedisError:
+            logger.warning("Token versions could not be stored", exc_info=True)
+        return versions
+
+    async def raise_to(self, user_id: int, version: int) -> None:
+        """
+        Reject the user's tokens older than ``version`` from now on.
+
+        :param user_id: User ID.
+        :param version: New token version.
+        """
+        self._versions[user_id] = max(version, self._versions.get(user_id, 0))
+        await self._raise(keys=[self.key], args=[0, user_id, version])
+
+
+async def _load_token_versions() -> dict[int, int]:
+    async with sessionmanager.session() as session:
+        return await UserRepository(session).token_versions()
+
+
+token_versions = TokenVersions(redis_client, config.TOKEN_VERSION_REFRESH_SECONDS)
+
+# First tier, per worker process; Redis ``user:<email>`` is the second tier
+_local_users = LocalTTLCache(config.USER_CACHE_LOCAL_SIZE, config.USER_CACHE_LOCAL_TTL)
+
 async def register_user(user: UserCreate, repo: UserRepository) -> User:
     """
     Register a new user by hashing their password and saving to the database.
@@ -26,8 +243,7 @@ async def register_user(user: UserCreate, repo: UserRepository) -> User:
     :param repo: UserRepository instance.
     :return: The created user.
     """
-    hashed_password = hash_password(user.password)
-    # hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     return await repo.create_user(user.email, hashed_password)
 
 
@@ -50,55 +266,187 @@ async def create_access_token(data: dict, expires_delta: Optional[int] = None):
     )
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+    )
+
+
+def _decode_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, config.JWT_SECRET, algorithms=[config.JWT_ALGORITHM])
+    except JWTError:
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
     """
     Retrieve the currently authenticated user from the token.
 
+    Looks in the in-process cache first, then in Redis, then in the
+    database, filling the faster tiers on the way back. Tokens older than
+    the user's token version are rejected.
+
     :param token: JWT token string.
     :param db: Async database session.
     :return: The authenticated user.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-    )
-    try:
-        payload = jwt.decode(token, config.JWT_SECRET, algorithms=[config.JWT_ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        # Спроба дістати з Redis
-        cached_user = await redis_client.get(f"user:{email}")
-        if cached_user:
-            user_data = json.loads(cached_user)
-            return User(**user_data)
+    payload = _decode_token(token)
+    current_user = await load_current_user(payload["sub"], db)
+    if payload.get("tv", 0) < current_user.token_version:
+        raise _credentials_exception()
+    return current_user
+
+
+async def get_token_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> CurrentUser:
+    """
+    Authorize from the token's claims when ``AUTH_FAST_PATH`` is on.
+
+    Skips both cache tiers and the database; revocation is checked
+    against the periodically refreshed :class:`TokenVersions` snapshot.
+    The returned user has no ``avatar_url``. Tokens issued without the
+    claims, and every token while the fast path is off, go through
+    :func:`get_current_user`.
+
+    :param token: JWT token string.
+    :param db: Async database session, used only on the slow path.
+    :return: The authenticated user.
+    """
+    if not config.AUTH_FAST_PATH:
+        return await get_current_user(token, db)
+    payload = _decode_token(token)
+    current_user = CurrentUser.from_claims(payload)
+    if current_user is None:
+        return await get_current_user(token, db)
+    if current_user.token_version < await token_versions.current(current_user.id):
+        raise _credentials_exception()
+    return current_user
+
+
+async def load_current_user(email: str, db: AsyncSession) -> CurrentUser:
+    """
+    Load a user through the in-process, Redis and database tiers.
 
+    :param email: Email of the user.
+    :param db: Async database session, used on a miss of both caches.
+    :return: The user.
+    :raises HTTPException: 401 if there is no such user.
+    """
+    current_user = _local_users.get(email)
+    if current_user is not None:
+        cache_stats.record("users_local", "hits")
+        return current_user
+    cache_stats.record("users_local", "misses")
+
+    cached_user = await redis_client.get(f"user:{email}")
+    if cached_user:
+        cache_stats.record("users", "hits")
+        current_user = CurrentUser.from_json(cached_user)
+    else:
+        cache_stats.record("users", "misses")
         user = await UserRepository(db).get_by_email(email)
         if user is None:
-            raise credentials_exception
-
-        user_dict = {
-            "id": user.id,
-            "email": user.email,
-            "hashed_password": user.hashed_password,
-            "avatar_url": user.avatar_url,
-            "role": user.role.value,
-            "is_active": user.is_active,
-            "is_verified": user.is_verified,
-        }
+            raise _credentials_exception()
+        current_user = CurrentUser.from_user(user)
+        await redis_client.set(f"user:{email}", current_user.to_json(), ex=config.USER_CACHE_TTL)
 
-        await redis_client.set(f"user:{email}", json.dumps(user_dict), ex=600)
+    _local_users.set(email, current_user)
+    return current_user
 
-        return user
-    except JWTError:
-        raise credentials_exception
+
+async def invalidate_user(email: str) -> None:
+    """
+    Drop a user from every cache tier after their row changed.
+
+    Call it after changing the avatar, role or password. Other worker
+    processes evict their copy when the message arrives on
+    ``USER_INVALIDATION_CHANNEL``.
+
+    :param email: Email of the changed user.
+    """
+    _local_users.pop(email)
+    await redis_client.delete(f"user:{email}")
+    await redis_client.publish(USER_INVALIDATION_CHANNEL, email)
+
+
+async def _retry_redis(action: Callable[[], Awaitable], description: str, attempts: int = 3, delay: float = 0.1):
+    for attempt in range(attempts):
+        try:
+            await action()
+            return
+        except redis.RedisError:
+            if attempt + 1 == attempts:
+                logger.error("%s failed after %s attempts", description, attempts, exc_info=True)
+                return
+            await asyncio.sleep(delay * 2 ** attempt)
+
+
+async def revoke_tokens(user: User) -> None:
+    """
+    Reject the user's older access tokens and end their refresh sessions.
+
+    Call it after bumping ``User.token_version``. Full-path checks see the
+    new version at once; the fast path of other workers within
+    ``TOKEN_VERSION_REFRESH_SECONDS``.
+
+    The bump is already committed, so Redis errors are retried and then
+    logged instead of failing the request. Each step is attempted even
+    if an earlier one failed.
+
+    :param user: The user, with the bumped version.
+    """
+    await _retry_redis(
+        lambda: token_versions.raise_to(user.id, user.token_version), f"Raising the token version of user {user.id}"
+    )
+    await _retry_redis(lambda: refresh_sessions.revoke_all(user.id), f"Ending the sessions of user {user.id}")
+    await _retry_redis(lambda: invalidate_user(user.email), f"Invalidating the cached user {user.id}")
+
+
+async def listen_for_user_invalidations(client=redis_client, retry_delay: float = 1.0) -> None:
+    """
+    Evict users from the in-process cache as invalidations are published.
+
+    Runs until cancelled and resubscribes after connection errors. The
+    local entries lost during an outage still expire by their TTL.
+
+    :param client: Async Redis client to subscribe with.
+    :param retry_delay: Seconds to wait before resubscribing.
+    """
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+            # Anything cached before the subscription may have missed a message
+            _local_users.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    _local_users.pop(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("User invalidation listener failed, resubscribing", exc_info=True)
+            await asyncio.sleep(retry_delay)
+        finally:
+            await pubsub.aclose()
 
 def hash_password(password: str) -> str:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    """
+    Hash a password synchronously.
+
+    Blocks the calling thread for the whole bcrypt round; request handlers
+    should await ``password_hasher.hash`` instead.
+
+    :param password: Plain text password.
+    :return: bcrypt hash.
+    """
     return pwd_context.hash(password)
 
 
-def ensure_is_admin(user: User):
+def ensure_is_admin(user: CurrentUser):
     """
     Ensure User is Admin.
 
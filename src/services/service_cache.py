@@ -1,9 +1,291 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable
+
 import redis.asyncio as redis
+from pydantic import TypeAdapter
 from src.conf.config import config
+from src.services.service_metrics import cache_requests, redis_command_duration, redis_command_errors
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Async Redis client that records per-command latency and errors."""
 
-redis_client = redis.Redis(
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        except redis.RedisError:
+            redis_command_errors.labels(command).inc()
+            raise
+        finally:
+            redis_command_duration.labels(command).observe(time.perf_counter() - start)
+
+
+redis_client = InstrumentedRedis(
     host=config.redis_host,
     port=config.redis_port,
     db=0,
     decode_responses=True
-)
\ No newline at end of file
+)
+
+# Reads the owner's version, the entry under that version and whether the
+# version was bumped within the lag window, in one round trip
+_GET_VERSIONED = """
+local version = redis.call('GET', KEYS[1]) or '0'
+return {version, redis.call('GET', ARGV[1] .. version .. ARGV[2]), redis.call('EXISTS', KEYS[2])}
+"""
+
+
+def _to_bytes(raw: str | bytes) -> bytes:
+    # Clients created with decode_responses=True hand back str
+    return raw.encode() if isinstance(raw, str) else raw
+
+
+class CacheStats:
+    """In-process hit/miss/error counters per cache namespace."""
+
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = Counter()
+        self.errors = Counter()
+
+    def record(self, namespace: str, result: str) -> None:
+        """
+        Count one lookup.
+
+        :param namespace: Cache name.
+        :param result: ``hits``, ``misses`` or ``errors``.
+        """
+        getattr(self, result)[namespace] += 1
+        cache_requests.labels(namespace, result).inc()
+
+    def snapshot(self) -> dict:
+        """
+        Current counters.
+
+        :return: Hits, misses, errors and hit ratio per namespace.
+        """
+        namespaces = set(self.hits) | set(self.misses) | set(self.errors)
+        result = {}
+        for namespace in sorted(namespaces):
+            hits, misses = self.hits[namespace], self.misses[namespace]
+            result[namespace] = {
+                "hits": hits,
+                "misses": misses,
+                "errors": self.errors[namespace],
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return result
+
+
+cache_stats = CacheStats()
+
+
+class VersionedCache:
+    """
+    JSON cache with one version counter per owner.
+
+    Entries live under ``<namespace>:<owner>:v<version>:<key>``. Bumping
+    the owner's version makes all of their entries unreachable in O(1);
+    the orphans expire through their TTL.
+
+    Values loaded from a read replica are not stored for ``lag_window``
+    seconds after a bump: the replica may not have the change yet, and
+    its stale rows would be cached under the new version.
+    """
+
+    def __init__(
+        self,
+        client,
+        namespace: str,
+        ttl: int,
+        lock_timeout: float = 5.0,
+        stats: CacheStats = cache_stats,
+        lag_window: float = 0.0,
+    ):
+        """
+        Initialize the cache.
+
+        :param client: Async Redis client.
+        :param namespace: Key prefix and stats label.
+        :param ttl: Entry lifetime in seconds.
+        :param lock_timeout: Lifetime of the rebuild lock in seconds.
+        :param stats: Counters to update.
+        :param lag_window: Seconds after an invalidation during which
+            replica reads are not cached.
+        """
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.stats = stats
+        self.lag_window = lag_window
+        self._get_versioned = client.register_script(_GET_VERSIONED)
+
+    def _version_key(self, owner_id: int) -> str:
+        return f"{self.namespace}:{owner_id}:ver"
+
+    def _recent_key(self, owner_id: int) -> str:
+        return f"{self.namespace}:{owner_id}:recent"
+
+    async def get_or_load(
+        self, owner_id: int, key: str, load: Callable[[], Awaitable], adapter: TypeAdapter, may_lag: bool = False
+    ):
+        """
+        Return the cached value for ``key`` or load and cache it.
+
+        Only one caller rebuilds a missing entry; concurrent callers wait
+        briefly for it instead of all hitting the database. Redis errors
+        fall through to ``load``.
+
+        :param owner_id: Owner whose version scopes the key.
+        :param key: Entry key within the owner's namespace.
+        :param load: Coroutine factory producing the value.
+        :param adapter: Type adapter used to (de)serialize the value.
+        :param may_lag: ``load`` reads a replica that may lag the primary.
+        :return: The value, validated by ``adapter``.
+        """
+        return await self._get_or_load(owner_id, key, load, adapter.dump_json, adapter.validate_json, may_lag)
+
+    async def get_or_load_raw(
+        self, owner_id: int, key: str, load: Callable[[], Awaitable[bytes]], may_lag: bool = False
+    ) -> bytes:
+        """
+        Like :meth:`get_or_load`, for values that are already serialized.
+
+        Cache hits are returned as stored, without parsing.
+
+        :param owner_id: Owner whose version scopes the key.
+        :param key: Entry key within the owner's namespace.
+        :param load: Coroutine factory producing UTF-8 bytes.
+        :param may_lag: ``load`` reads a replica that may lag the primary.
+        :return: The bytes.
+        """
+        return await self._get_or_load(owner_id, key, load, lambda value: value, _to_bytes, may_lag)
+
+    async def _get_or_load(self, owner_id: int, key: str, load, dump, parse, may_lag: bool = False):
+        prefix, suffix = f"{self.namespace}:{owner_id}:v", f":{key}"
+        try:
+            version, raw, recent = await self._get_versioned(
+                keys=[self._version_key(owner_id), self._recent_key(owner_id)], args=[prefix, suffix]
+            )
+        except redis.RedisError:
+            logger.warning("Cache read failed for %s", self.namespace, exc_info=True)
+            self.stats.record(self.namespace, "errors")
+            return await load()
+        if raw is not None:
+            self.stats.record(self.namespace, "hits")
+            return parse(raw)
+
+        self.stats.record(self.namespace, "misses")
+        if recent and may_lag:
+            return await load()
+        entry_key = f"{prefix}{version}{suffix}"
+        lock_key = f"{entry_key}:lock"
+        try:
+            locked = await self.client.set(lock_key, 1, nx=True, px=int(self.lock_timeout * 1000))
+            if not locked:
+                for _ in range(10):
+                    await asyncio.sleep(0.02)
+                    raw = await self.client.get(entry_key)
+                    if raw is not None:
+                        return parse(raw)
+        except redis.RedisError:
+            self.stats.record(self.namespace, "errors")
+            return await load()
+
+        value = await load()
+        try:
+            ttl = self.ttl + random.randint(0, max(1, self.ttl // 10))
+            await self.client.set(entry_key, dump(value), ex=ttl)
+            if locked:
+                await self.client.delete(lock_key)
+        except redis.RedisError:
+            self.stats.record(self.namespace, "errors")
+        return value
+
+    async def invalidate(self, owner_id: int) -> None:
+        """
+        Drop every entry of ``owner_id`` by bumping their version.
+
+        :param owner_id: Owner whose entries become stale.
+        """
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.incr(self._version_key(owner_id))
+                if self.lag_window:
+                    pipe.set(self._recent_key(owner_id), 1, px=int(self.lag_window * 1000))
+                await pipe.execute()
+        except redis.RedisError:
+            logger.warning("Cache invalidation failed for %s:%s", self.namespace, owner_id, exc_info=True)
+            self.stats.record(self.namespace, "errors")
+
+
+class LocalTTLCache:
+    """
+    Small in-process LRU cache whose entries expire after ``ttl`` seconds.
+
+    Not shared between worker processes; pair it with an invalidation
+    channel when entries can change.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize the cache.
+
+        :param maxsize: Maximum number of entries before the least recently
+            used one is evicted.
+        :param ttl: Entry lifetime in seconds.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        """
+        Return the live entry for ``key`` or None.
+
+        :param key: Entry key.
+        """
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value) -> None:
+        """
+        Store ``value`` under ``key``.
+
+        :param key: Entry key.
+        :param value: Value to store.
+        """
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key) -> None:
+        """
+        Remove ``key`` if present.
+
+        :param key: Entry key.
+        """
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
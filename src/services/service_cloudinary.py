@@ -1,21 +1,219 @@
+import asyncio
+import io
+from collections.abc import AsyncIterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+
 import cloudinary
 import cloudinary.uploader
+from PIL import Image, ImageOps, UnidentifiedImageError
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
 from src.conf.config import config
 
 cloudinary.config(
     cloud_name=config.CLOUDINARY_CLOUD_NAME,
     api_key=config.CLOUDINARY_API_KEY,
     api_secret=config.CLOUDINARY_API_SECRET,
+    upload_prefix=config.CLOUDINARY_UPLOAD_PREFIX,
     secure=True
 )
 
-async def upload_avatar(file_path: str, public_id: str) -> str:
+# Image decoding and the Cloudinary HTTP call both block, so they run here
+_executor = ThreadPoolExecutor(max_workers=config.AVATAR_WORKERS, thread_name_prefix="avatar")
+
+_SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+    b"GIF87a": "image/gif",
+    b"GIF89a": "image/gif",
+}
+# Enough of the file to tell the formats above apart (WebP needs 12 bytes)
+_SNIFF_BYTES = 12
+# Allowance for the multipart boundaries and part headers around the image
+_FORM_OVERHEAD = 16 * 1024
+
+
+class AvatarError(ValueError):
+    """Base class for rejected avatar uploads."""
+
+
+class AvatarTooLargeError(AvatarError):
+    """Raised when an upload exceeds ``AVATAR_MAX_BYTES``."""
+
+
+class UnsupportedAvatarError(AvatarError):
+    """Raised when an upload is not a supported image."""
+
+
+def _sniff_type(head: bytes) -> str | None:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, content_type in _SIGNATURES.items():
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+class _AvatarForm:
+    """Multipart parser callbacks keeping only the avatar part, checked as it arrives."""
+
+    def __init__(self, field: str, max_bytes: int):
+        self.field = field
+        self.max_bytes = max_bytes
+        self.data: bytearray | None = None
+        self._in_avatar = False
+        self._headers: dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self.data is not None or options.get(b"name", b"").decode("latin-1") != self.field:
+            return
+        content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+        if content_type not in config.AVATAR_CONTENT_TYPES:
+            raise UnsupportedAvatarError(f"Unsupported content type: {content_type}")
+        self.data = bytearray()
+        self._in_avatar = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._in_avatar:
+            return
+        sniffed = len(self.data) >= _SNIFF_BYTES
+        self.data += data[start:end]
+        if len(self.data) > self.max_bytes:
+            raise AvatarTooLargeError(f"Avatar exceeds {self.max_bytes} bytes")
+        if not sniffed and len(self.data) >= _SNIFF_BYTES:
+            self._check_signature()
+
+    def on_part_end(self) -> None:
+        if not self._in_avatar:
+            return
+        self._in_avatar = False
+        if not self.data:
+            raise UnsupportedAvatarError("Empty file")
+        if len(self.data) < _SNIFF_BYTES:
+            self._check_signature()
+
+    def _check_signature(self) -> None:
+        if _sniff_type(bytes(self.data[:_SNIFF_BYTES])) not in config.AVATAR_CONTENT_TYPES:
+            raise UnsupportedAvatarError("File is not a supported image")
+
+
+async def read_avatar(
+    headers: Mapping[str, str],
+    body: AsyncIterable[bytes],
+    field: str = "file",
+    max_bytes: int = config.AVATAR_MAX_BYTES,
+) -> bytes:
+    """
+    Read an avatar from a ``multipart/form-data`` body as it arrives.
+
+    Nothing is buffered or spooled before the checks run: a
+    ``Content-Length`` that cannot fit is rejected before reading, the
+    part's declared content type once its headers are parsed, the magic
+    bytes once its first bytes arrive and the size after every chunk.
+    Reading stops at the first failed check. Other form fields are skipped.
+
+    :param headers: Request headers.
+    :param body: Request body chunks, e.g. ``request.stream()``.
+    :param field: Name of the form field holding the image.
+    :param max_bytes: Maximum accepted size of the image in bytes.
+    :return: Raw image bytes.
+    :raises UnsupportedAvatarError: If the body is not a form with a
+        supported image in ``field``.
+    :raises AvatarTooLargeError: If the image exceeds ``max_bytes``.
+    """
+    max_body = max_bytes + _FORM_OVERHEAD
+    content_length = headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+        raise AvatarTooLargeError(f"Avatar exceeds {max_bytes} bytes")
+    media_type, params = parse_options_header(headers.get("content-type", ""))
+    if media_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UnsupportedAvatarError("Expected a multipart/form-data upload")
+
+    form = _AvatarForm(field, max_bytes)
+    parser = MultipartParser(params[b"boundary"], form.callbacks())
+    received = 0
+    try:
+        async for chunk in body:
+            # Bodies without Content-Length, and other fields, are capped too
+            received += len(chunk)
+            if received > max_body:
+                raise AvatarTooLargeError(f"Avatar exceeds {max_bytes} bytes")
+            parser.write(chunk)
+        parser.finalize()
+    except MultipartParseError as e:
+        raise UnsupportedAvatarError(f"Malformed form data: {e}")
+    if form.data is None:
+        raise UnsupportedAvatarError(f"Form has no {field} field")
+    return bytes(form.data)
+
+
+def _normalize(data: bytes, size: int) -> bytes:
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image = ImageOps.fit(image.convert("RGB"), (size, size), Image.LANCZOS)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise UnsupportedAvatarError(f"Cannot decode image: {e}")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+
+async def normalize_avatar(data: bytes, size: int = config.AVATAR_SIZE) -> bytes:
+    """
+    Crop and resize an avatar to a square JPEG in the worker pool.
+
+    :param data: Raw image bytes.
+    :param size: Side of the resulting square in pixels.
+    :return: JPEG bytes.
+    :raises UnsupportedAvatarError: If the image cannot be decoded.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, _normalize, data, size)
+
+
+def _upload(data: bytes, public_id: str) -> dict:
+    return cloudinary.uploader.upload(
+        io.BytesIO(data), public_id=public_id, overwrite=True, filename=f"{public_id}.jpg"
+    )
+
+
+async def upload_avatar(data: bytes, public_id: str) -> str:
     """
-    Upload an avatar image to Cloudinary.
+    Upload an avatar image to Cloudinary without blocking the event loop.
 
-    :param file_path: Local file path of the image.
+    :param data: Image bytes, uploaded straight from memory.
     :param public_id: Public ID for storing the image in Cloudinary.
     :return: Secure URL of the uploaded image.
     """
-    result = cloudinary.uploader.upload(file_path, public_id=public_id, overwrite=True)
-    return result.get("secure_url")
\ No newline at end of file
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_executor, _upload, data, public_id)
+    return result.get("secure_url")
@@ -1,17 +1,142 @@
+import hashlib
+from datetime import date
+from typing import AsyncIterator, Optional, Sequence
+
+import orjson
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.repository.repo_contacts import ContactRepository
-from src.db.models import User
-from src.schemas import ContactCreate, ContactUpdate
+from src.conf.config import config
+from src.db.db import REPLICA, after_commit, commit_or_flush
+from src.repository.repo_contacts import ContactRepository, CONTACT_FIELDS, CONTACT_SORTS, LIST_FIELDS
+from src.db.models import Contact, User
+from src.schemas import (
+    ContactCreate,
+    ContactUpdate,
+    ContactResponse,
+    ContactFilters,
+    ContactImportResult,
+    ImportRowError,
+    ContactBatchRequest,
+    ContactBatchResponse,
+    ContactBatchResult,
+    BatchCreate,
+    BatchUpdate,
+)
+from src.services.service_cache import VersionedCache, redis_client
+from src.services.service_import import iter_batches
+from src.services.service_pagination import encode_cursor, decode_cursor, InvalidCursorError
+
+contact_cache = VersionedCache(
+    redis_client, "contacts", config.CONTACT_CACHE_TTL, lag_window=config.DB_READ_YOUR_WRITES_SECONDS
+)
+
+_contact_adapter = TypeAdapter(Optional[ContactResponse])
+
+
+class InvalidFieldsError(ValueError):
+    """The ``fields`` selection names unknown fields."""
+
+
+def parse_fields(value: str | None) -> tuple[str, ...]:
+    """
+    Parse a comma-separated ``fields`` selection.
+
+    The ID is always included; the result follows ContactResponse field
+    order, so equal selections give equal tuples.
+
+    Args:
+        value: For example ``"first_name,last_name"``, or None.
+
+    Returns:
+        The selected fields, or the list default (everything except
+        ``extra_data``) when ``value`` is empty.
+
+    Raises:
+        InvalidFieldsError: If a name is not a ContactResponse field.
+    """
+    requested = {name.strip() for name in (value or "").split(",") if name.strip()}
+    if not requested:
+        return LIST_FIELDS
+    unknown = requested.difference(CONTACT_FIELDS)
+    if unknown:
+        raise InvalidFieldsError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    requested.add("id")
+    return tuple(name for name in CONTACT_FIELDS if name in requested)
+
+
+def _decode_sort_cursor(cursor: str, sort: str) -> list:
+    values = decode_cursor(cursor)
+    key = CONTACT_SORTS[sort.removeprefix("-")]
+    if values[0] != sort or len(values) != len(key) + 1:
+        raise InvalidCursorError("Invalid cursor")
+    after = []
+    for name, value in zip(key, values[1:]):
+        python_type = Contact.__table__.columns[name].type.python_type
+        if python_type is date and isinstance(value, str):
+            try:
+                value = date.fromisoformat(value)
+            except ValueError:
+                raise InvalidCursorError("Invalid cursor")
+        if type(value) is not python_type:
+            raise InvalidCursorError("Invalid cursor")
+        after.append(value)
+    return after
+
+
+def dump_contact_rows(rows: Sequence, fields: Sequence[str] = CONTACT_FIELDS) -> bytes:
+    """
+    Serialize contact rows to the JSON of a ``List[ContactResponse]``.
+
+    Rows come from the repository's ``as_rows`` reads, which select the
+    ``fields`` columns first and in that order. Stored contacts were
+    validated on write, so they are not validated again; the output is
+    byte-for-byte what pydantic would produce.
+
+    Args:
+        rows: Rows starting with the ``fields`` columns; extra trailing
+            columns are dropped.
+        fields: Names of the leading columns.
+
+    Returns:
+        The JSON array as bytes.
+    """
+    return orjson.dumps([dict(zip(fields, row)) for row in rows], option=orjson.OPT_UTC_Z)
+
 
 class ContactService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, cache: VersionedCache | None = contact_cache):
         """
         Initialize the ContactService with a database session.
 
         Args:
             db: Asynchronous database session.
+            cache: Per-user cache for reads, or None to always query the database.
         """
+        self.db = db
         self.repo = ContactRepository(db)
+        self.cache = cache
+
+    async def _cached(self, user: User, key: str, load, adapter: TypeAdapter):
+        async def load_validated():
+            return adapter.validate_python(await load(), from_attributes=True)
+
+        if self.cache is None:
+            return await load_validated()
+        return await self.cache.get_or_load(user.id, key, load_validated, adapter, may_lag=self._may_lag)
+
+    async def _cached_json(self, user: User, key: str, load) -> bytes:
+        if self.cache is None:
+            return await load()
+        return await self.cache.get_or_load_raw(user.id, key, load, may_lag=self._may_lag)
+
+    @property
+    def _may_lag(self) -> bool:
+        return bool(self.db.info.get(REPLICA))
+
+    async def _invalidate(self, user: User):
+        if self.cache is not None:
+            # Invalidating before the commit would let readers re-cache old rows
+            await after_commit(self.db, lambda: self.cache.invalidate(user.id))
 
     async def create(self, body: ContactCreate, user:User):
         """
@@ -23,9 +148,108 @@ class ContactService:
         Returns:
             The newly created contact.
         """
-        return await self.repo.create(body, user)
+        contact = await self.repo.create(body, user)
+        await self._invalidate(user)
+        return contact
+
+    async def import_contacts(
+        self,
+        chunks: AsyncIterator[bytes],
+        fmt: str,
+        user: User,
+        batch_size: int = config.CONTACT_IMPORT_BATCH_SIZE,
+        max_errors: int = config.CONTACT_IMPORT_MAX_ERRORS,
+    ) -> ContactImportResult:
+        """
+        Import contacts from a CSV or JSON Lines stream.
+
+        Rows are validated and inserted in batches; invalid rows are skipped
+        and reported. Valid rows are committed together at the end. Their
+        change numbers are reserved only then, so the import does not hold
+        the user row lock while it reads the stream.
+
+        Args:
+            chunks: Raw request body chunks.
+            fmt: ``csv`` or ``jsonl``.
+            user: The authenticated user.
+            batch_size: Number of rows validated and inserted at once.
+            max_errors: Maximum number of row errors listed in the result.
+
+        Returns:
+            Inserted and failed row counts and the first row errors.
+        """
+        inserted = failed = 0
+        errors = []
+        async for batch in iter_batches(chunks, fmt, batch_size):
+            inserted += await self.repo.bulk_create(batch.contacts, user, sequence=False)
+            failed += len(batch.errors)
+            errors.extend(
+                ImportRowError(row=error.row, errors=error.errors)
+                for error in batch.errors[:max(0, max_errors - len(errors))]
+            )
+        if inserted:
+            await self.repo.sequence_pending(user)
+        await commit_or_flush(self.db)
+        if inserted:
+            await self._invalidate(user)
+        return ContactImportResult(inserted=inserted, failed=failed, errors=errors)
+
+    async def batch(self, body: ContactBatchRequest, user: User) -> ContactBatchResponse:
+        """
+        Apply mixed create, update and delete operations in one transaction.
+
+        Operations are grouped by kind and each group runs as a single
+        statement, so creates happen before updates and updates before
+        deletes regardless of their order in the request.
+
+        Args:
+            body: The operations.
+            user: The authenticated user.
 
-    async def get_all(self, user:User, skip: int, limit: int):
+        Returns:
+            One result per operation, in request order.
+        """
+        creates, updates, delete_ids = [], {}, []
+        for operation in body.operations:
+            if isinstance(operation, BatchCreate):
+                creates.append(operation.data)
+            elif isinstance(operation, BatchUpdate):
+                updates[operation.id] = operation.data
+            else:
+                delete_ids.append(operation.id)
+
+        created, updated, deleted = await self.repo.batch(creates, updates, delete_ids, user)
+        await commit_or_flush(self.db)
+        if created or updated or deleted:
+            await self._invalidate(user)
+
+        created = iter(created)
+        results = []
+        for index, operation in enumerate(body.operations):
+            if isinstance(operation, BatchCreate):
+                contact, status = next(created), "created"
+            else:
+                found = updated if isinstance(operation, BatchUpdate) else deleted
+                contact = found.get(operation.id)
+                status = ("updated" if isinstance(operation, BatchUpdate) else "deleted") if contact else "not_found"
+            results.append(ContactBatchResult(
+                index=index,
+                op=operation.op,
+                status=status,
+                contact=ContactResponse.model_validate(contact) if contact else None,
+            ))
+        return ContactBatchResponse(results=results)
+
+    async def get_all(
+        self,
+        user:User,
+        skip: int,
+        limit: int,
+        cursor: str | None = None,
+        fields: Sequence[str] = LIST_FIELDS,
+        sort: str = "id",
+        filters: ContactFilters | None = None,
+    ) -> tuple[bytes, str | None]:
         """
         Retrieve all contacts belonging to the authenticated user.
 
@@ -33,11 +257,53 @@ class ContactService:
             user: The authenticated user.
             skip: Number of records to skip.
             limit: Maximum number of records to return.
+            cursor: Opaque cursor returned with the previous page.
+            fields: Fields to return, from :func:`parse_fields`.
+            sort: A ContactSort value such as ``last_name`` or ``-birthday``.
+            filters: Optional filters.
+
+        Returns:
+            The page as a JSON array and the cursor of the next page, or
+            None if this is the last one.
+
+        Raises:
+            InvalidCursorError: If the cursor cannot be decoded or belongs
+                to another sort order.
+        """
+        name, descending = sort.removeprefix("-"), sort.startswith("-")
+        after = _decode_sort_cursor(cursor, sort) if cursor else None
+
+        async def load():
+            rows = await self.repo.get_all(
+                user, skip, limit, after, as_rows=True, fields=fields, sort=name, descending=descending, filters=filters
+            )
+            # The cursor is cached in front of the body; JSON from orjson
+            # never contains a raw newline
+            return (self.next_cursor(rows, limit, sort) or "").encode() + b"\n" + dump_contact_rows(rows, fields)
+
+        query = filters.model_dump_json(exclude_none=True) if filters else ""
+        digest = hashlib.sha1(f"{cursor}:{query}".encode()).hexdigest()
+        entry = await self._cached_json(user, f"list:{skip}:{limit}:{sort}:{','.join(fields)}:{digest}", load)
+        next_cursor, _, body = entry.partition(b"\n")
+        return body, next_cursor.decode() or None
+
+    @staticmethod
+    def next_cursor(rows, limit: int, sort: str = "id") -> str | None:
+        """
+        Build the cursor for the page following ``rows``.
+
+        Args:
+            rows: Rows of the current page, ending with the sort key columns.
+            limit: Page size that was requested.
+            sort: The page's ContactSort value.
 
         Returns:
-            A list of contacts.
+            An opaque cursor, or None if this was the last page.
         """
-        return await self.repo.get_all(user, skip, limit)
+        if not rows or len(rows) < limit:
+            return None
+        key_size = len(CONTACT_SORTS[sort.removeprefix("-")])
+        return encode_cursor([sort, *rows[-1][-key_size:]])
 
     async def get_by_id(self, contact_id: int, user:User):
         """
@@ -48,9 +314,11 @@ class ContactService:
             user: The authenticated user.
 
         Returns:
-            Contact object if found, else None.
+            Contact if found, else None.
         """
-        return await self.repo.get_by_id(contact_id, user)
+        return await self._cached(
+            user, f"item:{contact_id}", lambda: self.repo.get_by_id(contact_id, user), _contact_adapter
+        )
 
     async def update(self, contact_id: int, body: ContactUpdate, user:User):
         """
@@ -64,7 +332,10 @@ class ContactService:
         Returns:
             The updated contact or None if not found.
         """
-        return await self.repo.update(contact_id, body, user)
+        contact = await self.repo.update(contact_id, body, user)
+        if contact is not None:
+            await self._invalidate(user)
+        return contact
 
     async def delete(self, contact_id: int, user:User):
         """
@@ -77,29 +348,86 @@ class ContactService:
         Returns:
             The deleted contact or None if not found.
         """
-        return await self.repo.delete(contact_id, user)
+        contact = await self.repo.delete(contact_id, user)
+        if contact is not None:
+            await self._invalidate(user)
+        return contact
 
-    async def search(self, user:User, query: str):
+    async def search(
+        self, user:User, query: str, skip: int = 0, limit: int = 50, fields: Sequence[str] = LIST_FIELDS
+    ) -> bytes:
         """
         Search contacts by first name, last name or email.
 
         Args:
             user: The authenticated user.
             query: Search query string.
+            skip: Number of ranked results to skip.
+            limit: Maximum number of results to return.
+            fields: Fields to return, from :func:`parse_fields`.
 
         Returns:
-            A list of matching contacts.
+            A JSON array of matching contacts, best matches first.
         """
-        return await self.repo.search(user, query)
+        digest = hashlib.sha1(query.encode()).hexdigest()
+
+        async def load():
+            return dump_contact_rows(await self.repo.search(user, query, skip, limit, as_rows=True, fields=fields), fields)
+
+        return await self._cached_json(user, f"search:{digest}:{skip}:{limit}:{','.join(fields)}", load)
 
-    async def upcoming_birthdays(self, user:User):
+    async def upcoming_birthdays(self, user:User, fields: Sequence[str] = LIST_FIELDS) -> bytes:
         """
         Retrieve contacts whose birthdays are in the next 7 days.
 
         Args:
             user: The authenticated user.
+            fields: Fields to return, from :func:`parse_fields`.
 
         Returns:
-            A list of contacts with upcoming birthdays.
+            A JSON array of contacts with upcoming birthdays.
+        """
+        today = date.today()
+
+        async def load():
+            return dump_contact_rows(await self.repo.upcoming_birthdays(user, today, as_rows=True, fields=fields), fields)
+
+        return await self._cached_json(user, f"birthdays:{today.isoformat()}:{','.join(fields)}", load)
+
+    async def changes(self, user:User, since: str | None = None, limit: int = 500) -> bytes:
+        """
+        Contacts changed and deleted since a sync token.
+
+        Not cached: an up-to-date client costs a single index probe.
+
+        Args:
+            user: The authenticated user.
+            since: ``next_token`` of the previous call, or None for a full sync.
+            limit: Maximum number of changes to return.
+
+        Returns:
+            The changes and the token to continue from, as the JSON of
+            a ContactChanges.
+
+        Raises:
+            InvalidCursorError: If the token cannot be decoded.
         """
-        return await self.repo.upcoming_birthdays(user)
\ No newline at end of file
+        last_seq = 0
+        if since:
+            last_seq = decode_cursor(since)[0]
+            if not isinstance(last_seq, int) or last_seq < 0:
+                raise InvalidCursorError("Invalid sync token")
+        rows = await self.repo.changes(user, last_seq, limit + 1, as_rows=True)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            last_seq = max(last_seq, rows[-1].change_seq)
+        changed = [row for row in rows if row.deleted_at is None]
+        deleted = orjson.dumps([row.id for row in rows if row.deleted_at is not None])
+        # Field order of ContactChanges
+        return b"".join((
+            b'{"changed":', dump_contact_rows(changed),
+            b',"deleted":', deleted,
+            b',"next_token":', orjson.dumps(encode_cursor([last_seq])),
+            b',"has_more":', orjson.dumps(has_more), b"}",
+        ))
@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Callable
+
+from src.repository.repo_contacts import ContactRepository
+
+EXPORT_FIELDS = ["id", "first_name", "last_name", "email", "phone", "birthday", "extra_data"]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "vcard": "text/vcard; charset=utf-8",
+}
+
+EXPORT_EXTENSIONS = {"csv": "csv", "jsonl": "jsonl", "vcard": "vcf"}
+
+
+def _jsonl_line(row) -> str:
+    return json.dumps({name: row[name] for name in EXPORT_FIELDS}, default=str, ensure_ascii=False) + "\n"
+
+
+def _vcard_escape(value) -> str:
+    return (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace(",", "\\,").replace(";", "\\;")
+    )
+
+
+def _vcard_fold(line: str) -> str:
+    # RFC 6350 3.2: lines longer than 75 characters continue after CRLF + space
+    if len(line) <= 75:
+        return line + "\r\n"
+    parts = [line[:75]] + [line[i:i + 74] for i in range(75, len(line), 74)]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _vcard(row) -> str:
+    first, last = _vcard_escape(row["first_name"]), _vcard_escape(row["last_name"])
+    lines = [
+        "BEGIN:VCARD",
+        "VERSION:3.0",
+        f"N:{last};{first};;;",
+        f"FN:{first} {last}",
+        f"EMAIL;TYPE=INTERNET:{_vcard_escape(row['email'])}",
+        f"TEL:{_vcard_escape(row['phone'])}",
+        f"BDAY:{row['birthday'].isoformat()}",
+    ]
+    if row["extra_data"]:
+        lines.append(f"NOTE:{_vcard_escape(row['extra_data'])}")
+    lines.append("END:VCARD")
+    return "".join(_vcard_fold(line) for line in lines)
+
+
+def _csv_header() -> str:
+    return ",".join(EXPORT_FIELDS) + "\r\n"
+
+
+def _csv_batch(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerows(["" if row[name] is None else row[name] for name in EXPORT_FIELDS] for row in rows)
+    return buffer.getvalue()
+
+
+def _render_batch(rows, fmt: str) -> str:
+    if fmt == "csv":
+        return _csv_batch(rows)
+    render: Callable = _jsonl_line if fmt == "jsonl" else _vcard
+    return "".join(render(row) for row in rows)
+
+
+async def export_contacts(
+    session_factory: Callable,
+    user,
+    fmt: str,
+    compress: bool = False,
+    chunk_size: int = 64 * 1024,
+    batch_size: int = 1000,
+) -> AsyncIterator[bytes]:
+    """
+    Stream a user's contacts as CSV, JSON Lines or vCard.
+
+    Opens its own session, since a streaming response outlives the
+    request's dependencies, and closes it when the stream ends or the
+    client goes away.
+
+    :param session_factory: Callable returning an async context manager
+        that yields a session.
+    :param user: The user whose contacts are exported.
+    :param fmt: ``csv``, ``jsonl`` or ``vcard``.
+    :param compress: Gzip the output.
+    :param chunk_size: Approximate size of the yielded chunks in bytes.
+    :param batch_size: Rows fetched from the database per round trip.
+    :return: Async iterator of encoded chunks.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    parts = [_csv_header()] if fmt == "csv" else []
+    size = sum(map(len, parts))
+    async with session_factory() as session:
+        async for rows in ContactRepository(session).stream_all(user, batch_size):
+            text = _render_batch(rows, fmt)
+            parts.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                data = "".join(parts).encode()
+                parts, size = [], 0
+                if compressor is not None:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+    data = "".join(parts).encode()
+    if compressor is not None:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
@@ -0,0 +1,175 @@
+import codecs
+import csv
+import json
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List
+
+from pydantic import ValidationError
+from sqlalchemy import String
+
+from src.db.models import Contact
+from src.schemas import ContactCreate
+
+IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json-lines": "jsonl",
+}
+
+# Checked up front so one overlong value fails its row, not the whole batch
+_MAX_LENGTHS = {
+    column.name: column.type.length
+    for column in Contact.__table__.columns
+    if isinstance(column.type, String) and column.type.length
+}
+
+
+class UnsupportedImportFormatError(ValueError):
+    """Raised when the import format cannot be determined."""
+
+
+def detect_format(content_type: str | None, fmt: str | None = None) -> str:
+    """
+    Pick the import format from an explicit choice or the content type.
+
+    :param content_type: ``Content-Type`` header of the request.
+    :param fmt: Explicit ``csv`` or ``jsonl``, overrides the content type.
+    :return: ``csv`` or ``jsonl``.
+    :raises UnsupportedImportFormatError: If neither names a known format.
+    """
+    if fmt in ("csv", "jsonl"):
+        return fmt
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if fmt is None and media_type in IMPORT_FORMATS:
+        return IMPORT_FORMATS[media_type]
+    raise UnsupportedImportFormatError("Send text/csv or application/x-ndjson, or pass format=csv|jsonl")
+
+
+@dataclass
+class RowError:
+    row: int
+    errors: List[str]
+
+
+@dataclass
+class ImportBatch:
+    """Validated rows of one chunk together with the rejected ones."""
+
+    contacts: List[ContactCreate] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a stream of UTF-8 bytes into lines without buffering all of it.
+
+    :param chunks: Raw body chunks.
+    :return: Lines without their line terminators.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[dict]:
+    """
+    Parse CSV lines into dicts keyed by the header row.
+
+    Quoted fields may span lines. Empty values become None.
+
+    :param lines: Lines from :func:`iter_lines`.
+    :return: One dict per data row.
+    """
+    header = None
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # A record is complete once its quotes are balanced
+        if record.count('"') % 2:
+            continue
+        values = next(csv.reader([record]), [])
+        record = ""
+        if not values:
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        yield {name: value or None for name, value in zip(header, values)}
+    if record:
+        # Unterminated quote; let validation reject whatever is left
+        yield {name: value or None for name, value in zip(header or [], next(csv.reader([record]), []))}
+
+
+async def iter_jsonl_records(lines: AsyncIterator[str]) -> AsyncIterator[dict | None]:
+    """
+    Parse JSON Lines into dicts, yielding None for unparsable lines.
+
+    :param lines: Lines from :func:`iter_lines`.
+    :return: One item per non-blank line.
+    """
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield record if isinstance(record, dict) else None
+
+
+def validate_record(record: dict | None) -> ContactCreate | List[str]:
+    """
+    Validate one parsed record.
+
+    :param record: Parsed row, or None if it could not be parsed.
+    :return: The contact, or the list of validation messages.
+    """
+    if record is None:
+        return ["Row is not a JSON object"]
+    try:
+        contact = ContactCreate.model_validate(record)
+    except ValidationError as e:
+        return [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in e.errors()]
+    too_long = [
+        f"{name}: String should have at most {length} characters"
+        for name, length in _MAX_LENGTHS.items()
+        if isinstance(getattr(contact, name, None), str) and len(getattr(contact, name)) > length
+    ]
+    return too_long or contact
+
+
+async def iter_batches(chunks: AsyncIterator[bytes], fmt: str, batch_size: int) -> AsyncIterator[ImportBatch]:
+    """
+    Parse and validate an import stream in batches.
+
+    :param chunks: Raw body chunks.
+    :param fmt: ``csv`` or ``jsonl``.
+    :param batch_size: Number of rows per batch.
+    :return: Batches of valid contacts and per-row errors; rows are
+        numbered from 1, not counting the CSV header.
+    """
+    parse = iter_csv_records if fmt == "csv" else iter_jsonl_records
+    batch = ImportBatch()
+    row = 0
+    async for record in parse(iter_lines(chunks)):
+        row += 1
+        result = validate_record(record)
+        if isinstance(result, ContactCreate):
+            batch.contacts.append(result)
+        else:
+            batch.errors.append(RowError(row, result))
+        if row % batch_size == 0:
+            yield batch
+            batch = ImportBatch()
+    if batch.contacts or batch.errors:
+        yield batch
@@ -0,0 +1,119 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Set PROMETHEUS_MULTIPROC_DIR to an empty directory shared by all workers
+# (before the app is imported) to aggregate metrics across processes.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ["method", "route", "status"]
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "HTTP requests being served.", ["method"], multiprocess_mode="livesum"
+)
+http_rate_limited = Counter("http_rate_limited_total", "Requests rejected with 429.", ["route"])
+
+db_pool_size = Gauge(
+    "db_pool_size", "Configured pool size (persistent connections).", ["pool"], multiprocess_mode="livesum"
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out.", ["pool"], multiprocess_mode="livesum"
+)
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", buckets=FAST_BUCKETS
+)
+
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds", "Redis command latency.", ["command"], buckets=FAST_BUCKETS
+)
+redis_command_errors = Counter("redis_command_errors_total", "Failed Redis commands.", ["command"])
+cache_requests = Counter("cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+
+password_hash_duration = Histogram(
+    "password_hash_duration_seconds", "Time spent in bcrypt.", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+password_hash_queue = Histogram(
+    "password_hash_queue_seconds", "Time bcrypt jobs wait for a worker thread.", buckets=LATENCY_BUCKETS
+)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    :return: Body and content type.
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop the live gauges of this worker from the shared directory."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def route_template(scope) -> str:
+    """
+    Route path template of a routed request, e.g. ``/api/contacts/{contact_id}``.
+
+    :param scope: ASGI scope after routing.
+    :return: The template, or ``unmatched`` for requests no route handled.
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording request counts, latency and concurrency."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = http_requests_in_progress.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_template(scope)
+            http_request_duration.labels(method, route).observe(time.perf_counter() - start)
+            http_requests.labels(method, route, str(status_code)).inc()
+            in_progress.dec()
@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+from typing import Any, List
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """
+    Encode keyset values into an opaque, URL-safe cursor.
+
+    :param values: Sort key values of the last row on the current page.
+    :return: Opaque cursor string.
+    """
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """
+    Decode a cursor produced by :func:`encode_cursor`.
+
+    :param cursor: Opaque cursor string.
+    :return: Sort key values of the last row of the previous page.
+    :raises InvalidCursorError: If the cursor is malformed.
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise InvalidCursorError("Invalid cursor")
+    return values
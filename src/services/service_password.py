@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from src.conf.config import config
+from src.services.service_metrics import password_hash_duration, password_hash_queue
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Run bcrypt hashing and verification on a bounded thread pool.
+
+    bcrypt releases the GIL, so worker threads hash in parallel while the
+    event loop keeps serving other requests. Jobs beyond ``max_workers``
+    wait in the executor queue; :meth:`stats` reports how many.
+    """
+
+    def __init__(self, max_workers: int):
+        """
+        Initialize the hasher.
+
+        :param max_workers: Maximum number of concurrent bcrypt operations.
+        """
+        self.max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._running = 0
+        self._completed = 0
+        self._busy_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    def _track(self, operation: str, submitted_at: float, fn, *args):
+        with self._lock:
+            self._running += 1
+        start = time.perf_counter()
+        password_hash_queue.observe(start - submitted_at)
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            password_hash_duration.labels(operation).observe(elapsed)
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._busy_seconds += elapsed
+
+    def _done(self, future) -> None:
+        # Also called for jobs cancelled before they started
+        with self._lock:
+            self._submitted -= 1
+
+    async def _run(self, operation: str, fn, *args):
+        future = self._get_executor().submit(self._track, operation, time.perf_counter(), fn, *args)
+        with self._lock:
+            self._submitted += 1
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """
+        Hash a password without blocking the event loop.
+
+        :param password: Plain text password.
+        :return: bcrypt hash.
+        """
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Verify a password against its hash without blocking the event loop.
+
+        :param password: Plain text password.
+        :param hashed_password: Stored bcrypt hash.
+        :return: True if the password matches.
+        """
+        return await self._run("verify", pwd_context.verify, password, hashed_password)
+
+    def stats(self) -> dict:
+        """
+        Snapshot of pool utilization.
+
+        :return: Worker count, running and queued jobs, completed jobs and
+            total seconds spent in bcrypt.
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queued": self._submitted - self._running,
+                "completed": self._completed,
+                "busy_seconds": round(self._busy_seconds, 3),
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(config.PASSWORD_HASH_WORKERS)
@@ -0,0 +1,159 @@
+import logging
+from dataclasses import dataclass
+
+import redis.asyncio as redis
+from fastapi import Request
+from jose import JWTError, jwt
+
+from src.conf.config import config
+from src.services.service_cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+# GCRA: one key per client holding the theoretical arrival time (TAT) in
+# milliseconds. Redis' own clock is used so all workers agree on "now".
+# The emission interval is fractional for limits such as 7/minute, so the
+# TAT is kept exact and only the expiry and the retry delay, which Redis
+# would truncate to whole milliseconds, are rounded up.
+_GCRA = """
+local emission = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + emission
+local allow_at = new_tat - tolerance
+if now < allow_at then
+    return {0, 0, math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, math.floor((tolerance - (new_tat - now)) / emission), 0}
+"""
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a client has used up its budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimit:
+    """``limit`` requests per ``period`` seconds, allowed in a burst."""
+
+    limit: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> "RateLimit":
+        """
+        Parse a limit such as ``"5/minute"`` or ``"100/hour"``.
+
+        :param value: ``<count>/<second|minute|hour|day>``.
+        :return: The parsed limit.
+        """
+        count, _, unit = value.partition("/")
+        unit = unit.strip().removesuffix("s")
+        if unit not in _PERIODS or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid rate limit: {value!r}")
+        return cls(int(count), _PERIODS[unit])
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitResult:
+    allowed: bool
+    remaining: int
+    retry_after: float
+
+
+def client_identity(request: Request) -> str:
+    """
+    Key a request by user when it carries a valid token, else by IP.
+
+    Only the token signature is checked, so the key costs no database
+    or cache lookup.
+
+    :param request: Incoming request.
+    :return: ``user:<email>`` or ``ip:<address>``.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            email = jwt.decode(token, config.JWT_SECRET, algorithms=[config.JWT_ALGORITHM]).get("sub")
+        except JWTError:
+            email = None
+        if email:
+            return f"user:{email}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+class RateLimiter:
+    """
+    Redis-backed GCRA rate limiter shared by all workers.
+
+    Each check is a single Lua call that reads and advances the client's
+    theoretical arrival time atomically, so concurrent workers spend one
+    common budget. Redis errors fail open.
+    """
+
+    def __init__(self, client=redis_client, prefix: str = "ratelimit"):
+        """
+        Initialize the limiter.
+
+        :param client: Async Redis client.
+        :param prefix: Key prefix.
+        """
+        self.client = client
+        self.prefix = prefix
+        self._gcra = client.register_script(_GCRA)
+
+    async def hit(self, key: str, rate: RateLimit) -> RateLimitResult:
+        """
+        Spend one request from the budget of ``key``.
+
+        :param key: Client key, e.g. ``login:ip:10.0.0.1``.
+        :param rate: The limit to enforce.
+        :return: Whether the request is allowed, the requests left in the
+            burst and, when rejected, the seconds until the next one is.
+        """
+        emission = rate.period * 1000 / rate.limit
+        try:
+            allowed, remaining, retry_after = await self._gcra(
+                keys=[f"{self.prefix}:{key}"], args=[emission, rate.period * 1000]
+            )
+        except redis.RedisError:
+            logger.warning("Rate limit check failed for %s", key, exc_info=True)
+            return RateLimitResult(True, rate.limit, 0.0)
+        return RateLimitResult(bool(allowed), int(remaining), int(retry_after) / 1000)
+
+    def limit(self, value: str, scope: str):
+        """
+        Build a route dependency enforcing ``value`` per client.
+
+        Use it in the route's ``dependencies`` so it runs before
+        authentication and the database are touched.
+
+        :param value: Limit such as ``"5/minute"``.
+        :param scope: Budget name, so routes do not share budgets.
+        :return: Dependency raising :class:`RateLimitExceeded`.
+        """
+        rate = RateLimit.parse(value)
+
+        async def dependency(request: Request) -> None:
+            if not config.RATE_LIMIT_ENABLED:
+                return
+            result = await self.hit(f"{scope}:{client_identity(request)}", rate)
+            if not result.allowed:
+                raise RateLimitExceeded(result.retry_after)
+
+        return dependency
+
+
+limiter = RateLimiter()
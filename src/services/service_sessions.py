@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import secrets
+import time
+from dataclasses import dataclass
+
+from src.conf.config import config
+from src.services.service_cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Swaps the session's secret if the presented one is current. Any other
+# secret of a live session is a replayed, already rotated token: the
+# session is dropped so neither the thief nor the owner can use it again.
+_ROTATE = """
+local current = redis.call('HGET', KEYS[1], 'secret')
+if not current then
+    return nil
+end
+local user_id = redis.call('HGET', KEYS[1], 'user_id')
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('SREM', ARGV[4] .. user_id, ARGV[5])
+    return {'reused', user_id}
+end
+redis.call('HSET', KEYS[1], 'secret', ARGV[2], 'rotated_at', ARGV[6])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', ARGV[4] .. user_id, ARGV[3])
+return {'ok', user_id, redis.call('HGET', KEYS[1], 'email')}
+"""
+
+# Ends one session, only for its current secret: a rotated token is no
+# longer proof of owning the session
+_REVOKE = """
+local current = redis.call('HGET', KEYS[1], 'secret')
+if not current or current ~= ARGV[1] then
+    return 0
+end
+local user_id = redis.call('HGET', KEYS[1], 'user_id')
+redis.call('DEL', KEYS[1])
+redis.call('SREM', ARGV[2] .. user_id, ARGV[3])
+return 1
+"""
+
+# Deletes every session of a user together with the index; returns the
+# number of sessions that were still live
+_REVOKE_ALL = """
+local ended = 0
+for _, id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    ended = ended + redis.call('DEL', ARGV[1] .. id)
+end
+redis.call('DEL', KEYS[1])
+return ended
+"""
+
+# Drops index members whose session expired on its own. Every rotation
+# renews the index TTL, so without this it would only ever grow.
+_PRUNE = """
+for _, id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if redis.call('EXISTS', ARGV[1] .. id) == 0 then
+        redis.call('SREM', KEYS[1], id)
+    end
+end
+return 1
+"""
+
+
+class InvalidRefreshToken(Exception):
+    """The refresh token is malformed, expired, revoked or was reused."""
+
+
+@dataclass(frozen=True, slots=True)
+class RefreshSession:
+    session_id: str
+    user_id: int
+    email: str
+    refresh_token: str
+
+
+def _digest(secret: str) -> str:
+    # Secrets are 256 random bits, a fast hash is enough; no bcrypt here
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+class RefreshSessionStore:
+    """
+    Per-device refresh sessions in Redis.
+
+    A refresh token is ``<session id>.<secret>``. Only a digest of the
+    current secret is stored under ``session:<id>``, and every refresh
+    replaces it, so each token works once. ``user_sessions:<user id>``
+    indexes a user's sessions for logout-all. Both expire ``ttl`` seconds
+    after the last refresh.
+    """
+
+    def __init__(self, client=redis_client, ttl: int = config.REFRESH_TOKEN_TTL_SECONDS):
+        """
+        Initialize the store.
+
+        :param client: Async Redis client.
+        :param ttl: Session lifetime in seconds, renewed on every refresh.
+        """
+        self.client = client
+        self.ttl = ttl
+        self._rotate = client.register_script(_ROTATE)
+        self._revoke = client.register_script(_REVOKE)
+        self._revoke_all = client.register_script(_REVOKE_ALL)
+        self._prune = client.register_script(_PRUNE)
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return f"session:{session_id}"
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"user_sessions:{user_id}"
+
+    async def create(self, user_id: int, email: str, device: str = "") -> RefreshSession:
+        """
+        Open a session for a freshly authenticated device.
+
+        Sessions of the user that expired are dropped from the index.
+
+        :param user_id: User ID.
+        :param email: User email, to load the user on refresh.
+        :param device: Free-form device label, e.g. the User-Agent.
+        :return: The session with its first refresh token.
+        """
+        session_id, secret = secrets.token_urlsafe(16), secrets.token_urlsafe(32)
+        now = int(time.time())
+        await self._prune(keys=[self._user_key(user_id)], args=["session:"])
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(self._session_key(session_id), mapping={
+                "user_id": user_id,
+                "email": email,
+                "secret": _digest(secret),
+                "device": device[:200],
+                "created_at": now,
+                "rotated_at": now,
+            })
+            pipe.expire(self._session_key(session_id), self.ttl)
+            pipe.sadd(self._user_key(user_id), session_id)
+            pipe.expire(self._user_key(user_id), self.ttl)
+            await pipe.execute()
+        return RefreshSession(session_id, user_id, email, f"{session_id}.{secret}")
+
+    async def rotate(self, refresh_token: str) -> RefreshSession:
+        """
+        Exchange a refresh token for the session's next one.
+
+        Presenting a token that was already rotated revokes the session.
+
+        :param refresh_token: Token from :meth:`create` or a previous rotation.
+        :return: The session with its new refresh token.
+        :raises InvalidRefreshToken: If the token cannot be used.
+        """
+        session_id, _, secret = refresh_token.partition(".")
+        if not session_id or not secret:
+            raise InvalidRefreshToken()
+        new_secret = secrets.token_urlsafe(32)
+        result = await self._rotate(
+            keys=[self._session_key(session_id)],
+            args=[_digest(secret), _digest(new_secret), self.ttl, "user_sessions:", session_id, int(time.time())],
+        )
+        if result is None:
+            raise InvalidRefreshToken()
+        if result[0] == "reused":
+            logger.warning("Refresh token reuse, revoked session %s of user %s", session_id, result[1])
+            raise InvalidRefreshToken()
+        return RefreshSession(session_id, int(result[1]), result[2], f"{session_id}.{new_secret}")
+
+    async def revoke(self, refresh_token: str) -> None:
+        """
+        End the session a refresh token belongs to (logout of one device).
+
+        Only the session's current token ends it; rotated, unknown and
+        malformed tokens are ignored.
+
+        :param refresh_token: The session's current refresh token.
+        """
+        session_id, _, secret = refresh_token.partition(".")
+        if not session_id or not secret:
+            return
+        await self._revoke(keys=[self._session_key(session_id)], args=[_digest(secret), "user_sessions:", session_id])
+
+    async def revoke_all(self, user_id: int) -> int:
+        """
+        End every session of a user.
+
+        :param user_id: User ID.
+        :return: Number of sessions ended.
+        """
+        return await self._revoke_all(keys=[self._user_key(user_id)], args=["session:"])
+
+
+refresh_sessions = RefreshSessionStore()
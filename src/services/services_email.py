@@ -1,19 +1,215 @@
-import aiosmtplib
+import asyncio
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass
 from email.message import EmailMessage
+
+import aiosmtplib
 from src.conf.config import config
+from src.services.service_cache import redis_client
 
-async def send_email(to_email: str, subject: str, body: str):
+logger = logging.getLogger(__name__)
+
+
+def build_message(to_email: str, subject: str, body: str) -> EmailMessage:
+    """
+    Build a plain text email from the configured sender.
+
+    :param to_email: Recipient address.
+    :param subject: Message subject.
+    :param body: Plain text body.
+    :return: The message, ready to send.
+    """
     message = EmailMessage()
     message["From"] = config.SMTP_USER
     message["To"] = to_email
     message["Subject"] = subject
     message.set_content(body)
+    return message
+
 
+async def send_email(to_email: str, subject: str, body: str):
+    """
+    Send a single email over a one-off SMTP connection.
+
+    Request handlers should use ``email_queue.enqueue`` instead, which
+    returns immediately and reuses connections.
+    """
     await aiosmtplib.send(
-        message,
+        build_message(to_email, subject, body),
         hostname=config.SMTP_HOST,
         port=config.SMTP_PORT,
         username=config.SMTP_USER,
         password=config.SMTP_PASSWORD,
-        use_tls=True,
-    )
\ No newline at end of file
+        use_tls=config.SMTP_USE_TLS,
+    )
+
+
+@dataclass
+class _Outgoing:
+    message: EmailMessage
+    attempts: int = 0
+
+
+class EmailQueue:
+    """
+    In-process outbound mail queue.
+
+    A single worker task drains the queue in batches over one persistent
+    SMTP connection, which is reopened on demand and closed after
+    ``idle_timeout`` seconds without mail. Failed messages are retried
+    with exponential backoff and moved to ``dead_letters`` (and pushed to
+    Redis when a client is given) after ``max_retries`` attempts.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        batch_size: int = 20,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        idle_timeout: float = 30.0,
+        redis=None,
+    ):
+        self._smtp_options = dict(
+            hostname=hostname, port=port, username=username, password=password, use_tls=use_tls
+        )
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.dead_letters: deque = deque(maxlen=1000)
+        self._redis = redis
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending = 0
+        self._idle: asyncio.Event | None = None
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._pending = 0
+            self._smtp = None
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def enqueue(self, to_email: str, subject: str, body: str) -> None:
+        """
+        Queue an email for delivery and return immediately.
+
+        :param to_email: Recipient address.
+        :param subject: Message subject.
+        :param body: Plain text body.
+        """
+        self._ensure_worker()
+        self._pending += 1
+        self._idle.clear()
+        self._queue.put_nowait(_Outgoing(build_message(to_email, subject, body)))
+
+    async def drain(self) -> None:
+        """Wait until every queued message is delivered or dead-lettered."""
+        if self._idle is not None:
+            await self._idle.wait()
+
+    async def close(self) -> None:
+        """Stop the worker and close the SMTP connection."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self._disconnect()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                await self._disconnect()
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._send_batch(batch)
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is None or not self._smtp.is_connected:
+            self._smtp = aiosmtplib.SMTP(**self._smtp_options)
+            await self._smtp.connect()
+        return self._smtp
+
+    async def _disconnect(self) -> None:
+        if self._smtp is not None and self._smtp.is_connected:
+            try:
+                await self._smtp.quit()
+            except aiosmtplib.SMTPException:
+                self._smtp.close()
+        self._smtp = None
+
+    async def _send_batch(self, batch: list) -> None:
+        for item in batch:
+            try:
+                smtp = await self._connection()
+                await smtp.send_message(item.message)
+            except (aiosmtplib.SMTPException, OSError) as e:
+                self._smtp = None
+                await self._retry(item, e)
+            except Exception as e:
+                # Not a delivery problem (e.g. a malformed header): retrying
+                # cannot help, and letting it escape would stop the worker
+                logger.exception("Email to %s cannot be sent", item.message["To"])
+                self._smtp = None
+                await self._dead_letter(item, e)
+            else:
+                self._done()
+
+    async def _retry(self, item: _Outgoing, error: Exception) -> None:
+        item.attempts += 1
+        if item.attempts > self.max_retries:
+            logger.error("Giving up on email to %s: %s", item.message["To"], error)
+            await self._dead_letter(item, error)
+            return
+        delay = self.backoff * 2 ** (item.attempts - 1)
+        logger.warning("Email to %s failed (%s), retrying in %.1fs", item.message["To"], error, delay)
+        self._loop.call_later(delay, self._queue.put_nowait, item)
+
+    async def _dead_letter(self, item: _Outgoing, error: Exception) -> None:
+        entry = {"to": item.message["To"], "subject": item.message["Subject"], "error": str(error)}
+        self.dead_letters.append(entry)
+        if self._redis is not None:
+            try:
+                await self._redis.rpush("email:dead_letters", json.dumps(entry))
+            except Exception:
+                logger.exception("Could not persist dead letter")
+        self._done()
+
+    def _done(self) -> None:
+        self._pending -= 1
+        if self._pending == 0:
+            self._idle.set()
+
+
+email_queue = EmailQueue(
+    hostname=config.SMTP_HOST,
+    port=config.SMTP_PORT,
+    username=config.SMTP_USER,
+    password=config.SMTP_PASSWORD,
+    use_tls=config.SMTP_USE_TLS,
+    batch_size=config.EMAIL_BATCH_SIZE,
+    max_retries=config.EMAIL_MAX_RETRIES,
+    redis=redis_client,
+)
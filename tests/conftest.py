@@ -1,15 +1,25 @@
 import asyncio
+import contextlib
 
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.pool import StaticPool
 
+import cloudinary
+import redis.asyncio as redis
+
 from main import app
+from src.conf.config import config
 from src.db.models import Base, User
-from src.db.db import get_db
+from src.db.instrumentation import instrument_engine
+from src.db.db import get_db, get_stream_session_factory, unit_of_work, WriteTrackingSession
 from src.services.service_auth import create_access_token, hash_password
+from src.services.service_cache import redis_client
+from src.services.service_rate_limit import limiter
+from tests.fake_cloudinary import FakeCloudinary
 
 # Тестова БД SQLite
 SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
@@ -21,12 +31,15 @@ engine = create_async_engine(
     poolclass=StaticPool,
 )
 
+instrument_engine(engine)
+
 # Фабрика сесій
 TestingSessionLocal = async_sessionmaker(
     autocommit=False,
     autoflush=False,
     expire_on_commit=False,
     bind=engine,
+    sync_session_class=WriteTrackingSession,
 )
 
 # Тестовий користувач
@@ -52,6 +65,14 @@ def init_models_wrap():
             session.add(user)
             await session.commit()
 
+        # Start every module with fresh rate limit budgets; a client of its
+        # own, the app's pool belongs to the TestClient's event loop
+        client = redis.Redis(host=config.redis_host, port=config.redis_port)
+        keys = [key async for key in client.scan_iter(f"{limiter.prefix}:*")]
+        if keys:
+            await client.delete(*keys)
+        await client.aclose()
+
     asyncio.run(init_models())
 
 # Замінюємо залежність get_db на тестову
@@ -59,13 +80,63 @@ def init_models_wrap():
 def client():
     async def override_get_db():
         async with TestingSessionLocal() as session:
-            yield session
+            async with unit_of_work(session):
+                yield session
 
     app.dependency_overrides[get_db] = override_get_db
-    yield TestClient(app)
+    app.dependency_overrides[get_stream_session_factory] = lambda: TestingSessionLocal
+    # A pool's lock binds to the first event loop that waits on it, and
+    # every TestClient runs its own loop
+    pool = redis_client.connection_pool
+    redis_client.connection_pool = type(pool)(
+        connection_class=pool.connection_class, max_connections=pool.max_connections, **pool.connection_kwargs
+    )
+    with TestClient(app) as test_client:
+        yield test_client
+        # Redis connections are bound to this client's event loop
+        test_client.portal.call(redis_client.connection_pool.disconnect)
 
 # Отримання токена для авторизованих запитів
 @pytest_asyncio.fixture()
 async def auth_headers():
     token = await create_access_token(data={"sub": tester_user_static["email"]})
-    return {"Authorization": f"Bearer {token}"}
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"}
+
+# Підрахунок SQL-запитів до тестової БД
+@pytest.fixture
+def count_queries():
+    """
+    Context manager collecting the SQL statements sent to the test database.
+
+    Usage: ``with count_queries() as queries: ...; assert len(queries) == 1``.
+    COMMIT/ROLLBACK are not cursor executions and are not counted.
+    """
+    @contextlib.contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    return counter
+
+# Локальний сервер замість Cloudinary
+@pytest.fixture
+def fake_cloudinary(monkeypatch):
+    # The service configures the SDK when first imported, which the avatar
+    # route does lazily; import it now so that does not undo the overrides
+    import src.services.service_cloudinary  # noqa: F401
+
+    settings = cloudinary.config()
+    with FakeCloudinary() as fake:
+        for name, value in {
+            "upload_prefix": fake.url, "cloud_name": "demo", "api_key": "key", "api_secret": "secret"
+        }.items():
+            monkeypatch.setattr(settings, name, value, raising=False)
+        yield fake
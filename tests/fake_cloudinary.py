@@ -0,0 +1,46 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeCloudinary:
+    """
+    Minimal stand-in for the Cloudinary upload API.
+
+    Accepts ``POST /v1_1/<cloud>/image/upload`` and answers like Cloudinary
+    does, so uploads can be tested without network access.
+    """
+
+    def __init__(self):
+        self.uploads = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                public_id = re.search(rb'name="public_id"\r\n\r\n([^\r]+)', body).group(1).decode()
+                fake.uploads.append({"path": self.path, "public_id": public_id, "size": len(body)})
+                payload = json.dumps({
+                    "public_id": public_id,
+                    "secure_url": f"https://res.cloudinary.com/fake/image/upload/{public_id}.jpg",
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
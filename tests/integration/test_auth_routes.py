@@ -2,6 +2,7 @@ import pytest
 from sqlalchemy import select
 from fastapi import status
 
+from src.conf.config import config
 from src.db.models import User
 from tests.conftest import TestingSessionLocal
 from tests.test_utils import test_user
@@ -10,13 +11,16 @@ from tests.conftest import tester_user_static
 current_test_user = test_user()
 
 
-def test_register_user(client):
-    response = client.post("/api/auth/signup", json={
-        "email": current_test_user["email"],
-        "password": current_test_user["password"]
-    })
+def test_register_user(client, count_queries):
+    with count_queries() as queries:
+        response = client.post("/api/auth/signup", json={
+            "email": current_test_user["email"],
+            "password": current_test_user["password"]
+        })
     assert response.status_code == status.HTTP_201_CREATED
     assert response.json()["email"] == current_test_user["email"]
+    # Existence check, then INSERT ... RETURNING
+    assert len(queries) == 2
 
 @pytest.mark.asyncio
 async def test_login(client):
@@ -54,3 +58,45 @@ def test_login_failures(client, email, password, status_code):
         "password": password
     }, headers={"Content-Type": "application/x-www-form-urlencoded"})
     assert response.status_code == status_code
+
+
+def test_fast_path_authorizes_from_claims(client, count_queries, monkeypatch):
+    monkeypatch.setattr(config, "AUTH_FAST_PATH", True)
+    response = client.post("/api/auth/login",
+                           data={"username": tester_user_static["email"], "password": tester_user_static["password"]})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    with count_queries() as queries:
+        response = client.get("/api/contacts/", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not any("FROM users" in statement for statement in queries)
+
+
+def test_refresh_rotates_and_detects_reuse(client):
+    response = client.post("/api/auth/login",
+                           data={"username": tester_user_static["email"], "password": tester_user_static["password"]})
+    first = response.json()["refresh_token"]
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == status.HTTP_200_OK
+    second = response.json()["refresh_token"]
+    assert second != first
+    assert client.get("/api/user/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"}).status_code == 200
+
+    assert client.post("/api/auth/refresh", json={"refresh_token": first}).status_code == status.HTTP_401_UNAUTHORIZED
+    # Reuse of the first token ended the session for the rotated one too
+    assert client.post("/api/auth/refresh", json={"refresh_token": second}).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_logout_all_revokes_access_and_refresh_tokens(client):
+    response = client.post("/api/auth/login",
+                           data={"username": current_test_user["email"], "password": current_test_user["password"]})
+    tokens = response.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    assert client.post("/api/auth/logout-all", headers=headers).status_code == status.HTTP_204_NO_CONTENT
+
+    assert client.get("/api/contacts/", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
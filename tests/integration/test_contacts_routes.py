@@ -1,6 +1,11 @@
+import json
+from datetime import date, timedelta
+
 import pytest
 from fastapi import status
 
+from src.services.service_pagination import decode_cursor
+
 def test_create_contact(client, auth_headers):
     response = client.post("/api/contacts/", json={
         "first_name": "John",
@@ -20,6 +25,35 @@ def test_get_contacts(client, auth_headers):
     assert response.status_code == status.HTTP_200_OK
     assert isinstance(response.json(), list)
 
+
+def test_get_contacts_cursor(client, auth_headers):
+    response = client.get("/api/contacts/", params={"limit": 1}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/contacts/", params={"limit": 1, "cursor": cursor}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_contacts_invalid_cursor(client, auth_headers):
+    response = client.get("/api/contacts/", params={"cursor": "bogus!"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_contacts_fields(client, auth_headers):
+    response = client.get("/api/contacts/", headers=auth_headers)
+    assert response.json() and all("extra_data" not in contact for contact in response.json())
+
+    response = client.get("/api/contacts/", params={"fields": "first_name,last_name"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert {tuple(contact) for contact in response.json()} == {("first_name", "last_name", "id")}
+
+    response = client.get("/api/contacts/", params={"fields": "first_name,user_id"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Unknown fields: user_id"
+
 from fastapi import status
 
 
@@ -29,6 +63,22 @@ def test_get_contact_by_id(client, auth_headers):
     assert response.json()["email"] == "john.doe@example.com"
 
 
+def test_search_contacts(client, auth_headers):
+    response = client.get("/api/contacts/search/", params={"query": "DOE"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [c["id"] for c in response.json()] == [contact_id]
+
+    response = client.get("/api/contacts/search/", params={"query": "%"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == []
+
+
+@pytest.mark.parametrize("params", [{"skip": -1}, {"limit": 0}])
+def test_search_contacts_rejects_bad_paging(client, auth_headers, params):
+    response = client.get("/api/contacts/search/", params={"query": "a", **params}, headers=auth_headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 def test_get_contact_not_found(client, auth_headers):
     response = client.get("/api/contacts/9999", headers=auth_headers)
     assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -65,3 +115,331 @@ def test_delete_contact(client, auth_headers):
 def test_repeat_delete_contact(client, auth_headers):
     response = client.delete(f"/api/contacts/{contact_id}", headers=auth_headers)
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_upcoming_birthdays(client, auth_headers):
+    soon = date.today() + timedelta(days=3)
+    response = client.post("/api/contacts/", json={
+        "first_name": "Birthday",
+        "last_name": "Soon",
+        "email": "birthday.soon@example.com",
+        "phone": "1234567890",
+        "birthday": soon.replace(year=1992 if soon.month != 2 or soon.day != 29 else 1996).isoformat()
+    }, headers=auth_headers)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = client.get("/api/contacts/birthdays/upcoming", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert "birthday.soon@example.com" in [c["email"] for c in response.json()]
+
+
+def test_import_contacts_csv(client, auth_headers):
+    body = (
+        "first_name,last_name,email,phone,birthday,extra_data\n"
+        "Ann,Import,ann.import@example.com,111,1991-02-03,\n"
+        "Bad,Import,not-an-email,222,1991-02-03,\n"
+        'Bob,Import,bob.import@example.com,333,1992-03-04,"two\nlines"\n'
+    )
+    response = client.post(
+        "/api/contacts/import", content=body, headers={**auth_headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert (result["inserted"], result["failed"]) == (2, 1)
+    assert result["errors"][0]["row"] == 2
+
+    response = client.get(
+        "/api/contacts/search/", params={"query": "import", "fields": "first_name,extra_data"}, headers=auth_headers
+    )
+    assert {c["first_name"]: c["extra_data"] for c in response.json()} == {"Ann": None, "Bob": "two\nlines"}
+
+
+def test_import_contacts_jsonl(client, auth_headers):
+    body = (
+        '{"first_name": "Cid", "last_name": "Lines", "email": "cid@example.com", "phone": "1", "birthday": "1990-01-01"}\n'
+        "not json\n"
+    )
+    response = client.post(
+        "/api/contacts/import", params={"format": "jsonl"}, content=body, headers=auth_headers
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "inserted": 1, "failed": 1, "errors": [{"row": 2, "errors": ["Row is not a JSON object"]}]
+    }
+
+
+def test_imported_contacts_get_consecutive_change_numbers(client, auth_headers):
+    token = client.get("/api/contacts/changes", headers=auth_headers).json()["next_token"]
+    body = "".join(
+        f'{{"first_name": "Seq{i}", "last_name": "Import", "email": "seq{i}@example.com", '
+        f'"phone": "1", "birthday": "1990-01-01"}}\n'
+        for i in range(3)
+    )
+    client.post("/api/contacts/import", params={"format": "jsonl"}, content=body, headers=auth_headers)
+
+    names = []
+    while True:
+        page = client.get("/api/contacts/changes", params={"since": token, "limit": 1}, headers=auth_headers).json()
+        names += [contact["first_name"] for contact in page["changed"]]
+        token = page["next_token"]
+        if not page["has_more"]:
+            break
+    assert names == ["Seq0", "Seq1", "Seq2"]
+
+
+def test_missed_writes_do_not_use_up_change_numbers(client, auth_headers):
+    def data(name):
+        return {"first_name": name, "last_name": "Gap", "email": f"{name.lower()}@example.com",
+                "phone": "555", "birthday": "1993-04-05"}
+
+    token = client.get("/api/contacts/changes", headers=auth_headers).json()["next_token"]
+    assert client.put("/api/contacts/999999", json=data("Missing"), headers=auth_headers).status_code == 404
+    assert client.delete("/api/contacts/999999", headers=auth_headers).status_code == 404
+    client.post("/api/contacts/batch", json={"operations": [
+        {"op": "delete", "id": 999999},
+        {"op": "update", "id": 999998, "data": data("Missing")},
+        {"op": "create", "data": data("Kept")},
+    ]}, headers=auth_headers)
+    client.post("/api/contacts", json=data("Next"), headers=auth_headers)
+
+    page = client.get("/api/contacts/changes", params={"since": token}, headers=auth_headers).json()
+    assert [contact["first_name"] for contact in page["changed"]] == ["Kept", "Next"]
+    assert decode_cursor(page["next_token"])[0] == decode_cursor(token)[0] + 2
+
+
+def test_import_contacts_unknown_format(client, auth_headers):
+    response = client.post(
+        "/api/contacts/import", content=b"{}", headers={**auth_headers, "Content-Type": "application/xml"}
+    )
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+def test_export_contacts_csv(client, auth_headers):
+    response = client.get("/api/contacts/export", headers={**auth_headers, "Accept-Encoding": "identity"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "content-encoding" not in response.headers
+    lines = response.text.splitlines()
+    assert lines[0] == "id,first_name,last_name,email,phone,birthday,extra_data"
+    assert any("ann.import@example.com" in line for line in lines)
+
+
+@pytest.mark.parametrize("accept_encoding, gzipped", [
+    ("gzip;q=0", False),
+    ("gzip; q=0.0, br", False),
+    ("*;q=0", False),
+    ("GZIP;q=0.5", True),
+    ("br, *", True),
+    ("identity, *;q=0.1, gzip;q=0", False),
+])
+def test_export_honours_accept_encoding_q_values(client, auth_headers, accept_encoding, gzipped):
+    response = client.get("/api/contacts/export", headers={**auth_headers, "Accept-Encoding": accept_encoding})
+    assert response.status_code == status.HTTP_200_OK
+    assert (response.headers.get("content-encoding") == "gzip") is gzipped
+
+
+def test_export_contacts_jsonl_gzip(client, auth_headers):
+    response = client.get(
+        "/api/contacts/export", params={"format": "jsonl"}, headers={**auth_headers, "Accept-Encoding": "gzip"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert {"first_name": "Bob", "extra_data": "two\nlines"}.items() <= next(
+        row for row in rows if row["first_name"] == "Bob"
+    ).items()
+
+
+def test_export_contacts_vcard(client, auth_headers):
+    response = client.get("/api/contacts/export", params={"format": "vcard"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text.count("BEGIN:VCARD") == response.text.count("END:VCARD") > 0
+    assert "NOTE:two\\nlines\r\n" in response.text
+
+
+def test_batch_contacts(client, auth_headers):
+    def data(name):
+        return {"first_name": name, "last_name": "Batch", "email": f"{name.lower()}@example.com",
+                "phone": "555", "birthday": "1993-04-05"}
+
+    response = client.post("/api/contacts/batch", json={"operations": [
+        {"op": "create", "data": data("One")},
+        {"op": "create", "data": data("Two")},
+    ]}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    one, two = (result["contact"]["id"] for result in response.json()["results"])
+
+    response = client.post("/api/contacts/batch", json={"operations": [
+        {"op": "delete", "id": one},
+        {"op": "update", "id": two, "data": {**data("Two"), "birthday": "1993-12-31"}},
+        {"op": "create", "data": data("Three")},
+        {"op": "delete", "id": 999999},
+    ]}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert [(r["op"], r["status"]) for r in results] == [
+        ("delete", "deleted"), ("update", "updated"), ("create", "created"), ("delete", "not_found")
+    ]
+    assert results[1]["contact"]["birthday"] == "1993-12-31"
+
+    response = client.get(f"/api/contacts/{one}", headers=auth_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = client.get(f"/api/contacts/{two}", headers=auth_headers)
+    assert response.json()["birthday"] == "1993-12-31"
+
+
+def test_batch_contacts_rejects_duplicate_ids(client, auth_headers):
+    response = client.post("/api/contacts/batch", json={"operations": [
+        {"op": "delete", "id": 1},
+        {"op": "delete", "id": 1},
+    ]}, headers=auth_headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_contact_write_round_trips(client, auth_headers, count_queries):
+    body = {"first_name": "Round", "last_name": "Trip", "email": "round.trip@example.com",
+            "phone": "1234567890", "birthday": "1990-01-01"}
+    client.get("/api/contacts/0", headers=auth_headers)  # warm the user cache
+
+    # Each write: reserve the change sequence number, then the RETURNING statement
+    with count_queries() as queries:
+        response = client.post("/api/contacts/", json=body, headers=auth_headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(queries) == 2
+    new_id = response.json()["id"]
+
+    with count_queries() as queries:
+        response = client.put(f"/api/contacts/{new_id}", json={**body, "phone": "000"}, headers=auth_headers)
+    assert response.json()["phone"] == "000"
+    assert len(queries) == 2
+
+    with count_queries() as queries:
+        response = client.delete(f"/api/contacts/{new_id}", headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries) == 2
+
+
+def test_server_timing_header(client, auth_headers):
+    client.get("/api/contacts/0", headers=auth_headers)  # warm the user cache
+    response = client.get("/api/contacts/search/", params={"query": "zzz-no-match"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["server-timing"].startswith('db;dur=')
+    assert 'desc="1 queries"' in response.headers["server-timing"]
+
+
+def _new_contact(client, auth_headers, name):
+    response = client.post("/api/contacts/", json={
+        "first_name": name, "last_name": "Sync", "email": f"{name.lower()}.sync@example.com",
+        "phone": "1234567890", "birthday": "1990-01-01",
+    }, headers=auth_headers)
+    return response.json()
+
+
+def test_changes_feed(client, auth_headers):
+    kept, edited, removed = (_new_contact(client, auth_headers, name) for name in ("Kept", "Edited", "Removed"))
+    full = client.get("/api/contacts/changes", headers=auth_headers).json()
+    assert {kept["id"], edited["id"], removed["id"]} <= {contact["id"] for contact in full["changed"]}
+    assert full["deleted"] == [] and not full["has_more"]
+
+    client.put(f"/api/contacts/{edited['id']}", json={**edited, "phone": "555"}, headers=auth_headers)
+    client.delete(f"/api/contacts/{removed['id']}", headers=auth_headers)
+    added = _new_contact(client, auth_headers, "Added")
+
+    delta = client.get("/api/contacts/changes", params={"since": full["next_token"]}, headers=auth_headers).json()
+    assert [contact["id"] for contact in delta["changed"]] == [edited["id"], added["id"]]
+    assert delta["changed"][0]["phone"] == "555"
+    assert delta["deleted"] == [removed["id"]]
+
+    idle = client.get("/api/contacts/changes", params={"since": delta["next_token"]}, headers=auth_headers).json()
+    assert idle == {"changed": [], "deleted": [], "next_token": delta["next_token"], "has_more": False}
+
+    page = client.get("/api/contacts/changes", params={"since": full["next_token"], "limit": 1}, headers=auth_headers).json()
+    assert page["has_more"] and len(page["changed"]) == 1
+
+
+def test_changes_invalid_token(client, auth_headers):
+    response = client.get("/api/contacts/changes", params={"since": "garbage"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_contact_etag(client, auth_headers):
+    contact = _new_contact(client, auth_headers, "Etag")
+    response = client.get(f"/api/contacts/{contact['id']}", headers=auth_headers)
+    etag = response.headers["etag"]
+    assert etag.startswith('"')
+
+    response = client.get(f"/api/contacts/{contact['id']}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    client.put(f"/api/contacts/{contact['id']}", json={**contact, "phone": "777"}, headers=auth_headers)
+    response = client.get(f"/api/contacts/{contact['id']}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    assert response.json()["phone"] == "777"
+
+
+def _pages(client, auth_headers, **params):
+    contacts, cursor = [], None
+    while True:
+        response = client.get("/api/contacts/", params={**params, "limit": 2, "cursor": cursor}, headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        contacts += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return contacts
+
+
+@pytest.mark.parametrize("sort, key", [
+    ("last_name", lambda contact: (contact["last_name"], contact["first_name"], contact["id"])),
+    ("-birthday", lambda contact: (contact["birthday"], contact["id"])),
+])
+def test_get_contacts_sorted(client, auth_headers, sort, key):
+    everything = client.get("/api/contacts/", params={"sort": sort}, headers=auth_headers).json()
+    assert len(everything) > 2
+    assert everything == sorted(everything, key=key, reverse=sort.startswith("-"))
+    assert _pages(client, auth_headers, sort=sort) == everything
+
+
+def test_get_contacts_filtered(client, auth_headers):
+    before = client.get("/api/contacts/", params={"sort": "-id", "limit": 1}, headers=auth_headers).json()[0]
+    july, december = (
+        client.post("/api/contacts/", json={
+            "first_name": "Filtered", "last_name": "Contact", "email": email,
+            "phone": "1234567890", "birthday": birthday,
+        }, headers=auth_headers).json()
+        for email, birthday in (("july@filters.example.org", "1991-07-15"), ("december@example.com", "1985-12-30"))
+    )
+
+    def ids(**params):
+        response = client.get("/api/contacts/", params=params, headers=auth_headers)
+        assert response.status_code == status.HTTP_200_OK
+        return {contact["id"] for contact in response.json()}
+
+    assert ids(email_domain="FILTERS.example.org") == {july["id"]}
+    assert july["id"] in ids(birthday_month_from=7) and december["id"] not in ids(birthday_month_from=7)
+    assert {july["id"], december["id"]} <= ids(birthday_month_from=12, birthday_month_to=7)
+    assert december["id"] not in ids(birthday_month_from=8, birthday_month_to=11)
+    assert ids(created_after=before["updated_at"]) == {july["id"], december["id"]}
+    assert ids(email_domain="filters.example.org", birthday_month_from=12) == set()
+
+
+@pytest.mark.parametrize("params", [
+    {"skip": -1},
+    {"limit": 0},
+    {"limit": 1001},
+    {"sort": "phone"},
+    {"birthday_month_from": 13},
+    {"email_domain": "%"},
+])
+def test_get_contacts_invalid_query(client, auth_headers, params):
+    response = client.get("/api/contacts/", params=params, headers=auth_headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_get_contacts_cursor_from_another_sort(client, auth_headers):
+    response = client.get("/api/contacts/", params={"limit": 1, "sort": "birthday"}, headers=auth_headers)
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/api/contacts/", params={"cursor": cursor, "sort": "last_name"}, headers=auth_headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,20 @@
+from fastapi import status
+
+
+def test_db_metrics_require_admin(client, auth_headers):
+    response = client.get("/api/metrics/db", headers=auth_headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_prometheus_metrics(client, auth_headers):
+    client.get("/api/contacts/0", headers=auth_headers)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/contacts/{contact_id}",status="404"}' in body
+    assert "http_request_duration_seconds_bucket" in body
+    assert 'redis_command_duration_seconds_count{command="GET"}' in body
+    assert "db_pool_checked_out_connections" in body
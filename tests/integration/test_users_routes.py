@@ -1,7 +1,18 @@
+import asyncio
+import io
 import os
+
+import pytest
 from fastapi import status
+from PIL import Image
+from sqlalchemy import select
 from unittest.mock import patch
 
+from src.conf.config import config
+from src.db.models import User, UserRole
+from src.services.service_auth import create_access_token
+from tests.conftest import TestingSessionLocal, tester_user_static
+
 
 def test_read_current_user(client, auth_headers):
     response = client.get("/api/user/me", headers=auth_headers)
@@ -9,24 +20,99 @@ def test_read_current_user(client, auth_headers):
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["email"].startswith("tester_user_static")
 
-@patch("src.services.service_cloudinary.upload_avatar")
-def test_update_avatar_user(mock_upload_file, client, auth_headers):
-    # Мокаємо відповідь від сервісу завантаження файлів
-    fake_url = "http://example.com/avatar.jpg"
-    mock_upload_file.return_value = fake_url
+@pytest.fixture
+def admin_headers():
+    async def create_admin():
+        async with TestingSessionLocal() as session:
+            if await session.scalar(select(User).where(User.email == "avatar_admin@example.com")) is None:
+                session.add(User(
+                    email="avatar_admin@example.com",
+                    hashed_password=tester_user_static["hashed_password"],
+                    role=UserRole.ADMIN,
+                ))
+                await session.commit()
+        return await create_access_token(data={"sub": "avatar_admin@example.com"})
+
+    return {"Authorization": f"Bearer {asyncio.run(create_admin())}"}
+
+
+def make_png() -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (640, 480), "teal").save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_update_avatar_user(client, admin_headers, fake_cloudinary):
+    response = client.post(
+        "/api/user/avatar", headers=admin_headers, files={"file": ("avatar.png", make_png(), "image/png")}
+    )
+
+    assert response.status_code == status.HTTP_200_OK, response.text
+    user_id = client.get("/api/user/me", headers=admin_headers).json()["id"]
+    avatar_url = f"https://res.cloudinary.com/fake/image/upload/user_avatars/{user_id}.jpg"
+    assert response.json() == {"avatar_url": avatar_url}
+    assert [upload["public_id"] for upload in fake_cloudinary.uploads] == [f"user_avatars/{user_id}"]
+    # The cached user was invalidated after the commit
+    assert client.get("/api/user/me", headers=admin_headers).json()["avatar_url"] == avatar_url
+
+
+def test_update_avatar_rejects_large_files(client, admin_headers, fake_cloudinary):
+    data = b"\x89PNG\r\n\x1a\n" + bytes(config.AVATAR_MAX_BYTES)
+
+    response = client.post("/api/user/avatar", headers=admin_headers, files={"file": ("avatar.png", data, "image/png")})
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert fake_cloudinary.uploads == []
+
+
+@pytest.mark.parametrize("content_type, data", [("text/plain", make_png()), ("image/png", b"#!/bin/sh\necho hi")])
+def test_update_avatar_rejects_non_images(client, admin_headers, fake_cloudinary, content_type, data):
+    response = client.post(
+        "/api/user/avatar", headers=admin_headers, files={"file": ("avatar.png", data, content_type)}
+    )
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    assert fake_cloudinary.uploads == []
+
+
+def test_update_avatar_needs_admin(client, auth_headers, fake_cloudinary):
+    response = client.post(
+        "/api/user/avatar", headers=auth_headers, files={"file": ("avatar.png", make_png(), "image/png")}
+    )
+
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert fake_cloudinary.uploads == []
+
+def test_rate_limit_per_user(client):
+    # Unknown user: the limiter runs before authentication, so 401s still count
+    token = asyncio.run(create_access_token(data={"sub": "rate_limited@example.com"}))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    statuses = [client.get("/api/user/me", headers=headers).status_code for _ in range(6)]
+
+    assert statuses == [status.HTTP_401_UNAUTHORIZED] * 5 + [status.HTTP_429_TOO_MANY_REQUESTS]
+    assert int(client.get("/api/user/me", headers=headers).headers["Retry-After"]) > 0
+    assert 'http_rate_limited_total{route="/api/user/me"}' in client.get("/metrics").text
+
+
+def test_rate_limit_retry_after_is_at_least_one_second():
+    from starlette.requests import Request
+
+    from main import rate_limit_handler
+    from src.services.service_rate_limit import RateLimitExceeded
+
+    request = Request({"type": "http", "headers": []})
+    response = asyncio.run(rate_limit_handler(request, RateLimitExceeded(0.0)))
 
-    # Файл, який буде відправлено
-    file_data = {"file": ("avatar.jpg", b"fake image content", "image/jpeg")}
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert response.headers["Retry-After"] == "1"
 
-    # Відправка PATCH-запиту
-    response = client.patch("/api/users/avatar", headers=auth_headers, files=file_data)
 
-    # Перевірка, що запит був успішним
-    assert response.status_code == 200, response.text
+def test_avatar_cache_invalidation_survives_redis_errors(caplog):
+    import redis.asyncio as redis
+    from src.api import api_users
 
-    # Перевірка відповіді
-    data = response.json()
-    assert data["avatar_url"] == fake_url
+    with patch.object(api_users, "invalidate_user", side_effect=redis.ConnectionError()):
+        asyncio.run(api_users._invalidate_after_update("user@example.com"))
 
-    # Перевірка виклику функції upload_file
-    mock_upload_file.assert_called_once()
\ No newline at end of file
+    assert "Could not invalidate the cached user" in caplog.text
@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.db import instrumentation
+from src.db.instrumentation import QueryFingerprints, fingerprint, instrument_engine, track_queries
+
+
+def test_fingerprint_normalizes_literals_and_lists():
+    assert fingerprint(
+        "SELECT * FROM contacts\n WHERE id IN ($1::INTEGER, $2::INTEGER) AND email = 'a@b.c' LIMIT 10"
+    ) == "SELECT * FROM contacts WHERE id IN (...) AND email = ? LIMIT ?"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?, ?), ..."
+    assert fingerprint("SELECT :name, %(other)s, x::DATE FROM t_1") == "SELECT ?, ?, x::DATE FROM t_1"
+
+
+def test_fingerprints_are_bounded():
+    fingerprints = QueryFingerprints(max_entries=1, slow_seconds=0.5)
+    fingerprints.record("SELECT 1", 0.1)
+    fingerprints.record("SELECT 2", 0.7)
+    fingerprints.record("SELECT a FROM t", 0.1)
+
+    snapshot = fingerprints.snapshot()
+    assert snapshot["dropped"] == 1
+    assert snapshot["statements"] == [
+        {"fingerprint": "SELECT ?", "count": 2, "slow": 1, "total_ms": 800.0, "mean_ms": 400.0, "max_ms": 700.0}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_queries_are_tracked_per_context(monkeypatch, caplog):
+    monkeypatch.setattr(instrumentation, "query_fingerprints", QueryFingerprints(100, slow_seconds=0))
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+
+    with caplog.at_level(logging.WARNING, logger="src.db.instrumentation"):
+        with track_queries() as stats:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await conn.execute(text("SELECT 2"))
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 3"))
+    await engine.dispose()
+
+    assert stats.count == 2
+    assert stats.total_seconds >= stats.slowest_seconds > 0
+    assert stats.server_timing().startswith('db;dur=')
+    assert instrumentation.query_fingerprints.snapshot()["statements"][0]["count"] == 3
+    assert [record.fingerprint for record in caplog.records] == ["SELECT ?"] * 3
+
+
+@pytest.mark.asyncio
+async def test_failed_statements_do_not_leak_start_times(monkeypatch):
+    monkeypatch.setattr(instrumentation, "query_fingerprints", QueryFingerprints(100, slow_seconds=60))
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrument_engine(engine)
+
+    async with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await conn.execute(text("SELECT * FROM missing"))
+        await conn.execute(text("SELECT 1"))
+        assert conn.info["query_start"] == []
+    await engine.dispose()
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import main
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_replica_health_checks():
+    stopped = asyncio.Event()
+
+    async def run_health_checks(interval):
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            # A probe still closing its connection when cancelled
+            await asyncio.sleep(0.05)
+            stopped.set()
+
+    async def listen():
+        await asyncio.sleep(3600)
+
+    manager = MagicMock(has_replicas=True, run_health_checks=run_health_checks, close=AsyncMock())
+    with (
+        patch.object(main, "sessionmanager", manager),
+        patch.object(main, "listen_for_user_invalidations", listen),
+        patch.object(main, "email_queue", AsyncMock()),
+        patch.object(main, "password_hasher", MagicMock()),
+        patch.object(main, "mark_process_dead", MagicMock()),
+    ):
+        async with main.lifespan(main.app):
+            await asyncio.sleep(0)
+
+    assert stopped.is_set()
+    manager.close.assert_awaited_once()
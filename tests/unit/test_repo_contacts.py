@@ -4,13 +4,16 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.db.db import UNIT_OF_WORK
 from src.db.models import Contact, User
 from src.repository.repo_contacts import ContactRepository
 from src.schemas import ContactCreate, ContactUpdate
 
 @pytest.fixture
 def mock_session():
-    return AsyncMock(spec=AsyncSession)
+    session = AsyncMock(spec=AsyncSession)
+    session.info = {}
+    return session
 
 @pytest.fixture
 def contact_repository(mock_session):
@@ -33,6 +36,35 @@ async def test_get_contacts(contact_repository, mock_session, user):
     assert len(contacts) == 1
     assert contacts[0].first_name == "Test"
 
+@pytest.mark.asyncio
+async def test_get_contacts_after_cursor(contact_repository, mock_session, user):
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = []
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    await contact_repository.get_all(user=user, limit=10, after=[42])
+
+    stmt = mock_session.execute.await_args.args[0]
+    sql = str(stmt.compile(compile_kwargs={"literal_binds": True}))
+    assert "(contacts.id) > (42)" in sql
+    assert "ORDER BY contacts.id" in sql
+    assert "OFFSET" not in sql
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("as_rows, sort_columns", [(False, set()), (True, {"contacts.id AS sort_0"})])
+async def test_get_contacts_loads_selected_fields(contact_repository, mock_session, user, as_rows, sort_columns):
+    mock_session.execute = AsyncMock(return_value=MagicMock())
+
+    await contact_repository.get_all(user=user, as_rows=as_rows)
+    default_sql = str(mock_session.execute.await_args.args[0])
+    await contact_repository.get_all(user=user, as_rows=as_rows, fields=("first_name", "id"))
+    names_sql = str(mock_session.execute.await_args.args[0])
+
+    assert "contacts.extra_data" not in default_sql
+    assert "contacts.updated_at" in default_sql
+    columns = names_sql.split("\n")[0].removeprefix("SELECT ").strip().split(", ")
+    assert set(columns) == {"contacts.first_name", "contacts.id"} | sort_columns
+
 @pytest.mark.asyncio
 async def test_get_contact_by_id(contact_repository, mock_session, user):
     mock_result = MagicMock()
@@ -51,42 +83,140 @@ async def test_create_contact(contact_repository, mock_session, user):
     contact_data = ContactCreate(
         first_name="Jane", last_name="Doe", email="jane@example.com", phone="1234567890", birthday=datetime.date.fromisoformat("1985-07-26")
     )
+    mock_session.scalar = AsyncMock(side_effect=[7, Contact(id=1, **contact_data.model_dump(), user_id=user.id)])
+
     result = await contact_repository.create(body=contact_data, user=user)
 
     assert isinstance(result, Contact)
     assert result.first_name == "Jane"
     assert result.email == "jane@example.com"
+    seq_stmt, stmt = (call.args[0] for call in mock_session.scalar.await_args_list)
+    assert str(seq_stmt.compile()).startswith("UPDATE users SET change_seq")
+    assert str(stmt.compile()).startswith("INSERT INTO contacts")
+    assert stmt.compile().params["birthday_md"] == 726
+    assert stmt.compile().params["change_seq"] == 7
+    mock_session.commit.assert_awaited_once()
+    mock_session.refresh.assert_not_awaited()
+    mock_session.execute.assert_not_awaited()
 
 @pytest.mark.asyncio
 async def test_update_contact(contact_repository, mock_session, user):
     contact_data = ContactUpdate(first_name="Updated", last_name="User", email="updated@example.com", phone="1234567890", birthday=datetime.date.fromisoformat("1985-07-26"))
-    existing_contact = Contact(id=1, first_name="Old", last_name="User", email="old@example.com", user=user)
-
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = existing_contact
-    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_session.scalar = AsyncMock(side_effect=[3, Contact(id=1, **contact_data.model_dump(), user_id=user.id)])
 
     updated = await contact_repository.update(contact_id=1, body=contact_data, user=user)
 
     assert updated.first_name == "Updated"
     assert updated.email == "updated@example.com"
+    stmt = mock_session.scalar.await_args.args[0]
+    assert str(stmt.compile()).startswith("UPDATE contacts")
+    assert "contacts.deleted_at IS NULL" in str(stmt.compile())
+    assert stmt.compile().params["change_seq"] == 3
     mock_session.commit.assert_awaited_once()
-    mock_session.refresh.assert_awaited_once_with(existing_contact)
+    mock_session.refresh.assert_not_awaited()
 
 @pytest.mark.asyncio
 async def test_remove_contact(contact_repository, mock_session, user):
     existing_contact = Contact(id=1, first_name="ToDelete", last_name="User", email="del@example.com", user=user)
-
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = existing_contact
-    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_session.scalar = AsyncMock(side_effect=[4, existing_contact])
 
     deleted = await contact_repository.delete(contact_id=1, user=user)
 
     assert deleted.first_name == "ToDelete"
-    mock_session.delete.assert_awaited_once_with(existing_contact)
+    # A tombstone for the change feed rather than a DELETE
+    stmt = mock_session.scalar.await_args.args[0]
+    assert str(stmt.compile()).startswith("UPDATE contacts SET updated_at")
+    assert {"deleted_at", "change_seq"} <= stmt.compile().params.keys()
     mock_session.commit.assert_awaited_once()
 
+@pytest.mark.asyncio
+async def test_create_contact_in_unit_of_work_only_flushes(contact_repository, mock_session, user):
+    mock_session.info[UNIT_OF_WORK] = True
+    mock_session.scalar = AsyncMock(side_effect=[1, Contact(id=1)])
+
+    await contact_repository.create(
+        body=ContactCreate(first_name="Jane", last_name="Doe", email="jane@example.com", phone="1",
+                           birthday=datetime.date(1985, 7, 26)),
+        user=user,
+    )
+
+    mock_session.flush.assert_awaited_once()
+    mock_session.commit.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_search_contacts_escapes_wildcards(contact_repository, mock_session, user):
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = []
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    await contact_repository.search(user=user, query="50%_off", limit=5)
+
+    stmt = mock_session.execute.await_args.args[0]
+    params = stmt.compile().params
+    assert "%50\\%\\_off%" in params.values()
+    assert stmt._limit == 5
+
+def test_contact_birthday_md_follows_birthday(user):
+    contact = Contact(first_name="Leap", last_name="Day", birthday=datetime.date(1996, 2, 29), user=user)
+    assert contact.birthday_md == 229
+
+    contact.birthday = datetime.date(1990, 12, 31)
+    assert contact.birthday_md == 1231
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("today,expected_sql,params", [
+    (datetime.date(2025, 6, 10), "BETWEEN", {610, 617}),
+    (datetime.date(2025, 12, 28), "OR", {1228, 104}),
+    (datetime.date(2025, 2, 21), "BETWEEN", {221, 229}),
+    (datetime.date(2024, 2, 21), "BETWEEN", {221, 228}),
+])
+async def test_upcoming_birthdays_window(contact_repository, mock_session, user, today, expected_sql, params):
+    mock_result = MagicMock()
+    mock_result.scalars.return_value.all.return_value = []
+    mock_session.execute = AsyncMock(return_value=mock_result)
+
+    await contact_repository.upcoming_birthdays(user=user, today=today)
+
+    stmt = mock_session.execute.await_args.args[0]
+    compiled = stmt.compile()
+    assert expected_sql in str(compiled.statement.whereclause.compile())
+    assert params <= set(compiled.params.values())
+
+@pytest.mark.asyncio
+async def test_batch_uses_one_statement_per_kind(contact_repository, mock_session, user):
+    updated = Contact(id=5, first_name="New", last_name="Name", user_id=1)
+    mock_session.scalar = AsyncMock(return_value=3)
+    mock_session.scalars = AsyncMock(side_effect=[
+        MagicMock(all=MagicMock(return_value=[5, 7])),
+        MagicMock(all=MagicMock(return_value=[updated])),
+        MagicMock(all=MagicMock(return_value=[])),
+    ])
+    body = ContactUpdate(first_name="New", last_name="Name", email="new@example.com",
+                         phone="1", birthday=datetime.date(1990, 12, 31))
+
+    created, updates, deleted = await contact_repository.batch([], {5: body, 6: body}, [7], user)
+
+    assert (created, updates, deleted) == ([], {5: updated}, {})
+    live_stmt, update_stmt, delete_stmt = (call.args[0] for call in mock_session.scalars.await_args_list)
+    assert str(live_stmt.compile()).startswith("SELECT contacts.id")
+    update_sql = str(update_stmt.compile())
+    assert update_sql.count("CASE contacts.id") == 8
+    assert "birthday_md=CASE" in update_sql
+    assert 1231 in update_stmt.compile().params.values()
+    # Sequence numbers 1..3 reserved at once, the one of missing contact 6
+    # given back, the rest used in operation order
+    assert update_sql.count("WHEN") == 8
+    assert 1 in update_stmt.compile().params.values()
+    delete_sql = str(delete_stmt.compile())
+    assert delete_sql.startswith("UPDATE contacts SET updated_at")
+    assert "change_seq=CASE" in delete_sql
+    assert 2 in delete_stmt.compile().params.values()
+    mock_session.scalar.assert_awaited_once()
+    release = mock_session.execute.await_args.args[0].compile()
+    assert str(release).startswith("UPDATE users SET change_seq=(users.change_seq - ")
+    assert 1 in release.params.values()
+    mock_session.commit.assert_not_awaited()
+
 @pytest.mark.asyncio
 async def test_get_contact_by_id_not_found(contact_repository, mock_session, user):
     mock_result = MagicMock()
@@ -99,9 +229,7 @@ async def test_get_contact_by_id_not_found(contact_repository, mock_session, use
 
 @pytest.mark.asyncio
 async def test_update_contact_not_found(contact_repository, mock_session, user):
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = None
-    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_session.scalar = AsyncMock(side_effect=[1, None])
 
     result = await contact_repository.update(
         contact_id=999,
@@ -113,10 +241,11 @@ async def test_update_contact_not_found(contact_repository, mock_session, user):
 
 @pytest.mark.asyncio
 async def test_remove_contact_not_found(contact_repository, mock_session, user):
-    mock_result = MagicMock()
-    mock_result.scalar_one_or_none.return_value = None
-    mock_session.execute = AsyncMock(return_value=mock_result)
+    mock_session.scalar = AsyncMock(side_effect=[1, None])
 
     result = await contact_repository.delete(contact_id=999, user=user)
 
-    assert result is None
\ No newline at end of file
+    assert result is None
+    mock_session.commit.assert_not_awaited()
+    release = mock_session.execute.await_args.args[0]
+    assert str(release.compile()).startswith("UPDATE users SET change_seq=(users.change_seq - ")
\ No newline at end of file
@@ -0,0 +1,245 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from fakeredis import FakeAsyncRedis, FakeServer
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import User, UserRole
+from src.services import service_auth
+from src.services.service_auth import (
+    CurrentUser,
+    TokenVersions,
+    create_access_token,
+    get_current_user,
+    get_token_user,
+    invalidate_user,
+    listen_for_user_invalidations,
+    revoke_tokens,
+    USER_INVALIDATION_CHANNEL,
+)
+from src.services.service_cache import LocalTTLCache
+
+EMAIL = "testuser@example.com"
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    client = FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+    monkeypatch.setattr(service_auth, "redis_client", client)
+    return client
+
+
+@pytest.fixture
+def local_users(monkeypatch):
+    cache = LocalTTLCache(maxsize=100, ttl=60)
+    monkeypatch.setattr(service_auth, "_local_users", cache)
+    return cache
+
+
+@pytest.fixture
+def mock_session():
+    session = AsyncMock(spec=AsyncSession)
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = User(
+        id=1, email=EMAIL, hashed_password="secret", avatar_url=None,
+        role=UserRole.USER, is_active=True, is_verified=False, token_version=0,
+    )
+    session.execute = AsyncMock(return_value=result)
+    return session
+
+
+@pytest_asyncio.fixture
+async def token():
+    return await create_access_token(data={"sub": EMAIL})
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_fills_both_tiers(redis_client, local_users, mock_session, token):
+    user = await get_current_user(token, mock_session)
+
+    assert user == CurrentUser(
+        id=1, email=EMAIL, avatar_url=None, role=UserRole.USER, is_active=True, is_verified=False
+    )
+    assert local_users.get(EMAIL) is user
+    assert "secret" not in await redis_client.get(f"user:{EMAIL}")
+
+
+@pytest.mark.asyncio
+async def test_local_hit_skips_redis_and_database(redis_client, local_users, mock_session, token):
+    await get_current_user(token, mock_session)
+    await redis_client.flushall()
+
+    user = await get_current_user(token, mock_session)
+
+    assert user.id == 1
+    mock_session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_skips_database(redis_client, local_users, mock_session, token):
+    await get_current_user(token, mock_session)
+    local_users.clear()
+
+    user = await get_current_user(token, mock_session)
+
+    assert user.role is UserRole.USER
+    mock_session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_clears_both_tiers(redis_client, local_users, mock_session, token):
+    await get_current_user(token, mock_session)
+
+    await invalidate_user(EMAIL)
+
+    assert local_users.get(EMAIL) is None
+    assert await redis_client.get(f"user:{EMAIL}") is None
+
+
+@pytest.mark.asyncio
+async def test_published_invalidation_evicts_local_entry(redis_client, local_users):
+    listener = asyncio.create_task(listen_for_user_invalidations(redis_client))
+    try:
+        for _ in range(50):
+            if (await redis_client.pubsub_numsub(USER_INVALIDATION_CHANNEL))[0][1]:
+                break
+            await asyncio.sleep(0.01)
+        local_users.set(EMAIL, object())
+
+        await redis_client.publish(USER_INVALIDATION_CHANNEL, EMAIL)
+        for _ in range(50):
+            if local_users.get(EMAIL) is None:
+                break
+            await asyncio.sleep(0.01)
+
+        assert local_users.get(EMAIL) is None
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+
+@pytest.fixture
+def token_versions(monkeypatch, redis_client):
+    versions = TokenVersions(redis_client, refresh_interval=60, load=AsyncMock(return_value={}))
+    monkeypatch.setattr(service_auth, "token_versions", versions)
+    return versions
+
+
+@pytest.fixture
+def fast_path(monkeypatch):
+    monkeypatch.setattr(service_auth.config, "AUTH_FAST_PATH", True)
+
+
+def principal(token_version=0):
+    return CurrentUser(
+        id=1, email=EMAIL, avatar_url=None, role=UserRole.ADMIN,
+        is_active=True, is_verified=True, token_version=token_version,
+    )
+
+
+def test_claims_round_trip():
+    user = principal(token_version=3)
+
+    assert CurrentUser.from_claims({**user.claims(), "exp": 0}) == user
+    assert CurrentUser.from_claims({"sub": EMAIL}) is None
+
+
+@pytest.mark.asyncio
+async def test_fast_path_skips_redis_and_database(fast_path, redis_client, token_versions, mock_session):
+    token = await create_access_token(data=principal().claims())
+    await token_versions.refresh()
+    redis_client.get = AsyncMock()
+
+    user = await get_token_user(token, mock_session)
+
+    assert user == principal()
+    redis_client.get.assert_not_awaited()
+    mock_session.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_fast_path_falls_back_without_claims(fast_path, redis_client, local_users, token_versions, mock_session, token):
+    user = await get_token_user(token, mock_session)
+
+    assert user.email == EMAIL
+    mock_session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fast_path_rejects_revoked_tokens(fast_path, redis_client, token_versions, mock_session):
+    token = await create_access_token(data=principal().claims())
+    await token_versions.refresh()
+
+    # Raised by another worker: seen on the next refresh
+    other_worker = TokenVersions(redis_client, refresh_interval=60)
+    await other_worker.raise_to(1, 1)
+    assert (await get_token_user(token, mock_session)).id == 1
+    await token_versions.refresh()
+
+    with pytest.raises(HTTPException) as exc:
+        await get_token_user(token, mock_session)
+    assert exc.value.status_code == 401
+    fresh = await create_access_token(data=principal(token_version=1).claims())
+    assert (await get_token_user(fresh, mock_session)).token_version == 1
+
+
+@pytest.mark.asyncio
+async def test_token_versions_never_go_down(redis_client, token_versions):
+    await token_versions.raise_to(1, 2)
+    await TokenVersions(redis_client, refresh_interval=60).raise_to(1, 1)
+    await token_versions.refresh()
+
+    assert await token_versions.current(1) == 2
+    assert await token_versions.current(2) == 0
+
+
+@pytest.mark.asyncio
+async def test_full_path_rejects_tokens_older_than_user(redis_client, local_users, mock_session, token):
+    mock_session.execute.return_value.scalar_one_or_none.return_value.token_version = 1
+
+    with pytest.raises(HTTPException):
+        await get_current_user(token, mock_session)
+
+
+@pytest.mark.asyncio
+async def test_flushed_token_versions_are_rebuilt_from_database(redis_client, token_versions):
+    await token_versions.refresh()
+    token_versions.load.assert_awaited_once()
+    await token_versions.refresh()
+    token_versions.load.assert_awaited_once()
+
+    await redis_client.flushall()
+    token_versions.load.return_value = {1: 3}
+    await TokenVersions(redis_client, refresh_interval=60).raise_to(2, 1)
+    await token_versions.refresh()
+
+    assert await token_versions.current(1) == 3
+    assert await token_versions.current(2) == 1
+    assert (await redis_client.hgetall(token_versions.key))["1"] == "3"
+
+
+@pytest.mark.asyncio
+async def test_revoke_tokens_survives_redis_errors(monkeypatch, token_versions, local_users, caplog):
+    monkeypatch.setattr(service_auth, "_retry_redis", _no_delay(service_auth._retry_redis))
+    token_versions._raise = AsyncMock(side_effect=[redis.ConnectionError(), 1])
+    sessions = AsyncMock()
+    sessions.revoke_all.side_effect = redis.ConnectionError()
+    monkeypatch.setattr(service_auth, "refresh_sessions", sessions)
+    invalidate = AsyncMock()
+    monkeypatch.setattr(service_auth, "invalidate_user", invalidate)
+    user = User(id=1, email=EMAIL, token_version=2)
+
+    await revoke_tokens(user)
+
+    assert token_versions._raise.await_count == 2
+    assert sessions.revoke_all.await_count == 3
+    invalidate.assert_awaited_once_with(EMAIL)
+    assert "Ending the sessions of user 1 failed" in caplog.text
+
+
+def _no_delay(retry):
+    return lambda action, description: retry(action, description, delay=0)
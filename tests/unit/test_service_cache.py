@@ -0,0 +1,37 @@
+from src.services import service_cache
+from src.services.service_cache import LocalTTLCache
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalTTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_local_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(service_cache.time, "monotonic", lambda: now[0])
+    cache = LocalTTLCache(maxsize=10, ttl=30)
+    cache.set("a", 1)
+
+    now[0] += 29
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_local_cache_pop_missing_key():
+    cache = LocalTTLCache(maxsize=10, ttl=30)
+    cache.pop("missing")
+    cache.set("a", 1)
+    cache.pop("a")
+
+    assert cache.get("a") is None
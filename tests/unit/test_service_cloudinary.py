@@ -0,0 +1,127 @@
+import io
+
+import pytest
+from PIL import Image
+
+from src.services.service_cloudinary import (
+    read_avatar,
+    normalize_avatar,
+    upload_avatar,
+    AvatarTooLargeError,
+    UnsupportedAvatarError,
+)
+
+
+BOUNDARY = "avatar-boundary"
+
+
+def make_form(data: bytes, content_type: str = "image/png", field: str = "file") -> tuple[dict, bytes]:
+    body = (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="note"\r\n\r\nhello\r\n'
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="avatar"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+    headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}", "content-length": str(len(body))}
+    return headers, body
+
+
+class Stream:
+    """Request body in chunks, counting how many were read."""
+
+    def __init__(self, body: bytes, chunk_size: int = 1024):
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.read = 0
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+def make_png(width: int = 640, height: int = 480) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "teal").save(output, format="PNG")
+    return output.getvalue()
+
+
+@pytest.mark.asyncio
+async def test_read_avatar_accepts_image():
+    data = make_png()
+    headers, body = make_form(data)
+
+    assert await read_avatar(headers, Stream(body, chunk_size=7)) == data
+
+
+@pytest.mark.asyncio
+async def test_read_avatar_rejects_declared_type():
+    headers, body = make_form(make_png(), content_type="text/plain")
+    stream = Stream(body, chunk_size=64)
+
+    with pytest.raises(UnsupportedAvatarError):
+        await read_avatar(headers, stream)
+    assert stream.read < len(stream.chunks)
+
+
+@pytest.mark.asyncio
+async def test_read_avatar_rejects_spoofed_content():
+    headers, body = make_form(b"#!/bin/sh\necho not an image" * 100)
+    stream = Stream(body, chunk_size=64)
+
+    with pytest.raises(UnsupportedAvatarError):
+        await read_avatar(headers, stream)
+    assert stream.read < len(stream.chunks)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("headers", [{}, {"content-type": "image/png"}, {"content-type": "multipart/form-data"}])
+async def test_read_avatar_rejects_other_bodies(headers):
+    with pytest.raises(UnsupportedAvatarError):
+        await read_avatar(headers, Stream(make_png()))
+
+
+@pytest.mark.asyncio
+async def test_read_avatar_needs_the_file_field():
+    headers, body = make_form(make_png(), field="picture")
+
+    with pytest.raises(UnsupportedAvatarError):
+        await read_avatar(headers, Stream(body))
+
+
+@pytest.mark.asyncio
+async def test_read_avatar_rejects_large_content_length_before_reading():
+    headers, body = make_form(b"\x89PNG\r\n\x1a\n" + bytes(100_000))
+    stream = Stream(body)
+
+    with pytest.raises(AvatarTooLargeError):
+        await read_avatar(headers, stream, max_bytes=1000)
+    assert stream.read == 0
+
+
+@pytest.mark.asyncio
+async def test_read_avatar_stops_reading_large_file():
+    headers, body = make_form(make_png(2000, 2000))
+    del headers["content-length"]
+    stream = Stream(body, chunk_size=64)
+
+    with pytest.raises(AvatarTooLargeError):
+        await read_avatar(headers, stream, max_bytes=1000)
+    assert stream.read < 20
+
+
+@pytest.mark.asyncio
+async def test_normalize_avatar_crops_to_square_jpeg():
+    result = await normalize_avatar(make_png(), size=128)
+
+    with Image.open(io.BytesIO(result)) as image:
+        assert image.format == "JPEG"
+        assert image.size == (128, 128)
+
+
+@pytest.mark.asyncio
+async def test_upload_avatar_uses_cloudinary_api(fake_cloudinary):
+    url = await upload_avatar(await normalize_avatar(make_png()), public_id="user_avatars/1")
+
+    assert url == "https://res.cloudinary.com/fake/image/upload/user_avatars/1.jpg"
+    assert fake_cloudinary.uploads[0]["path"] == "/v1_1/demo/image/upload"
@@ -0,0 +1,205 @@
+import asyncio
+import datetime
+from collections import namedtuple
+
+import orjson
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from unittest.mock import AsyncMock
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.db import REPLICA
+from src.db.models import Contact, User
+from src.schemas import ContactResponse, ContactUpdate
+from src.services.service_cache import CacheStats, VersionedCache
+from src.repository.repo_contacts import CONTACT_FIELDS, LIST_FIELDS
+from src.services.service_contacts import ContactService, InvalidFieldsError, dump_contact_rows, parse_fields
+
+
+def make_contact(contact_id: int, first_name: str = "Test") -> Contact:
+    return Contact(
+        id=contact_id, first_name=first_name, last_name="User", email=f"c{contact_id}@example.com",
+        phone="1234567890", birthday=datetime.date(1990, 5, 17), user_id=1,
+    )
+
+
+def make_row(contact_id: int, first_name: str = "Test", fields=LIST_FIELDS):
+    # Like the repository's rows: the fields, then the default sort key
+    contact = make_contact(contact_id, first_name)
+    return namedtuple("ContactRow", [*fields, "sort_0"])(*(getattr(contact, name) for name in fields), contact_id)
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+@pytest.fixture
+def cache(server):
+    return VersionedCache(FakeAsyncRedis(server=server, decode_responses=True), "contacts", ttl=60, stats=CacheStats())
+
+
+@pytest.fixture
+def user():
+    return User(id=1, email="testuser@example.com")
+
+
+@pytest.fixture
+def service(cache):
+    session = AsyncMock(spec=AsyncSession)
+    session.info = {}
+    service = ContactService(session, cache=cache)
+    service.repo = AsyncMock()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_get_by_id_is_cached(service, cache, user):
+    service.repo.get_by_id.return_value = make_contact(7)
+
+    first = await service.get_by_id(7, user)
+    second = await service.get_by_id(7, user)
+
+    assert first == second
+    assert second.email == "c7@example.com"
+    service.repo.get_by_id.assert_awaited_once()
+    assert cache.stats.snapshot()["contacts"] == {"hits": 1, "misses": 1, "errors": 0, "hit_ratio": 0.5}
+
+
+@pytest.mark.asyncio
+async def test_entries_expire(service, cache, user):
+    service.repo.get_by_id.return_value = make_contact(7)
+    await service.get_by_id(7, user)
+
+    keys = await cache.client.keys("contacts:1:v0:*")
+    assert keys == ["contacts:1:v0:item:7"]
+    assert 0 < await cache.client.ttl(keys[0]) <= 66
+
+
+@pytest.mark.asyncio
+async def test_update_invalidates_user_entries(service, user):
+    service.repo.get_all.return_value = [make_row(7)]
+    service.repo.update.return_value = make_contact(7, first_name="Updated")
+    await service.get_all(user, 0, 10)
+
+    await service.update(7, ContactUpdate(
+        first_name="Updated", last_name="User", email="c7@example.com",
+        phone="1234567890", birthday=datetime.date(1990, 5, 17),
+    ), user)
+    service.repo.get_all.return_value = [make_row(7, first_name="Updated")]
+    body, _ = await service.get_all(user, 0, 10)
+
+    assert orjson.loads(body)[0]["first_name"] == "Updated"
+    assert service.repo.get_all.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_pages_are_cached_separately(service, user):
+    service.repo.get_all.side_effect = lambda user, skip, limit, after, **kwargs: [make_row(skip + 1)]
+
+    first, first_cursor = await service.get_all(user, 0, 1)
+    second, second_cursor = await service.get_all(user, 1, 1)
+
+    assert [orjson.loads(first)[0]["id"], orjson.loads(second)[0]["id"]] == [1, 2]
+    assert first_cursor and second_cursor and first_cursor != second_cursor
+
+
+@pytest.mark.asyncio
+async def test_list_hits_return_the_cached_bytes(service, user):
+    service.repo.get_all.return_value = [make_row(7)]
+
+    first = await service.get_all(user, 0, 10)
+    second = await service.get_all(user, 0, 10)
+
+    assert first == second == (dump_contact_rows([make_row(7)], LIST_FIELDS), None)
+    service.repo.get_all.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_field_selections_are_cached_separately(service, user):
+    service.repo.get_all.side_effect = lambda user, skip, limit, after, **kwargs: [make_row(7, fields=kwargs["fields"])]
+
+    default, _ = await service.get_all(user, 0, 10)
+    names, _ = await service.get_all(user, 0, 10, fields=parse_fields("first_name,last_name"))
+
+    assert "extra_data" not in orjson.loads(default)[0]
+    assert orjson.loads(names) == [{"first_name": "Test", "last_name": "User", "id": 7}]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, LIST_FIELDS),
+    ("", LIST_FIELDS),
+    ("last_name, first_name", ("first_name", "last_name", "id")),
+    ("extra_data", ("extra_data", "id")),
+    ("id", ("id",)),
+])
+def test_parse_fields(value, expected):
+    assert parse_fields(value) == expected
+
+
+def test_parse_fields_rejects_unknown_names():
+    with pytest.raises(InvalidFieldsError, match="hashed_password, user_id"):
+        parse_fields("first_name,user_id,hashed_password")
+
+
+def test_dump_contact_rows_matches_pydantic():
+    row = make_row(7, fields=CONTACT_FIELDS)._replace(
+        updated_at=datetime.datetime(2026, 1, 2, 3, 4, 5, 600, tzinfo=datetime.timezone.utc)
+    )
+    expected = b"[" + ContactResponse.model_validate(row._asdict()).model_dump_json().encode() + b"]"
+
+    assert dump_contact_rows([row]) == expected
+    assert dump_contact_rows([(*row, None, 42)]) == expected
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_load_once(service, user):
+    async def slow_get_all(*args, **kwargs):
+        await asyncio.sleep(0.05)
+        return [make_row(1)]
+
+    service.repo.get_all.side_effect = slow_get_all
+
+    results = await asyncio.gather(*(service.get_all(user, 0, 10) for _ in range(10)))
+
+    assert all(orjson.loads(body)[0]["id"] == 1 for body, _ in results)
+    assert service.repo.get_all.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_falls_back_to_database(service, cache, server, user):
+    server.connected = False
+    service.repo.get_by_id.return_value = make_contact(7)
+
+    contact = await service.get_by_id(7, user)
+
+    assert contact.id == 7
+    assert cache.stats.errors["contacts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_replica_reads_are_not_cached_right_after_invalidation(server, user):
+    cache = VersionedCache(
+        FakeAsyncRedis(server=server, decode_responses=True), "contacts", ttl=60, stats=CacheStats(), lag_window=0.2
+    )
+    replica, primary = AsyncMock(spec=AsyncSession), AsyncMock(spec=AsyncSession)
+    replica.info, primary.info = {REPLICA: True}, {}
+    services = {session: ContactService(session, cache=cache) for session in (replica, primary)}
+    for service in services.values():
+        service.repo = AsyncMock()
+        service.repo.get_by_id.return_value = make_contact(7)
+
+    await cache.invalidate(user.id)
+    await services[replica].get_by_id(7, user)
+    await services[replica].get_by_id(7, user)
+    assert services[replica].repo.get_by_id.await_count == 2
+
+    await services[primary].get_by_id(7, user)
+    await services[replica].get_by_id(7, user)
+    assert services[replica].repo.get_by_id.await_count == 2
+
+    await cache.invalidate(user.id)
+    await asyncio.sleep(0.25)
+    await services[replica].get_by_id(7, user)
+    await services[replica].get_by_id(7, user)
+    assert services[replica].repo.get_by_id.await_count == 3
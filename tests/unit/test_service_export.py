@@ -0,0 +1,77 @@
+import csv
+import datetime
+import gzip
+import io
+import tracemalloc
+import zlib
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.db.models import Base, Contact, User
+from src.services.service_export import export_contacts
+
+ROWS = 200_000
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'export.db'}")
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
+async def seed(session_factory, count: int):
+    async with session_factory() as session:
+        await (await session.connection()).run_sync(Base.metadata.create_all)
+        user = User(email="export@example.com", hashed_password="x")
+        session.add(user)
+        await session.flush()
+        birthday = datetime.date(1990, 5, 17)
+        for start in range(0, count, 10_000):
+            await session.execute(insert(Contact), [
+                {"first_name": "Name", "last_name": f"Last{i}", "email": f"c{i}@example.com",
+                 "phone": "1234567890", "birthday": birthday, "birthday_md": 517, "user_id": user.id}
+                for i in range(start, min(count, start + 10_000))
+            ])
+        await session.commit()
+        return user
+
+
+async def collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+@pytest.mark.asyncio
+async def test_export_formats(session_factory):
+    user = await seed(session_factory, 3)
+
+    csv_rows = list(csv.DictReader(io.StringIO((await collect(export_contacts(session_factory, user, "csv"))).decode())))
+    jsonl = await collect(export_contacts(session_factory, user, "jsonl", compress=True))
+    vcard = (await collect(export_contacts(session_factory, user, "vcard"))).decode()
+
+    assert [row["email"] for row in csv_rows] == ["c0@example.com", "c1@example.com", "c2@example.com"]
+    assert csv_rows[0]["extra_data"] == ""
+    assert len(gzip.decompress(jsonl).splitlines()) == 3
+    assert "N:Last0;Name;;;\r\n" in vcard and "BDAY:1990-05-17\r\n" in vcard
+
+
+@pytest.mark.asyncio
+async def test_export_memory_is_bounded(session_factory):
+    user = await seed(session_factory, ROWS)
+
+    lines = size = 0
+    decompressor = zlib.decompressobj(wbits=31)
+    tracemalloc.start()
+    try:
+        async for chunk in export_contacts(session_factory, user, "csv", compress=True):
+            data = decompressor.decompress(chunk)
+            lines += data.count(b"\n")
+            size += len(data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert lines == ROWS + 1
+    # Peak stays a small fraction of the ~10 MB document
+    assert peak < size / 4
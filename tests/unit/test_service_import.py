@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.db.models import User
+from src.services.service_contacts import ContactService
+from src.services.service_import import (
+    UnsupportedImportFormatError,
+    detect_format,
+    iter_batches,
+    iter_csv_records,
+    iter_lines,
+)
+
+
+async def chunked(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_detect_format():
+    assert detect_format("text/csv; charset=utf-8") == "csv"
+    assert detect_format("application/x-ndjson") == "jsonl"
+    assert detect_format("application/octet-stream", "jsonl") == "jsonl"
+    with pytest.raises(UnsupportedImportFormatError):
+        detect_format("application/json")
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_handles_split_utf8_and_crlf():
+    data = "Олена,Петренко\r\nsecond".encode()
+
+    assert await collect(iter_lines(chunked(data, 3))) == ["Олена,Петренко", "second"]
+
+
+@pytest.mark.asyncio
+async def test_csv_quoted_field_spans_lines():
+    data = b'first_name,extra_data\nAnn,"a\nb ""c"""\nBob,\n'
+
+    records = await collect(iter_csv_records(iter_lines(chunked(data, 4))))
+
+    assert records == [{"first_name": "Ann", "extra_data": 'a\nb "c"'}, {"first_name": "Bob", "extra_data": None}]
+
+
+@pytest.mark.asyncio
+async def test_batches_split_valid_and_invalid_rows():
+    row = "Ann,Smith,ann{}@example.com,123,1990-01-01\n"
+    data = ("first_name,last_name,email,phone,birthday\n" + row.format(1) + "Bad,Row,x,1,never\n"
+            + row.format(2) + "Long,Phone,long@example.com," + "9" * 21 + ",1990-01-01\n" + row.format(3)).encode()
+
+    batches = await collect(iter_batches(chunked(data, 16), "csv", batch_size=2))
+
+    assert [len(batch.contacts) for batch in batches] == [1, 1, 1]
+    errors = [error for batch in batches for error in batch.errors]
+    assert [error.row for error in errors] == [2, 4]
+    assert any(message.startswith("email:") for message in errors[0].errors)
+    assert errors[1].errors == ["phone: String should have at most 20 characters"]
+
+
+@pytest.mark.asyncio
+async def test_import_reserves_change_numbers_just_before_commit():
+    session = AsyncMock(spec=AsyncSession)
+    session.info = {}
+    service = ContactService(session, cache=None)
+    service.repo = AsyncMock()
+    service.repo.bulk_create.side_effect = lambda contacts, user, sequence: len(contacts)
+    calls = MagicMock()
+    calls.attach_mock(service.repo.bulk_create, "bulk_create")
+    calls.attach_mock(service.repo.sequence_pending, "sequence_pending")
+    calls.attach_mock(session.commit, "commit")
+    row = "Ann,Smith,ann{}@example.com,123,1990-01-01\n"
+    data = ("first_name,last_name,email,phone,birthday\n" + "".join(row.format(i) for i in range(5))).encode()
+
+    result = await service.import_contacts(chunked(data, 16), "csv", User(id=1), batch_size=2)
+
+    assert result.inserted == 5
+    # The user row lock is only taken by sequence_pending, after reading the whole stream
+    assert [call[0] for call in calls.mock_calls] == ["bulk_create"] * 3 + ["sequence_pending", "commit"]
+    assert all(call.kwargs["sequence"] is False for call in service.repo.bulk_create.call_args_list)
@@ -0,0 +1,42 @@
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+from prometheus_client import REGISTRY
+
+from src.services.service_cache import CacheStats, InstrumentedRedis
+from src.services.service_password import PasswordHasher
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_redis_commands_are_timed():
+    client = InstrumentedRedis(connection_pool=FakeAsyncRedis(server=FakeServer()).connection_pool)
+    before = sample("redis_command_duration_seconds_count", command="SET")
+
+    await client.set("key", "value")
+
+    assert sample("redis_command_duration_seconds_count", command="SET") == before + 1
+
+
+def test_cache_stats_feed_prometheus():
+    before = sample("cache_requests_total", cache="test", result="hits")
+
+    stats = CacheStats()
+    stats.record("test", "hits")
+
+    assert stats.snapshot()["test"]["hits"] == 1
+    assert sample("cache_requests_total", cache="test", result="hits") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_is_timed():
+    hasher = PasswordHasher(max_workers=1)
+    before = sample("password_hash_duration_seconds_count", operation="hash")
+    try:
+        await hasher.hash("secret")
+    finally:
+        hasher.shutdown()
+
+    assert sample("password_hash_duration_seconds_count", operation="hash") == before + 1
@@ -0,0 +1,15 @@
+import pytest
+
+from src.services.service_pagination import encode_cursor, decode_cursor, InvalidCursorError
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor([12345])
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == [12345]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor!", "e30", encode_cursor([])])
+def test_decode_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
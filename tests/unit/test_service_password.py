@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from src.services.service_password import PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=2)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify(hasher):
+    hashed = await hasher.hash("secret")
+
+    assert await hasher.verify("secret", hashed)
+    assert not await hasher.verify("wrong", hashed)
+    assert hasher.stats()["completed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_hashing_does_not_block_event_loop(hasher):
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.005)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    await asyncio.gather(*(hasher.hash("secret") for _ in range(4)))
+    task.cancel()
+
+    assert ticks > 5
+
+
+@pytest.mark.asyncio
+async def test_stats_report_queue_depth(hasher):
+    jobs = [asyncio.create_task(hasher.hash("secret")) for _ in range(5)]
+    await asyncio.sleep(0.01)
+
+    stats = hasher.stats()
+    assert stats["running"] <= 2
+    assert stats["running"] + stats["queued"] == 5
+
+    await asyncio.gather(*jobs)
+    assert hasher.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_jobs_leave_the_queue(hasher):
+    jobs = [asyncio.create_task(hasher.hash("secret")) for _ in range(6)]
+    await asyncio.sleep(0.01)
+
+    for job in jobs:
+        job.cancel()
+    await asyncio.gather(*jobs, return_exceptions=True)
+    hasher.shutdown()
+    # The two started jobs cannot be cancelled, let them finish
+    for _ in range(200):
+        if hasher.stats()["running"] == 0:
+            break
+        await asyncio.sleep(0.05)
+
+    assert hasher.stats()["queued"] == 0
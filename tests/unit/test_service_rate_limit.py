@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+import redis.asyncio as redis
+from fakeredis import FakeAsyncRedis, FakeServer
+from starlette.requests import Request
+from unittest.mock import AsyncMock, MagicMock
+
+from src.services.service_auth import create_access_token
+from src.services.service_rate_limit import (
+    RateLimit,
+    RateLimitExceeded,
+    RateLimiter,
+    client_identity,
+)
+
+
+def make_request(headers=None, host="10.0.0.1"):
+    return Request({
+        "type": "http",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()],
+        "client": (host, 1234),
+    })
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def test_parse_rate_limit():
+    assert RateLimit.parse("5/minute") == RateLimit(5, 60)
+    assert RateLimit.parse("100 / hours") == RateLimit(100, 3600)
+    for value in ("5", "0/minute", "x/minute", "5/week"):
+        with pytest.raises(ValueError):
+            RateLimit.parse(value)
+
+
+@pytest.mark.asyncio
+async def test_burst_then_reject(server):
+    limiter = RateLimiter(FakeAsyncRedis(server=server))
+    rate = RateLimit(3, 60)
+
+    results = [await limiter.hit("login:ip:1", rate) for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+    assert 19 < results[3].retry_after <= 20
+    assert (await limiter.hit("login:ip:2", rate)).allowed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rate", [RateLimit(7, 60), RateLimit(3, 1)])
+async def test_uneven_emission_interval(server, rate, caplog):
+    limiter = RateLimiter(FakeAsyncRedis(server=server))
+
+    results = [await limiter.hit("login:ip:1", rate) for _ in range(rate.limit + 3)]
+
+    assert [result.allowed for result in results] == [True] * rate.limit + [False] * 3
+    assert "Rate limit check failed" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_sub_millisecond_waits_round_up(server):
+    limiter = RateLimiter(FakeAsyncRedis(server=server))
+    # Half a millisecond between requests: a rejection within the same
+    # millisecond is due less than one millisecond later
+    rate = RateLimit(1, 0.0005)
+
+    results = [await limiter.hit("login:ip:1", rate) for _ in range(50)]
+
+    rejected = [result.retry_after for result in results if not result.allowed]
+    assert rejected
+    assert all(retry_after >= 0.001 for retry_after in rejected)
+
+
+@pytest.mark.asyncio
+async def test_workers_share_one_budget(server):
+    # Every worker process has its own connection pool to the same Redis
+    workers = [RateLimiter(FakeAsyncRedis(server=server)) for _ in range(8)]
+    rate = RateLimit(10, 60)
+
+    results = await asyncio.gather(*(
+        workers[i % len(workers)].hit("login:ip:1", rate) for i in range(80)
+    ))
+
+    assert sum(result.allowed for result in results) == rate.limit
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fail_open():
+    client = MagicMock()
+    client.register_script.return_value = AsyncMock(side_effect=redis.ConnectionError())
+    limiter = RateLimiter(client)
+
+    result = await limiter.hit("login:ip:1", RateLimit(1, 60))
+
+    assert result.allowed
+
+
+@pytest.mark.asyncio
+async def test_client_identity():
+    token = await create_access_token(data={"sub": "user@example.com"})
+
+    assert client_identity(make_request({"Authorization": f"Bearer {token}"})) == "user:user@example.com"
+    assert client_identity(make_request({"Authorization": "Bearer garbage"})) == "ip:10.0.0.1"
+    assert client_identity(make_request()) == "ip:10.0.0.1"
+
+
+@pytest.mark.asyncio
+async def test_limit_dependency(server):
+    dependency = RateLimiter(FakeAsyncRedis(server=server)).limit("2/minute", "signup")
+    request = make_request()
+
+    await dependency(request)
+    await dependency(request)
+    with pytest.raises(RateLimitExceeded) as exc:
+        await dependency(request)
+    assert exc.value.retry_after > 0
+    await dependency(make_request(host="10.0.0.2"))
@@ -0,0 +1,96 @@
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from src.services.service_sessions import InvalidRefreshToken, RefreshSessionStore
+
+
+@pytest.fixture
+def client():
+    return FakeAsyncRedis(server=FakeServer(), decode_responses=True)
+
+
+@pytest.fixture
+def store(client):
+    return RefreshSessionStore(client, ttl=3600)
+
+
+@pytest.mark.asyncio
+async def test_rotation_issues_a_new_token(store, client):
+    session = await store.create(1, "user@example.com", "pytest")
+
+    rotated = await store.rotate(session.refresh_token)
+
+    assert rotated.session_id == session.session_id
+    assert (rotated.user_id, rotated.email) == (1, "user@example.com")
+    assert rotated.refresh_token != session.refresh_token
+    assert 0 < await client.ttl(f"session:{session.session_id}") <= 3600
+    assert session.refresh_token.partition(".")[2] not in str(await client.hgetall(f"session:{session.session_id}"))
+
+
+@pytest.mark.asyncio
+async def test_reuse_revokes_the_session(store, client):
+    session = await store.create(1, "user@example.com")
+    rotated = await store.rotate(session.refresh_token)
+
+    with pytest.raises(InvalidRefreshToken):
+        await store.rotate(session.refresh_token)
+    with pytest.raises(InvalidRefreshToken):
+        await store.rotate(rotated.refresh_token)
+    assert await client.smembers("user_sessions:1") == set()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token", ["", "no-secret", ".secret", "unknown.secret"])
+async def test_invalid_tokens(store, token):
+    with pytest.raises(InvalidRefreshToken):
+        await store.rotate(token)
+
+
+@pytest.mark.asyncio
+async def test_logout_ends_one_device(store):
+    phone = await store.create(1, "user@example.com", "phone")
+    laptop = await store.create(1, "user@example.com", "laptop")
+
+    await store.revoke(phone.refresh_token)
+
+    with pytest.raises(InvalidRefreshToken):
+        await store.rotate(phone.refresh_token)
+    assert (await store.rotate(laptop.refresh_token)).user_id == 1
+
+
+@pytest.mark.asyncio
+async def test_revoke_all(store, client):
+    sessions = [await store.create(1, "user@example.com") for _ in range(3)]
+    other = await store.create(2, "other@example.com")
+
+    assert await store.revoke_all(1) == 3
+
+    for session in sessions:
+        with pytest.raises(InvalidRefreshToken):
+            await store.rotate(session.refresh_token)
+    assert (await store.rotate(other.refresh_token)).user_id == 2
+
+
+@pytest.mark.asyncio
+async def test_logout_needs_the_current_token(store):
+    session = await store.create(1, "user@example.com")
+    rotated = await store.rotate(session.refresh_token)
+
+    await store.revoke(session.refresh_token)
+    await store.revoke(f"{session.session_id}.forged")
+    await store.revoke(session.session_id)
+
+    assert (await store.rotate(rotated.refresh_token)).user_id == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_sessions_leave_the_index(store, client):
+    expired, live = [await store.create(1, "user@example.com") for _ in range(2)]
+    await client.delete(f"session:{expired.session_id}")
+
+    assert await store.revoke_all(1) == 1
+
+    expired, live = [await store.create(1, "user@example.com") for _ in range(2)]
+    await client.delete(f"session:{expired.session_id}")
+    newest = await store.create(1, "user@example.com")
+    assert await client.smembers("user_sessions:1") == {live.session_id, newest.session_id}
@@ -0,0 +1,81 @@
+import asyncio
+import socket
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+
+from src.services.services_email import EmailQueue
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        self.peers.add(session.peer)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+@pytest.mark.asyncio
+async def test_queue_reuses_one_connection(smtp_server):
+    queue = EmailQueue(hostname="127.0.0.1", port=smtp_server.port, batch_size=3)
+
+    for i in range(5):
+        await queue.enqueue(f"user{i}@example.com", "Hello", "Body")
+    await queue.drain()
+    await queue.close()
+
+    handler = smtp_server.handler
+    assert [m.rcpt_tos[0] for m in handler.messages] == [f"user{i}@example.com" for i in range(5)]
+    assert len(handler.peers) == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_dead_letters_after_retries():
+    queue = EmailQueue(hostname="127.0.0.1", port=free_port(), max_retries=2, backoff=0.01)
+
+    await queue.enqueue("nobody@example.com", "Hello", "Body")
+    await queue.drain()
+    await queue.close()
+
+    assert len(queue.dead_letters) == 1
+    assert queue.dead_letters[0]["to"] == "nobody@example.com"
+
+
+@pytest.mark.asyncio
+async def test_unexpected_errors_dead_letter_and_keep_the_worker(smtp_server, monkeypatch):
+    send_message = aiosmtplib.SMTP.send_message
+
+    async def fail_for_broken(self, message, *args, **kwargs):
+        if message["To"] == "broken@example.com":
+            raise ValueError("malformed header")
+        return await send_message(self, message, *args, **kwargs)
+
+    monkeypatch.setattr(aiosmtplib.SMTP, "send_message", fail_for_broken)
+    queue = EmailQueue(hostname="127.0.0.1", port=smtp_server.port)
+
+    await queue.enqueue("broken@example.com", "Hello", "Body")
+    await queue.enqueue("user@example.com", "Hello", "Body")
+    await asyncio.wait_for(queue.drain(), 5)
+    await queue.close()
+
+    assert [entry["to"] for entry in queue.dead_letters] == ["broken@example.com"]
+    assert [m.rcpt_tos[0] for m in smtp_server.handler.messages] == ["user@example.com"]